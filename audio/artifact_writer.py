@@ -0,0 +1,271 @@
+import soundfile as sf
+import json
+import os
+import queue
+import threading
+from utils.config import (SAMPLE_RATE, ARTIFACT_QUEUE_SIZE, ARTIFACT_FORMAT, ARTIFACT_SUBTYPE,
+                          ARTIFACT_BLOCK_SECONDS)
+from utils.metrics import METRICS
+from utils.timeline import OffsetMap
+
+EXTENSIONS = {'WAV': '.wav', 'FLAC': '.flac'}
+
+def sidecar_path(filename):
+    """Offsets file stored next to a speech-only artifact"""
+    return os.path.splitext(filename)[0] + ".spans.json"
+
+def load_speech_archive(filename):
+    """
+    Load a speech-only artifact written by ArtifactWriter.save_speech
+
+    Args:
+        filename (str): Path of the audio file
+
+    Returns:
+        tuple: (speech audio, OffsetMap to the original recording's timeline)
+    """
+    audio, sample_rate = sf.read(filename, dtype='float32')
+    with open(sidecar_path(filename)) as f:
+        sidecar = json.load(f)
+    return audio, OffsetMap(sidecar['spans'], sample_rate)
+
+class ArtifactStream:
+    def __init__(self, writer, path, sample_rate, speech):
+        """
+        Artifact written a chunk at a time; see ArtifactWriter.open
+
+        Args:
+            writer (ArtifactWriter): Writer whose thread does the encoding
+            path (str): Destination path
+            sample_rate (int): Sample rate of the audio
+            speech (bool): Write a speech-only archive with a spans sidecar
+        """
+        self.writer = writer
+        self.path = path
+        self.sample_rate = sample_rate
+        self.spans = [] if speech else None
+        self.source_samples = 0
+        self._file = None  # opened and used on the writer thread only
+        self._failed = False
+
+    def append(self, audio, start=None):
+        """
+        Queue the next chunk of audio
+
+        Args:
+            audio (numpy.ndarray): Mono audio; must not be modified afterwards
+            start (int, optional): For speech archives, the chunk's sample
+                offset in the original recording
+        """
+        if audio is None or len(audio) == 0:
+            return
+        if self.spans is not None:
+            if start is None:
+                raise ValueError("Speech archive chunks need their start offset")
+            start, end = int(start), int(start) + len(audio)
+            if self.spans and self.spans[-1][1] == start:
+                self.spans[-1] = (self.spans[-1][0], end)
+            else:
+                self.spans.append((start, end))
+            self.source_samples = max(self.source_samples, end)
+        else:
+            self.source_samples += len(audio)
+        self.writer._queue.put(('append', self, audio))
+
+    def close(self, source_samples=None):
+        """
+        Queue the end of the file; the sidecar of a speech archive follows it
+
+        Args:
+            source_samples (int, optional): Length of the original recording
+                (default: the end of the last chunk)
+        """
+        if source_samples is not None:
+            self.source_samples = max(self.source_samples, int(source_samples))
+        self.writer._queue.put(('close', self, None))
+
+class ArtifactWriter:
+    def __init__(self, sample_rate=SAMPLE_RATE, max_queue=ARTIFACT_QUEUE_SIZE, file_format=ARTIFACT_FORMAT,
+                 subtype=ARTIFACT_SUBTYPE, block_seconds=ARTIFACT_BLOCK_SECONDS):
+        """
+        Write audio artifacts to disk on a background thread
+
+        save() only queues the array, so the pipeline never waits on disk
+        unless max_queue writes are already pending, which bounds memory.
+        Queued arrays must not be modified afterwards.
+
+        Files are encoded as 16-bit FLAC by default. Audio goes to the
+        encoder block_seconds at a time, straight from the queued array, so
+        a long recording is never converted or copied as a whole.
+
+        Audio that is produced a piece at a time, like the utterances of a
+        live stream or the blocks of a long file, is written through open():
+        each chunk is queued as it arrives, so the whole recording never
+        has to be held in memory.
+
+        Args:
+            sample_rate (int): Sample rate of the audio
+            max_queue (int): Pending writes before save() blocks
+            file_format (str): 'FLAC' or 'WAV'
+            subtype (str): Sample format, e.g. 'PCM_16'
+            block_seconds (float): Audio written per call to the encoder
+        """
+        if file_format not in EXTENSIONS:
+            raise ValueError(f"Unsupported artifact format '{file_format}', expected one of {list(EXTENSIONS)}")
+        self.sample_rate = sample_rate
+        self.file_format = file_format
+        self.subtype = subtype
+        self.block_size = max(1, int(block_seconds * sample_rate))
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.written = []
+        self.failed = []
+        self.bytes_written = 0
+        METRICS.gauge('artifact_queue_depth', "Audio artifacts waiting to be written"
+                      ).set_function(self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def path(self, filename):
+        """Destination path with the extension of the configured format"""
+        return os.path.splitext(filename)[0] + EXTENSIONS[self.file_format]
+
+    def save(self, audio, filename):
+        """
+        Queue audio to be written to a file
+
+        Args:
+            audio (numpy.ndarray): Mono audio data
+            filename (str): Destination path; the extension follows the format
+
+        Returns:
+            str: Path the audio will be written to, or None if there is no audio
+        """
+        if audio is None or len(audio) == 0:
+            print(f"Error saving audio: No audio data to save ({filename})")
+            return None
+        path = self.path(filename)
+        self._queue.put(('save', audio, None, path))
+        return path
+
+    def open(self, filename, speech=False, sample_rate=None):
+        """
+        Start an artifact that is fed one chunk at a time
+
+        Args:
+            filename (str): Destination path; the extension follows the format
+            speech (bool): Speech-only archive: chunks are speech spans, given
+                with their offsets in the original recording, and a sidecar
+                is written like save_speech does
+            sample_rate (int, optional): Sample rate of the chunks (default:
+                the writer's)
+
+        Returns:
+            ArtifactStream: Handle to append() chunks to and close()
+        """
+        return ArtifactStream(self, self.path(filename), sample_rate or self.sample_rate, speech)
+
+    def save_speech(self, audio, spans, filename):
+        """
+        Queue only the speech spans of a recording
+
+        The spans are written back to back, followed by a sidecar
+        (<name>.spans.json) with their [start, end) sample offsets in the
+        original recording; load_speech_archive maps times back.
+
+        Args:
+            audio (numpy.ndarray): Full mono recording
+            spans (numpy.ndarray): (n, 2) [start, end) sample indices of speech
+            filename (str): Destination path; the extension follows the format
+
+        Returns:
+            str: Path the audio will be written to, or None if there is no speech
+        """
+        spans = [(int(start), int(end)) for start, end in spans]
+        if audio is None or not spans:
+            print(f"Error saving audio: No speech to save ({filename})")
+            return None
+        path = self.path(filename)
+        self._queue.put(('save', audio, spans, path))
+        return path
+
+    def _open_file(self, path, sample_rate):
+        return sf.SoundFile(path, 'w', samplerate=sample_rate, channels=1,
+                            format=self.file_format, subtype=self.subtype)
+
+    def _write_blocks(self, f, audio, start, end):
+        for block_start in range(start, end, self.block_size):
+            f.write(audio[block_start:min(block_start + self.block_size, end)])
+
+    def _write(self, audio, spans, path):
+        if spans is None:
+            spans = [(0, len(audio))]
+        with self._open_file(path, self.sample_rate) as f:
+            for start, end in spans:
+                self._write_blocks(f, audio, start, end)
+
+    def _write_sidecar(self, source_samples, spans, path, sample_rate):
+        temp_path = sidecar_path(path) + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'sample_rate': sample_rate, 'source_samples': source_samples, 'spans': spans}, f)
+        os.replace(temp_path, sidecar_path(path))
+
+    def _finish(self, path):
+        self.bytes_written += os.path.getsize(path)
+        self.written.append(path)
+
+    def _append(self, stream, audio):
+        if stream._failed:
+            return
+        try:
+            if stream._file is None:
+                stream._file = self._open_file(stream.path, stream.sample_rate)
+            self._write_blocks(stream._file, audio, 0, len(audio))
+        except Exception as e:
+            print(f"Error saving audio: {str(e)}")
+            stream._failed = True
+            self.failed.append(stream.path)
+
+    def _close_stream(self, stream):
+        if stream._failed:
+            return
+        if stream._file is None:
+            print(f"Error saving audio: No audio data to save ({stream.path})")
+            return
+        try:
+            stream._file.close()
+            if stream.spans is not None:
+                self._write_sidecar(stream.source_samples, [list(span) for span in stream.spans],
+                                    stream.path, stream.sample_rate)
+            self._finish(stream.path)
+        except Exception as e:
+            print(f"Error saving audio: {str(e)}")
+            self.failed.append(stream.path)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind = item[0]
+            if kind == 'append':
+                self._append(*item[1:])
+                continue
+            if kind == 'close':
+                self._close_stream(item[1])
+                continue
+            _, audio, spans, path = item
+            try:
+                self._write(audio, spans, path)
+                if spans is not None:
+                    self._write_sidecar(len(audio), spans, path, self.sample_rate)
+                self._finish(path)
+            except Exception as e:
+                print(f"Error saving audio: {str(e)}")
+                self.failed.append(path)
+
+    def close(self):
+        """Wait for all queued writes to finish and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+        if self.written:
+            print(f"Saved {len(self.written)} audio file(s) to disk ({self.bytes_written / 1e6:.2f} MB)")
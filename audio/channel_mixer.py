@@ -0,0 +1,74 @@
+import numpy as np
+from utils.config import (CHUNK_SIZE, CAPTURE_MIX_MODE, CAPTURE_CHANNEL, BEAM_SWITCH_RATIO,
+                          BEAM_SMOOTHING)
+
+MIX_MODES = ('mean', 'channel', 'beam')
+
+class ChannelMixer:
+    def __init__(self, channels, mode=CAPTURE_MIX_MODE, channel=CAPTURE_CHANNEL, max_block=CHUNK_SIZE,
+                 switch_ratio=BEAM_SWITCH_RATIO, smoothing=BEAM_SMOOTHING):
+        """
+        Reduce multi-channel blocks to mono inside the audio callback
+
+        Modes:
+            'mean': average of all channels (one matrix-vector product)
+            'channel': a single channel
+            'beam': the channel with the most energy, e.g. the microphone of
+                an array pointing at the talker. Energies are smoothed across
+                blocks and another channel is only picked once it is
+                switch_ratio times louder, so the selection does not flicker.
+
+        Args:
+            channels (int): Channels per input frame
+            mode (str): One of MIX_MODES
+            channel (int): Channel used in 'channel' mode
+            max_block (int): Expected block size; larger blocks grow the buffers once
+            switch_ratio (float): Energy ratio needed to switch channels in 'beam' mode
+            smoothing (float): Weight of the previous energies in 'beam' mode
+        """
+        if mode not in MIX_MODES:
+            raise ValueError(f"Unknown mix mode '{mode}', expected one of {MIX_MODES}")
+        if not 0 <= channel < channels:
+            raise ValueError(f"Channel {channel} out of range for {channels} channel(s)")
+        self.channels = channels
+        self.mode = mode
+        self.channel = channel
+        self.switch_ratio = switch_ratio
+        self.smoothing = smoothing
+        self.selected = channel
+        self._weights = np.full(channels, 1.0 / channels, dtype=np.float32)
+        self._energy = np.zeros(channels, dtype=np.float32)
+        self._smoothed = np.zeros(channels, dtype=np.float32)
+        self._output = np.empty(max_block, dtype=np.float32)
+
+    def mix(self, block):
+        """
+        Mix one (frames, channels) block
+
+        Args:
+            block (numpy.ndarray): float32 input block
+
+        Returns:
+            numpy.ndarray: Mono samples; a view of an internal buffer that the
+                next call overwrites
+        """
+        frames = len(block)
+        if frames > len(self._output):
+            self._output = np.empty(frames, dtype=np.float32)
+        output = self._output[:frames]
+
+        if self.channels == 1:
+            output[:] = block[:, 0]
+        elif self.mode == 'mean':
+            np.dot(block, self._weights, out=output)
+        elif self.mode == 'channel':
+            output[:] = block[:, self.channel]
+        else:
+            np.einsum('ij,ij->j', block, block, out=self._energy)
+            self._smoothed *= self.smoothing
+            self._smoothed += (1.0 - self.smoothing) * self._energy
+            loudest = int(np.argmax(self._smoothed))
+            if self._smoothed[loudest] > self.switch_ratio * self._smoothed[self.selected]:
+                self.selected = loudest
+            output[:] = block[:, self.selected]
+        return output
@@ -0,0 +1,289 @@
+from audio.noise_reduction import StreamingNoiseReducer
+from audio.resampler import StreamingResampler
+from vad.streaming_vad import StreamingVAD
+from utils.config import (SAMPLE_RATE, CHUNK_SIZE, LONG_FILE_BLOCK_SECONDS, LONG_FILE_WINDOW_SECONDS,
+                          LONG_FILE_OVERLAP_SECONDS, LONG_FILE_STITCH_THRESHOLD)
+import soundfile as sf
+import numpy as np
+import os
+import tempfile
+
+RAW_EXTENSIONS = ('.raw', '.pcm')
+
+class BlockReader:
+    def __init__(self, path, block_seconds=LONG_FILE_BLOCK_SECONDS, raw_sample_rate=SAMPLE_RATE):
+        """
+        Read an audio file from disk one block at a time
+
+        Raw PCM (.raw/.pcm, mono 16-bit little-endian) is memory-mapped;
+        other formats use soundfile block reads. Either way only one block
+        is in memory at a time.
+
+        Args:
+            path (str): Audio file
+            block_seconds (float): Length of each block
+            raw_sample_rate (int): Sample rate of raw PCM files
+        """
+        self.path = path
+        self.raw = path.lower().endswith(RAW_EXTENSIONS)
+        if self.raw:
+            self.sample_rate = raw_sample_rate
+            self.num_samples = os.path.getsize(path) // 2
+        else:
+            info = sf.info(path)
+            self.sample_rate = info.samplerate
+            self.num_samples = info.frames
+        self.block_size = int(block_seconds * self.sample_rate)
+
+    @property
+    def duration(self):
+        return self.num_samples / self.sample_rate
+
+    def __iter__(self):
+        """Yield mono float32 blocks"""
+        if self.raw:
+            pcm = np.memmap(self.path, dtype='<i2', mode='r', shape=(self.num_samples,))
+            for start in range(0, self.num_samples, self.block_size):
+                yield pcm[start:start + self.block_size].astype(np.float32) / 32768.0
+            return
+
+        for block in sf.blocks(self.path, blocksize=self.block_size, dtype='float32', always_2d=True):
+            yield block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+def _clip_segments(segments, low, high):
+    """Cut segments to [low, high) seconds, dropping the ones outside"""
+    clipped = []
+    for seg in segments:
+        start, end = max(seg['start'], low), min(seg['end'], high)
+        if end > start:
+            clipped.append(dict(seg, start=start, end=end, duration=end - start))
+    return clipped
+
+class SpeakerStitcher:
+    def __init__(self, embedder=None, threshold=LONG_FILE_STITCH_THRESHOLD):
+        """
+        Give the speakers of consecutive diarization windows global labels
+
+        Windows overlap. A window's local speaker takes the global label it
+        shares the most overlap time with in the previous window. Speakers
+        without a match are compared against the mean embedding of every
+        global speaker seen so far (when an embedder is given), so someone
+        who comes back after a long pause keeps their label; otherwise a
+        new label is created.
+
+        Args:
+            embedder (SpeakerEmbedder, optional): Embedding model for re-identification
+            threshold (float): Minimum cosine similarity to reuse a label
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.num_speakers = 0
+        self._centroids = {}  # global label -> (embedding sum, count)
+
+    def _new_label(self):
+        label = f"SPEAKER_{self.num_speakers:02d}"
+        self.num_speakers += 1
+        return label
+
+    def stitch(self, segments, previous, overlap_start, overlap_end, window_audio=None,
+               window_start=0.0, sample_rate=SAMPLE_RATE):
+        """
+        Relabel one window's segments
+
+        Args:
+            segments (list): Window segments in absolute seconds with local labels
+            previous (list): Previous window's segments, already relabeled
+            overlap_start (float): Start of the overlap with the previous window
+            overlap_end (float): End of that overlap
+            window_audio (numpy.ndarray, optional): Audio of the window, for embeddings
+            window_start (float): Start of the window in seconds
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            list: The segments with global 'speaker' labels
+        """
+        local_labels = sorted({seg['speaker'] for seg in segments})
+        if not local_labels:
+            return []
+
+        # Overlap time between each local and each previous global speaker
+        shared = {}
+        for seg in _clip_segments(segments, overlap_start, overlap_end):
+            for prev in _clip_segments(previous, seg['start'], seg['end']):
+                key = (seg['speaker'], prev['speaker'])
+                shared[key] = shared.get(key, 0.0) + prev['duration']
+        mapping = {}
+        for (local, global_label), _ in sorted(shared.items(), key=lambda item: -item[1]):
+            if local not in mapping and global_label not in mapping.values():
+                mapping[local] = global_label
+
+        embeddings = {}
+        if self.embedder is not None and window_audio is not None:
+            for local in local_labels:
+                own = [dict(seg, start=seg['start'] - window_start, end=seg['end'] - window_start)
+                       for seg in segments if seg['speaker'] == local]
+                vectors = self.embedder.embed_segments(window_audio, own, sample_rate)
+                weights = np.array([seg['duration'] for seg in own], dtype=np.float32)
+                mean = weights @ vectors / max(weights.sum(), 1e-9)
+                embeddings[local] = mean / max(np.linalg.norm(mean), 1e-9)
+
+        for local in local_labels:
+            if local in mapping:
+                continue
+            best_label, best_score = None, self.threshold
+            if local in embeddings:
+                for global_label, (total, _) in self._centroids.items():
+                    if global_label in mapping.values():
+                        continue
+                    score = float(embeddings[local] @ total / max(np.linalg.norm(total), 1e-9))
+                    if score >= best_score:
+                        best_label, best_score = global_label, score
+            mapping[local] = best_label if best_label is not None else self._new_label()
+
+        for local, embedding in embeddings.items():
+            total, count = self._centroids.get(mapping[local], (np.zeros_like(embedding), 0))
+            self._centroids[mapping[local]] = (total + embedding, count + 1)
+
+        return [dict(seg, speaker=mapping[seg['speaker']]) for seg in segments]
+
+def process_long_file(path, diarizer=None, embedder=None, window_seconds=LONG_FILE_WINDOW_SECONDS,
+                      overlap_seconds=LONG_FILE_OVERLAP_SECONDS, block_seconds=LONG_FILE_BLOCK_SECONDS,
+                      temp_dir=None, parallel_vad=None, writer=None, cleaned_path=None):
+    """
+    Run noise reduction, VAD and diarization on a file of any length
+
+    The file is streamed from disk in blocks through the streaming filter
+    and VAD. When diarizing, the filtered audio is spooled to a temporary
+    float32 file and diarized in overlapping windows read back through a
+    memory map, with speaker labels stitched across windows. Memory use
+    depends on the block and window lengths, not on the file length.
+
+    With a parallel_vad, the filtered audio is always spooled and the VAD
+    runs afterwards over the spool, sharded across the ParallelVAD's
+    processes, instead of block by block on this one.
+
+    With a writer and cleaned_path, the filtered audio is also saved as an
+    artifact, appended block by block as it is produced.
+
+    Pass an embedder for anything longer than a few windows. Without one,
+    labels can only carry over through window overlaps: a speaker who is
+    silent in an overlap, or comes back after a window without speech,
+    gets a new label, so num_speakers grows with the length of the file.
+
+    Args:
+        path (str): Audio file (.wav/.flac/.ogg, or raw 16-bit PCM)
+        diarizer (SpeakerDiarizer, optional): Diarizer; None for VAD only
+        embedder (SpeakerEmbedder, optional): Re-identifies speakers across windows
+        window_seconds (float): Diarization window length
+        overlap_seconds (float): Overlap between consecutive windows
+        block_seconds (float): Audio read from disk at a time
+        temp_dir (str, optional): Directory for the spooled audio
+        parallel_vad (ParallelVAD, optional): Shards the VAD over processes
+        writer (ArtifactWriter, optional): Writer for the filtered audio
+        cleaned_path (str, optional): Where the writer saves the filtered audio
+
+    Returns:
+        dict: Same fields as batch_pipeline.process_file
+    """
+    reader = BlockReader(path, block_seconds)
+    sample_rate = reader.sample_rate
+    resampler = None
+    if sample_rate not in (8000, 16000, 32000, 48000):
+        # Rates the VAD cannot take are converted to the pipeline rate on the fly. The resampler's
+        # tables grow with max_block, so it gets recorder-sized pieces and splits each read block.
+        resampler = StreamingResampler(sample_rate, SAMPLE_RATE,
+                                       max_block=max(1, CHUNK_SIZE * sample_rate // SAMPLE_RATE))
+        sample_rate = SAMPLE_RATE
+
+    noise_reducer = StreamingNoiseReducer(sample_rate)
+    vad = StreamingVAD(sample_rate=sample_rate, keep_audio=False) if parallel_vad is None else None
+    regions = []
+    spool = None
+    if diarizer is not None or parallel_vad is not None:
+        spool = tempfile.NamedTemporaryFile(dir=temp_dir, suffix='.f32', delete=False)
+    cleaned = None
+    if writer is not None and cleaned_path is not None:
+        cleaned = writer.open(cleaned_path, sample_rate=sample_rate)
+
+    try:
+        for block in reader:
+            if resampler is not None:
+                block = resampler.process(block)
+            clean = noise_reducer.process(block)
+            if cleaned is not None:
+                cleaned.append(clean)
+            if spool is not None:
+                spool.write(np.ascontiguousarray(clean, dtype=np.float32).tobytes())
+            if vad is not None:
+                regions.extend((u['start'], u['end']) for u in vad.process_chunk(clean))
+        if vad is not None:
+            regions.extend((u['start'], u['end']) for u in vad.flush())
+        else:
+            spool.close()
+            regions = [(int(start) / sample_rate, int(end) / sample_rate)
+                       for start, end in parallel_vad.detect_file_segments(spool.name, sample_rate)]
+
+        result = {
+            'file': path,
+            'duration': reader.duration,
+            'speech_duration': float(sum(end - start for start, end in regions)),
+            'speech_regions': [{'start': start, 'end': end} for start, end in regions],
+            'num_speakers': 0,
+            'segments': []
+        }
+        if diarizer is None or not regions:
+            return result
+
+        spool.close()
+        clean_audio = np.memmap(spool.name, dtype=np.float32, mode='r')
+        spans = np.round(np.array(regions) * sample_rate).astype(np.int64)
+        result['segments'], result['num_speakers'] = _diarize_windows(
+            clean_audio, spans, sample_rate, diarizer, embedder, window_seconds, overlap_seconds)
+        del clean_audio
+        return result
+    finally:
+        if cleaned is not None:
+            cleaned.close()
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+
+def _diarize_windows(clean_audio, spans, sample_rate, diarizer, embedder, window_seconds, overlap_seconds):
+    """Diarize overlapping windows of the spooled audio and stitch their labels"""
+    window = int(window_seconds * sample_rate)
+    step = max(1, window - int(overlap_seconds * sample_rate))
+    stitcher = SpeakerStitcher(embedder)
+    segments = []
+    pending = []  # relabeled segments of the previous window, not yet emitted
+    previous_end = 0
+    emitted_until = 0.0
+
+    for window_start in range(0, len(clean_audio), step):
+        window_end = min(window_start + window, len(clean_audio))
+        # Speech spans inside the window, relative to its start
+        first = int(np.searchsorted(spans[:, 1], window_start, side='right'))
+        last = int(np.searchsorted(spans[:, 0], window_end, side='left'))
+        window_spans = np.clip(spans[first:last], window_start, window_end) - window_start
+        window_spans = window_spans[window_spans[:, 1] > window_spans[:, 0]]
+
+        current = []
+        if len(window_spans):
+            window_audio = np.array(clean_audio[window_start:window_end])
+            local = diarizer.process_speech_spans(window_audio, window_spans, sample_rate)['segments']
+            offset = window_start / sample_rate
+            local = [dict(seg, start=seg['start'] + offset, end=seg['end'] + offset) for seg in local]
+            current = stitcher.stitch(local, pending, offset, previous_end / sample_rate,
+                                      window_audio, offset, sample_rate)
+
+        # The previous window owns the first half of the overlap, this one the rest
+        cut = (window_start + previous_end) / 2 / sample_rate if previous_end > window_start \
+            else window_start / sample_rate
+        segments.extend(_clip_segments(pending, emitted_until, cut))
+        emitted_until = cut
+        pending = current
+        previous_end = window_end
+        if window_end >= len(clean_audio):
+            break
+
+    segments.extend(_clip_segments(pending, emitted_until, float('inf')))
+    return segments, stitcher.num_speakers
@@ -1,84 +1,86 @@
-import numpy as np
-from scipy import signal
-from utils.config import SAMPLE_RATE
-
-def fade_in_out(chunk, fade_len=100):
-    if len(chunk) < 2 * fade_len:
-        return chunk
-    fade_in = np.linspace(0, 1, fade_len)
-    fade_out = np.linspace(1, 0, fade_len)
-    chunk[:fade_len] *= fade_in
-    chunk[-fade_len:] *= fade_out
-    return chunk
-
-def reduce_noise(audio, sample_rate=SAMPLE_RATE):
-    """
-    Reduce noise in audio data using a simple bandpass filter and normalization
-    with minimal echo artifacts.
-    
-    Args:
-        audio (numpy.ndarray): Audio data
-        sample_rate (int): Sample rate of the audio
-        
-    Returns:
-        numpy.ndarray: Cleaned audio data
-    """
-    # Convert to float32 to reduce memory usage
-    audio = audio.astype(np.float32)
-    
-    # Normalize audio
-    max_val = np.max(np.abs(audio))
-    if max_val > 0:
-        audio = audio / max_val
-    
-    # Design bandpass filter (focus on human speech frequencies)
-    nyquist = sample_rate / 2
-    low = 100 / nyquist  # 100 Hz (lower cutoff for better bass)
-    high = 8000 / nyquist  # 8000 Hz (higher cutoff for better clarity)
-    
-    # Ensure frequencies are within valid range
-    low = max(0.001, min(0.499, low))
-    high = max(0.001, min(0.499, high))
-    
-    b, a = signal.butter(2, [low, high], btype='band')  # Lower order filter
-    
-    # Calculate minimum chunk size needed for the filter
-    min_chunk_size = 3 * max(len(b), len(a))  # Rule of thumb for filter stability
-    
-    # Process in chunks to reduce memory usage
-    chunk_size = max(8000, min_chunk_size)  # Ensure chunk size is large enough
-    num_chunks = len(audio) // chunk_size + (1 if len(audio) % chunk_size else 0)
-    cleaned_chunks = []
-    
-    for i in range(num_chunks):
-        start_idx = i * chunk_size
-        end_idx = min((i + 1) * chunk_size, len(audio))
-        chunk = audio[start_idx:end_idx]
-        
-        # Skip processing if chunk is too small
-        if len(chunk) < min_chunk_size:
-            cleaned_chunks.append(chunk)
-            continue
-        
-        try:
-            # Apply bandpass filter
-            cleaned_chunk = signal.filtfilt(b, a, chunk)
-            
-            # Remove or soften noise gate
-            # threshold = 0.002
-            # cleaned_chunk[np.abs(cleaned_chunk) < threshold] = 0
-            cleaned_chunk = fade_in_out(cleaned_chunk, fade_len=200)
-            
-            cleaned_chunks.append(cleaned_chunk)
-        except ValueError:
-            # If filtering fails, use the original chunk
-            cleaned_chunks.append(chunk)
-    
-    # Combine chunks
-    cleaned_audio = np.concatenate(cleaned_chunks)
-    
-    # Restore original scale
-    if max_val > 0:
-        cleaned_audio = cleaned_audio * max_val
-    
-    return cleaned_audio
+import numpy as np
+from utils.config import SAMPLE_RATE
+
+def design_bandpass(sample_rate=SAMPLE_RATE):
+    """
+    Design the speech bandpass filter as second-order sections
+
+    Args:
+        sample_rate (int): Sample rate of the audio
+
+    Returns:
+        numpy.ndarray: float32 second-order sections
+    """
+    # scipy.signal is slow to import, so only load it once filtering is needed
+    from scipy import signal
+
+    # Design bandpass filter (focus on human speech frequencies)
+    nyquist = sample_rate / 2
+    low = 100 / nyquist  # 100 Hz (lower cutoff for better bass)
+    high = 8000 / nyquist  # 8000 Hz (higher cutoff for better clarity)
+
+    # Ensure frequencies are within valid range
+    low = max(0.001, min(0.499, low))
+    high = max(0.001, min(0.499, high))
+
+    sos = signal.butter(2, [low, high], btype='band', output='sos')  # Lower order filter
+    return sos.astype(np.float32)
+
+class StreamingNoiseReducer:
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        """
+        Stateful bandpass filter for audio that arrives in blocks
+
+        The filter state is carried from one call to the next, so feeding a
+        signal in blocks of any size gives exactly the same output as
+        filtering it in one piece, with no fades or gaps at block edges.
+
+        Args:
+            sample_rate (int): Sample rate of the audio
+        """
+        from scipy import signal
+
+        self.sample_rate = sample_rate
+        self._sosfilt = signal.sosfilt
+        self.sos = design_bandpass(sample_rate)
+        self._zi_step = signal.sosfilt_zi(self.sos).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        """Start a new signal; the next block re-initializes the filter state"""
+        self._zi = None
+
+    def process(self, block):
+        """
+        Filter the next block of audio
+
+        Args:
+            block (numpy.ndarray): Mono audio block
+
+        Returns:
+            numpy.ndarray: Filtered float32 block of the same length
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if len(block) == 0:
+            return block
+        if self._zi is None:
+            # Start in steady state for the first sample to avoid a step transient
+            self._zi = self._zi_step * block[0]
+        cleaned, self._zi = self._sosfilt(self.sos, block, zi=self._zi)
+        return cleaned
+
+def reduce_noise(audio, sample_rate=SAMPLE_RATE):
+    """
+    Reduce noise in audio data using a simple bandpass filter.
+
+    Uses the same stateful filter as live processing, so a recording
+    filtered in one call matches the same audio filtered block by block.
+
+    Args:
+        audio (numpy.ndarray): Audio data
+        sample_rate (int): Sample rate of the audio
+
+    Returns:
+        numpy.ndarray: Cleaned float32 audio data
+    """
+    return StreamingNoiseReducer(sample_rate).process(audio)
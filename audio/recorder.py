@@ -1,90 +1,170 @@
-import sounddevice as sd
-import numpy as np
-from utils.config import SAMPLE_RATE, CHANNELS, CHUNK_SIZE, DURATION
-import queue
-import threading
-import time
-
-class AudioRecorder:
-    def __init__(self):
-        self.audio_queue = queue.Queue()
-        self.is_recording = False
-        self.recording_thread = None
-
-    def audio_callback(self, indata, frames, time, status):
-        """Callback function for audio stream"""
-        if status:
-            print(f"Status: {status}")
-        # Convert to mono if stereo
-        if indata.shape[1] > 1:
-            audio_data = np.mean(indata, axis=1)
-        else:
-            audio_data = indata.flatten()
-        self.audio_queue.put(audio_data.copy())
-
-    def start_recording(self):
-        """Start recording audio in a separate thread"""
-        self.is_recording = True
-        self.recording_thread = threading.Thread(target=self._record_audio)
-        self.recording_thread.start()
-
-    def stop_recording(self):
-        """Stop recording and return the recorded audio"""
-        self.is_recording = False
-        if self.recording_thread:
-            self.recording_thread.join()
-        
-        # Combine all chunks from the queue
-        audio_chunks = []
-        while not self.audio_queue.empty():
-            audio_chunks.append(self.audio_queue.get())
-        
-        if audio_chunks:
-            return np.concatenate(audio_chunks)
-        return None
-
-    def _record_audio(self):
-        """Internal method to handle the recording process"""
-        try:
-            with sd.InputStream(samplerate=SAMPLE_RATE,
-                              channels=CHANNELS,
-                              callback=self.audio_callback,
-                              blocksize=CHUNK_SIZE,
-                              dtype=np.float32):
-                while self.is_recording:
-                    time.sleep(0.1)
-        except Exception as e:
-            print(f"Error during recording: {str(e)}")
-            self.is_recording = False
-
-def record_audio(duration=DURATION, sample_rate=SAMPLE_RATE):
-    """
-    Record audio for a specified duration
-    
-    Args:
-        duration (int): Recording duration in seconds
-        sample_rate (int): Audio sample rate in Hz
-    
-    Returns:
-        numpy.ndarray: Recorded audio data
-    """
-    recorder = AudioRecorder()
-    print(f"Recording for {duration} seconds...")
-    
-    # Start recording
-    recorder.start_recording()
-    time.sleep(duration)
-    
-    # Stop recording and get the audio data
-    audio_data = recorder.stop_recording()
-    
-    if audio_data is None:
-        raise RuntimeError("No audio data was recorded")
-    
-    # Normalize audio to prevent clipping
-    max_val = np.max(np.abs(audio_data))
-    if max_val > 0:
-        audio_data = audio_data / max_val
-    
-    print("Recording completed")
+import numpy as np
+from audio.ring_buffer import RingBuffer
+from audio.channel_mixer import ChannelMixer
+from audio.resampler import StreamingResampler
+from utils.metrics import METRICS
+from utils.config import (SAMPLE_RATE, CHUNK_SIZE, DURATION, RING_BUFFER_SECONDS, CAPTURE_DEVICE,
+                          CAPTURE_SAMPLE_RATE, CAPTURE_CHANNELS, CAPTURE_MIX_MODE, CAPTURE_CHANNEL)
+import threading
+import time
+
+class AudioRecorder:
+    def __init__(self, capacity_seconds=RING_BUFFER_SECONDS, device=CAPTURE_DEVICE,
+                 device_rate=CAPTURE_SAMPLE_RATE, channels=CAPTURE_CHANNELS, mix_mode=CAPTURE_MIX_MODE,
+                 channel=CAPTURE_CHANNEL):
+        """
+        Record from an input device into a preallocated ring buffer
+
+        The device is opened at its native rate with all of its channels
+        (unless told otherwise). The callback mixes the channels down and
+        resamples to SAMPLE_RATE with preallocated buffers, so the ring
+        buffer always holds mono audio at the pipeline rate.
+
+        Args:
+            capacity_seconds (float): Seconds of audio the buffer can hold
+                before unread blocks start to be dropped
+            device (int or str, optional): Input device; None for the default
+            device_rate (int, optional): Capture rate; None for the device's native rate
+            channels (int, optional): Channels to capture; None for all of them
+            mix_mode (str): 'mean', 'channel' or 'beam' (see ChannelMixer)
+            channel (int): Channel used in 'channel' mode
+        """
+        self.ring = RingBuffer(int(capacity_seconds * SAMPLE_RATE))
+        self.device = device
+        self.device_rate = device_rate
+        self.channels = channels
+        self.mix_mode = mix_mode
+        self.channel = channel
+        self.mixer = None
+        self.resampler = None
+        self._stop_event = threading.Event()
+        self.is_recording = False
+        self.recording_thread = None
+
+    @property
+    def overruns(self):
+        """Number of blocks dropped because the consumer fell behind"""
+        return self.ring.overruns
+
+    def configure(self, device_rate, channels, blocksize):
+        """
+        Prepare the mixer and resampler for a stream
+
+        Args:
+            device_rate (int): Sample rate the device delivers
+            channels (int): Channels per frame
+            blocksize (int): Frames per callback
+        """
+        self.mixer = ChannelMixer(channels, self.mix_mode, self.channel, max_block=blocksize)
+        self.resampler = None
+        if device_rate != SAMPLE_RATE:
+            self.resampler = StreamingResampler(device_rate, SAMPLE_RATE, max_block=blocksize)
+
+    def audio_callback(self, indata, frames, time, status):
+        """Callback function for audio stream"""
+        if status:
+            print(f"Status: {status}")
+        # Mixer and resampler write into their own preallocated buffers
+        audio_data = self.mixer.mix(indata)
+        if self.resampler is not None:
+            audio_data = self.resampler.process(audio_data)
+        self.ring.write(audio_data)
+
+    def start_recording(self):
+        """Start recording audio in a separate thread"""
+        self._stop_event.clear()
+        # Read at scrape time, so the audio callback pays nothing for them
+        METRICS.gauge('recorder_buffer_depth_samples', "Unread samples in the recorder ring buffer"
+                      ).set_function(self.ring.available)
+        METRICS.counter('recorder_overruns_total', "Audio blocks dropped because the buffer was full"
+                        ).set_function(lambda: self.ring.overruns)
+        METRICS.counter('recorder_dropped_samples_total', "Audio samples dropped because the buffer was full"
+                        ).set_function(lambda: self.ring.dropped_samples)
+        self.is_recording = True
+        self.recording_thread = threading.Thread(target=self._record_audio)
+        self.recording_thread.start()
+
+    def read_chunk(self, timeout=None):
+        """
+        Wait for recorded audio and return everything not read yet
+
+        Args:
+            timeout (float, optional): Seconds to wait before giving up
+
+        Returns:
+            numpy.ndarray: Mono audio, or None if nothing arrived in time
+        """
+        if not self.ring.wait(1, timeout):
+            return None
+        return self.ring.read()
+
+    def stop_recording(self):
+        """Stop recording and return the recorded audio"""
+        self.is_recording = False
+        self._stop_event.set()
+        if self.recording_thread:
+            self.recording_thread.join()
+
+        if self.ring.overruns:
+            print(f"Warning: {self.ring.overruns} audio blocks were dropped "
+                  f"({self.ring.dropped_samples / SAMPLE_RATE:.2f} seconds)")
+
+        # Return whatever has not been read yet
+        if self.ring.available():
+            return self.ring.read()
+        return None
+
+    def _record_audio(self):
+        """Internal method to handle the recording process"""
+        try:
+            import sounddevice as sd
+            info = sd.query_devices(self.device, 'input')
+            device_rate = int(self.device_rate or info['default_samplerate'])
+            channels = int(self.channels or info['max_input_channels'])
+            # Same callback period as CHUNK_SIZE frames at the pipeline rate
+            blocksize = int(CHUNK_SIZE * device_rate / SAMPLE_RATE)
+            self.configure(device_rate, channels, blocksize)
+            print(f"Capturing {channels} channel(s) at {device_rate} Hz from {info['name']}")
+            with sd.InputStream(device=self.device,
+                              samplerate=device_rate,
+                              channels=channels,
+                              callback=self.audio_callback,
+                              blocksize=blocksize,
+                              dtype=np.float32):
+                self._stop_event.wait()
+        except Exception as e:
+            print(f"Error during recording: {str(e)}")
+            self.is_recording = False
+
+def record_audio(duration=DURATION, sample_rate=SAMPLE_RATE):
+    """
+    Record audio for a specified duration
+    
+    Args:
+        duration (int): Recording duration in seconds
+        sample_rate (int): Audio sample rate in Hz
+    
+    Returns:
+        numpy.ndarray: Recorded audio data
+    """
+    # The whole take is read at the end, so the buffer must hold all of it
+    recorder = AudioRecorder(capacity_seconds=max(RING_BUFFER_SECONDS, duration + 1))
+    print(f"Recording for {duration} seconds...")
+    
+    # Start recording
+    recorder.start_recording()
+    time.sleep(duration)
+    
+    # Stop recording and get the audio data
+    audio_data = recorder.stop_recording()
+    
+    if audio_data is None:
+        raise RuntimeError("No audio data was recorded")
+    
+    # Normalize audio to prevent clipping
+    max_val = np.max(np.abs(audio_data))
+    if max_val > 0:
+        audio_data = audio_data / max_val
+    
+    print("Recording completed")
     return audio_data
\ No newline at end of file
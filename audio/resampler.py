@@ -0,0 +1,124 @@
+import numpy as np
+from math import gcd
+from utils.config import SAMPLE_RATE, CHUNK_SIZE, RESAMPLER_HALF_LENGTH
+
+def design_resampling_filter(up, down, half_length=RESAMPLER_HALF_LENGTH):
+    """
+    Kaiser-windowed sinc low-pass for rational resampling
+
+    Same design as scipy.signal.resample_poly: cutoff at the lower of the
+    two Nyquist rates, half_length zero crossings on each side.
+
+    Returns:
+        numpy.ndarray: (up, taps_per_phase) float32 polyphase coefficients
+    """
+    max_rate = max(up, down)
+    num_taps = 2 * half_length * max_rate + 1
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = np.sinc(n / max_rate) / max_rate * np.kaiser(num_taps, 5.0) * up
+
+    taps_per_phase = -(-num_taps // up)
+    padded = np.zeros(taps_per_phase * up)
+    padded[:num_taps] = taps
+    # Row p holds the taps that meet input samples when the output falls on phase p
+    return padded.reshape(taps_per_phase, up).T.astype(np.float32)
+
+class StreamingResampler:
+    def __init__(self, input_rate, output_rate=SAMPLE_RATE, max_block=CHUNK_SIZE,
+                 half_length=RESAMPLER_HALF_LENGTH):
+        """
+        Polyphase resampler for audio that arrives in blocks
+
+        Only the filter taps that meet real input samples are computed.
+        The phase pattern repeats every `up` outputs, so the gather indices
+        and coefficient rows for every starting phase are tabulated once;
+        each block is then one index add, one np.take and one einsum over
+        preallocated buffers, with no allocation in steady state.
+
+        Args:
+            input_rate (int): Sample rate of the incoming blocks
+            output_rate (int): Sample rate to produce
+            max_block (int): Largest block processed in one pass; bigger
+                blocks are split
+            half_length (int): Filter zero crossings on each side
+        """
+        divisor = gcd(int(input_rate), int(output_rate))
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        self.max_block = max_block
+
+        polyphase = design_resampling_filter(self.up, self.down, half_length)
+        self.taps = polyphase.shape[1]
+        self.max_outputs = -(-max_block * self.up // self.down) + 1
+
+        # Row i: output i of a period-aligned run, for i up to one period plus a block
+        rows = np.arange(self.up + self.max_outputs)
+        newest = rows * self.down // self.up
+        self._coefficients = polyphase[rows * self.down % self.up]
+        self._indices = newest[:, None] - np.arange(self.taps)[None, :]
+
+        self._buffer = np.zeros(self.taps - 1 + max_block, dtype=np.float32)
+        self._gathered = np.empty((self.max_outputs, self.taps), dtype=np.float32)
+        self._index_buffer = np.empty((self.max_outputs, self.taps), dtype=np.int64)
+        self._output = np.empty(self.max_outputs, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """Start a new stream; history is treated as silence"""
+        self._buffer[:self.taps - 1] = 0.0
+        self._held = self.taps - 1  # valid samples in the buffer
+        self._buffer_start = -(self.taps - 1)  # input index of buffer[0]
+        self._inputs = 0
+        self._outputs = 0
+
+    def process(self, block):
+        """
+        Resample the next block
+
+        Args:
+            block (numpy.ndarray): Mono float audio at input_rate
+
+        Returns:
+            numpy.ndarray: Audio at output_rate. For blocks of at most
+                max_block samples this is a view of an internal buffer that
+                the next call overwrites, so copy it (e.g. into a ring
+                buffer) before calling again.
+        """
+        if self.up == self.down:
+            return block
+        if len(block) <= self.max_block:
+            return self._process_piece(block)
+        return np.concatenate([self._process_piece(block[i:i + self.max_block]).copy()
+                               for i in range(0, len(block), self.max_block)])
+
+    def _process_piece(self, block):
+        n = len(block)
+        self._buffer[self._held:self._held + n] = block
+        self._held += n
+        self._inputs += n
+
+        # Outputs whose newest input sample has arrived
+        end = -(-self._inputs * self.up // self.down)
+        count = end - self._outputs
+        phase = self._outputs % self.up
+        period_input = (self._outputs - phase) // self.up * self.down
+
+        indices = self._index_buffer[:count]
+        np.add(self._indices[phase:phase + count], period_input - self._buffer_start, out=indices)
+        gathered = self._gathered[:count]
+        np.take(self._buffer, indices, out=gathered)
+        output = self._output[:count]
+        np.einsum('ij,ij->i', gathered, self._coefficients[phase:phase + count], out=output)
+        self._outputs = end
+
+        # Drop the samples no future output reaches back to
+        oldest_needed = end * self.down // self.up - (self.taps - 1)
+        drop = oldest_needed - self._buffer_start
+        if drop > 0:
+            keep = self._held - drop
+            self._buffer[:keep] = self._buffer[drop:self._held]
+            self._held = keep
+            self._buffer_start += drop
+        return output
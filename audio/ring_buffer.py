@@ -0,0 +1,115 @@
+import numpy as np
+import threading
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.float32):
+        """
+        Fixed-capacity single-producer/single-consumer sample buffer
+
+        The producer (the audio callback) copies blocks into preallocated
+        storage and never allocates. The consumer can look at unread samples
+        through views before consuming them. Only the producer moves the
+        write index and only the consumer moves the read index, so no lock
+        is needed between the two.
+
+        Args:
+            capacity (int): Number of samples the buffer can hold
+            dtype: Sample type
+        """
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=dtype)
+        self._write_index = 0  # total samples ever written
+        self._read_index = 0  # total samples ever consumed
+        self._data_event = threading.Event()
+        self.overruns = 0  # blocks dropped because the buffer was full
+        self.dropped_samples = 0
+
+    def available(self):
+        """Number of unread samples"""
+        return self._write_index - self._read_index
+
+    def free(self):
+        """Number of samples that can be written without an overrun"""
+        return self.capacity - self.available()
+
+    def write(self, data):
+        """
+        Copy a block into the buffer (producer side)
+
+        Args:
+            data (numpy.ndarray): 1-D block of samples
+
+        Returns:
+            bool: False if the block was dropped because the buffer was full
+        """
+        n = len(data)
+        if n > self.free():
+            self.overruns += 1
+            self.dropped_samples += n
+            return False
+
+        start = self._write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        if first < n:
+            self._buffer[:n - first] = data[first:]
+
+        # Publish the samples only after they are in place
+        self._write_index += n
+        self._data_event.set()
+        return True
+
+    def wait(self, min_samples=1, timeout=None):
+        """
+        Block until at least min_samples are unread
+
+        Returns:
+            bool: True if the samples are available, False on timeout
+        """
+        while self.available() < min_samples:
+            self._data_event.clear()
+            if self.available() >= min_samples:
+                break
+            if not self._data_event.wait(timeout):
+                return self.available() >= min_samples
+        return True
+
+    def peek(self, n=None):
+        """
+        Look at the oldest unread samples without copying or consuming them
+
+        Args:
+            n (int, optional): Number of samples (default: all unread)
+
+        Returns:
+            tuple: Two views whose concatenation is the requested window;
+                   the second is empty unless the window wraps around
+        """
+        available = self.available()
+        n = available if n is None else min(n, available)
+        start = self._read_index % self.capacity
+        first = min(n, self.capacity - start)
+        return self._buffer[start:start + first], self._buffer[:n - first]
+
+    def consume(self, n):
+        """Mark the n oldest unread samples as read"""
+        self._read_index += min(n, self.available())
+
+    def read(self, n=None):
+        """
+        Copy out and consume the oldest unread samples
+
+        Args:
+            n (int, optional): Number of samples (default: all unread)
+
+        Returns:
+            numpy.ndarray: The samples, in order
+        """
+        first, second = self.peek(n)
+        data = np.concatenate((first, second)) if len(second) else first.copy()
+        self.consume(len(data))
+        return data
+
+    def clear(self):
+        """Drop all unread samples (consumer side)"""
+        self._read_index = self._write_index
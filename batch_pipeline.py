@@ -0,0 +1,255 @@
+from audio.noise_reduction import reduce_noise
+from audio.long_file import process_long_file, RAW_EXTENSIONS
+from vad.vad import VAD
+from vad.parallel_vad import ParallelVAD
+from diarization.speaker_diarization import SpeakerDiarizer
+from diarization.inference_profile import set_torch_threads
+from utils.cache import ResultCache
+from utils.config import SAMPLE_RATE, OUTPUT_DIR, CACHE_ENABLED, LONG_FILE_MIN_SECONDS
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import soundfile as sf
+import numpy as np
+import argparse
+import csv
+import multiprocessing.util
+import json
+import os
+import time
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg') + RAW_EXTENSIONS
+
+# Per-process state created once by the pool initializer
+_worker = {}
+
+def collect_inputs(source):
+    """
+    List the audio files to process
+
+    Args:
+        source (str): A directory (searched recursively) or a manifest file.
+            Manifests hold one path per line, or a CSV with a 'path' column;
+            relative paths are resolved against the manifest's directory.
+
+    Returns:
+        list: Absolute audio file paths in a stable order
+    """
+    if os.path.isdir(source):
+        files = []
+        for root, _, names in os.walk(source):
+            for name in names:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(os.path.abspath(os.path.join(root, name)))
+        return sorted(files)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as f:
+        if source.lower().endswith('.csv'):
+            paths = [row['path'] for row in csv.DictReader(f)]
+        else:
+            paths = [line.strip() for line in f]
+    return [os.path.abspath(os.path.join(base_dir, p)) for p in paths if p and not p.startswith('#')]
+
+def display_name(audio_path, input_root):
+    """Input path relative to the common input root, or its file name without one"""
+    if input_root is None:
+        return os.path.basename(audio_path)
+    return os.path.relpath(audio_path, input_root)
+
+def result_path(audio_path, input_root, output_dir, output_format):
+    """
+    Map an input file to its result file, mirroring the input layout
+
+    The source extension is kept (a.wav -> a.wav.json), so a.wav and
+    a.flac in one directory get separate results. Without a common input
+    root (e.g. files on different drives) results are named after the file.
+    """
+    return os.path.join(output_dir, display_name(audio_path, input_root) + '.' + output_format)
+
+def load_mono(path, sample_rate=SAMPLE_RATE):
+    """Load an audio file as mono float32 at the pipeline sample rate"""
+    audio, file_rate = sf.read(path, dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    if file_rate != sample_rate:
+        from scipy import signal
+        gcd = np.gcd(int(file_rate), int(sample_rate))
+        audio = signal.resample_poly(audio, sample_rate // gcd, file_rate // gcd).astype(np.float32)
+    return audio
+
+def _init_worker(diarize, threads_per_worker, vad_workers=1):
+    """Load the models once per worker process; a ParallelVAD keeps its pool for every file"""
+    set_torch_threads(threads_per_worker)
+    if vad_workers > 1:
+        _worker['vad'] = ParallelVAD(workers=vad_workers)
+        # Stop the VAD processes when this worker exits, or it waits for them forever. This must run
+        # before the finalizers of the pool's own queues (priority 10), which would drop the stop signal.
+        multiprocessing.util.Finalize(_worker['vad'], _worker['vad'].close, exitpriority=20)
+    else:
+        _worker['vad'] = VAD()
+    cache = ResultCache() if CACHE_ENABLED else None
+    _worker['cache'] = cache
+    _worker['diarizer'] = SpeakerDiarizer(cache=cache) if diarize else None
+    _worker['embedder'] = None
+
+def _long_file_embedder():
+    """Embedding model that keeps speaker labels stable across long-file windows, loaded on first use"""
+    if _worker['embedder'] is None:
+        from diarization.speaker_embedding import SpeakerEmbedder
+        _worker['embedder'] = SpeakerEmbedder(cache=_worker['cache'])
+    return _worker['embedder']
+
+def process_file(path):
+    """
+    Run noise reduction, VAD and diarization on one file
+
+    Raw PCM and files of at least LONG_FILE_MIN_SECONDS are streamed from
+    disk in long-file mode instead of being loaded whole.
+
+    Args:
+        path (str): Audio file path
+
+    Returns:
+        dict: Per-file results
+    """
+    start_time = time.perf_counter()
+    if path.lower().endswith(RAW_EXTENSIONS) or sf.info(path).duration >= LONG_FILE_MIN_SECONDS:
+        diarizer = _worker['diarizer']
+        # Without embeddings, labels only carry over through window overlaps
+        embedder = _long_file_embedder() if diarizer is not None else None
+        vad = _worker['vad']
+        result = process_long_file(path, diarizer, embedder,
+                                   parallel_vad=vad if isinstance(vad, ParallelVAD) else None)
+        result['processing_time'] = time.perf_counter() - start_time
+        return result
+
+    audio = load_mono(path)
+    clean_audio = reduce_noise(audio, sample_rate=SAMPLE_RATE)
+    speech_segments, offsets = _worker['vad'].process_audio(clean_audio, SAMPLE_RATE, return_offsets=True)
+
+    result = {
+        'file': path,
+        'duration': len(audio) / SAMPLE_RATE,
+        'speech_duration': float(sum(len(seg) for seg in speech_segments)) / SAMPLE_RATE,
+        'speech_regions': [{'start': int(s) / SAMPLE_RATE, 'end': int(e) / SAMPLE_RATE} for s, e in offsets],
+        'num_speakers': 0,
+        'segments': []
+    }
+
+    diarizer = _worker['diarizer']
+    if diarizer is not None and speech_segments:
+        # Only the speech is diarized; segment times stay in the original file's timeline
+        diarization_results = diarizer.process_speech_spans(clean_audio, offsets, SAMPLE_RATE)
+        result['num_speakers'] = diarization_results['num_speakers']
+        result['segments'] = diarization_results['segments']
+
+    result['processing_time'] = time.perf_counter() - start_time
+    return result
+
+def write_result(result, path, output_format):
+    """Write a result file atomically so a crash never leaves a partial file behind"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', newline='') as f:
+        if output_format == 'json':
+            json.dump(result, f, indent=2)
+        else:
+            writer = csv.writer(f)
+            writer.writerow(['file', 'speaker', 'start', 'end', 'duration'])
+            for segment in result['segments']:
+                writer.writerow([result['file'], segment['speaker'], f"{segment['start']:.3f}",
+                                 f"{segment['end']:.3f}", f"{segment['duration']:.3f}"])
+    os.replace(temp_path, path)
+
+def run_batch(source, output_dir=OUTPUT_DIR, output_format='json', workers=None,
+              threads_per_worker=1, diarize=True, vad_workers=1):
+    """
+    Process every file of a directory or manifest on a pool of worker processes
+
+    Files that already have a result are skipped, so an interrupted run can
+    simply be started again.
+
+    Args:
+        source (str): Input directory or manifest file
+        output_dir (str): Directory for per-file results
+        output_format (str): 'json' or 'csv'
+        workers (int, optional): Worker processes (default: one per core)
+        threads_per_worker (int): Torch threads per worker
+        diarize (bool): Whether to run speaker diarization
+        vad_workers (int): Processes each worker shards its VAD over
+
+    Returns:
+        dict: Run summary
+    """
+    files = collect_inputs(source)
+    if not files:
+        print(f"No audio files found in {source}")
+        return {'processed': 0, 'skipped': 0, 'failed': 0}
+
+    try:
+        input_root = os.path.commonpath([os.path.dirname(f) for f in files])
+    except ValueError:
+        # No common root, e.g. a manifest spanning drives; write flat result names
+        input_root = None
+    pending = {}
+    for path in files:
+        target = result_path(path, input_root, output_dir, output_format)
+        if not os.path.exists(target):
+            pending[path] = target
+
+    skipped = len(files) - len(pending)
+    print(f"Found {len(files)} files, {skipped} already processed, {len(pending)} to go")
+
+    workers = workers or os.cpu_count() or 1
+    processed = failed = 0
+    audio_seconds = 0.0
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(diarize, threads_per_worker, vad_workers)) as executor:
+        futures = {executor.submit(process_file, path): path for path in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+                write_result(result, pending[path], output_format)
+                processed += 1
+                audio_seconds += result['duration']
+            except Exception as e:
+                failed += 1
+                print(f"Error processing {path}: {str(e)}")
+                continue
+
+            elapsed = time.perf_counter() - start_time
+            print(f"[{processed + failed}/{len(pending)}] {display_name(path, input_root)} "
+                  f"({processed / elapsed:.2f} files/s)")
+
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        'processed': processed,
+        'skipped': skipped,
+        'failed': failed,
+        'elapsed': elapsed,
+        'files_per_second': processed / elapsed if elapsed > 0 else 0.0,
+        'realtime_factor': elapsed / audio_seconds if audio_seconds > 0 else 0.0
+    }
+    print(f"\nProcessed {processed} files in {elapsed:.1f}s "
+          f"({summary['files_per_second']:.2f} files/s, {failed} failed, {skipped} skipped)")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch speaker diarization over recorded files")
+    parser.add_argument("source", help="directory of recordings or manifest file (.txt or .csv)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for per-file results")
+    parser.add_argument("--format", choices=['json', 'csv'], default='json', help="result file format")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--vad-workers", type=int, default=1,
+                        help="shard the VAD of each long file over this many processes")
+    parser.add_argument("--no-diarization", action="store_true", help="only run noise reduction and VAD")
+    args = parser.parse_args()
+
+    run_batch(args.source, output_dir=args.output_dir, output_format=args.format,
+              workers=args.workers, threads_per_worker=args.threads_per_worker,
+              diarize=not args.no_diarization, vad_workers=args.vad_workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from batch_pipeline import collect_inputs, load_mono
+from diarization.model_registry import load_pipeline
+from diarization.inference_profile import apply_cpu_profile, set_torch_threads
+from diarization.speaker_diarization import SpeakerDiarizer
+from utils.config import (SAMPLE_RATE, DIARIZATION_MODEL_ID, DIARIZATION_MODEL_DIR, INFERENCE_THREADS,
+                          SEGMENTATION_STEP, SEGMENTATION_BATCH_SIZE, DIARIZATION_EMBEDDING_BATCH_SIZE)
+from datetime import datetime
+import argparse
+import copy
+import itertools
+import json
+import os
+import platform
+import time
+
+# --quantize choice -> (segmentation, embedding)
+QUANTIZE_CHOICES = {
+    'none': (False, False),
+    'segmentation': (True, False),
+    'embedding': (False, True),
+    'both': (True, True)
+}
+
+def load_reference(audio_path):
+    """Reference annotation from the .rttm file next to the audio, or None"""
+    rttm_path = os.path.splitext(audio_path)[0] + '.rttm'
+    if not os.path.exists(rttm_path):
+        return None
+    from pyannote.core import Annotation
+    from pyannote.database.util import load_rttm
+    annotations = load_rttm(rttm_path)
+    return next(iter(annotations.values())) if annotations else Annotation()
+
+def to_annotation(segments):
+    """Convert segment dicts to a pyannote Annotation"""
+    from pyannote.core import Annotation, Segment
+    annotation = Annotation()
+    for segment in segments:
+        annotation[Segment(segment['start'], segment['end'])] = segment['speaker']
+    return annotation
+
+def setting_name(step, batch_size, quantize):
+    return f"step={step:g} batch={batch_size} quantize={quantize}"
+
+def run_setting(base_pipeline, recordings, step, batch_size, quantize, warmup_seconds=10):
+    """
+    Diarize every recording with one inference setting
+
+    Args:
+        base_pipeline: Loaded pipeline; a copy is configured, so quantization
+            does not leak into other settings
+        recordings (list): (path, audio) pairs
+        step (float): Segmentation step ratio
+        batch_size (int): Segmentation and embedding batch size
+        quantize (str): Key of QUANTIZE_CHOICES
+        warmup_seconds (float): Audio diarized once before timing
+
+    Returns:
+        tuple: (wall seconds over all recordings, list of segment lists)
+    """
+    quantize_segmentation, quantize_embedding = QUANTIZE_CHOICES[quantize]
+    pipeline = apply_cpu_profile(copy.deepcopy(base_pipeline), segmentation_step=step,
+                                 segmentation_batch_size=batch_size, embedding_batch_size=batch_size,
+                                 quantize_segmentation=quantize_segmentation,
+                                 quantize_embedding=quantize_embedding)
+    # No cache: every setting must really run
+    diarizer = SpeakerDiarizer(pipeline=pipeline)
+    diarizer.process_audio(recordings[0][1][:int(warmup_seconds * SAMPLE_RATE)], SAMPLE_RATE)
+
+    outputs = []
+    start_time = time.perf_counter()
+    for _, audio in recordings:
+        outputs.append(diarizer.process_audio(audio, SAMPLE_RATE)['segments'])
+    return time.perf_counter() - start_time, outputs
+
+def run_profiles(paths, steps, batch_sizes, quantize_modes, model_id=DIARIZATION_MODEL_ID,
+                 model_dir=DIARIZATION_MODEL_DIR, pipeline=None):
+    """
+    Measure speed and accuracy of every combination of inference settings
+
+    Accuracy is the diarization error rate against the .rttm file next to
+    each recording. Recordings without one are scored against the output
+    of the baseline setting (pyannote's defaults in float32), so the
+    error then measures how far a setting drifts from full precision.
+
+    Args:
+        paths (list): Audio files of the reference set
+        steps (list): Segmentation step ratios to try
+        batch_sizes (list): Batch sizes to try
+        quantize_modes (list): Keys of QUANTIZE_CHOICES to try
+        model_id (str): Hub model id of the pipeline
+        model_dir (str, optional): Local pipeline directory
+        pipeline (optional): Already loaded pipeline to use instead
+
+    Returns:
+        dict: Results keyed by setting name
+    """
+    from pyannote.metrics.diarization import DiarizationErrorRate
+
+    base_pipeline = pipeline if pipeline is not None else load_pipeline(model_id, model_dir)
+    recordings = [(path, load_mono(path)) for path in paths]
+    audio_seconds = sum(len(audio) for _, audio in recordings) / SAMPLE_RATE
+    references = [load_reference(path) for path, _ in recordings]
+
+    baseline = (SEGMENTATION_STEP, SEGMENTATION_BATCH_SIZE, 'none')
+    settings = [baseline] + [setting for setting in itertools.product(steps, batch_sizes, quantize_modes)
+                             if setting != baseline]
+    baseline_outputs = None
+
+    results = {}
+    print(f"{'setting':>45} {'wall s':>9} {'RTF':>8} {'speedup':>8} {'DER':>7}")
+    for step, batch_size, quantize in settings:
+        wall, outputs = run_setting(base_pipeline, recordings, step, batch_size, quantize)
+        if baseline_outputs is None:
+            baseline_outputs, baseline_wall = outputs, wall
+
+        metric = DiarizationErrorRate()
+        for reference, output, expected in zip(references, outputs, baseline_outputs):
+            if reference is None:
+                reference = to_annotation(expected)
+            metric(reference, to_annotation(output))
+        error = abs(metric)
+
+        name = setting_name(step, batch_size, quantize)
+        results[name] = {
+            'segmentation_step': step,
+            'batch_size': batch_size,
+            'quantize': quantize,
+            'wall_seconds': wall,
+            'realtime_factor': wall / audio_seconds,
+            'speedup': baseline_wall / wall if wall > 0 else float('inf'),
+            'diarization_error_rate': error
+        }
+        print(f"{name:>45} {wall:9.2f} {wall / audio_seconds:8.4f} "
+              f"{results[name]['speedup']:7.2f}x {error:7.2%}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy/speed trade-off of CPU inference settings")
+    parser.add_argument("source", help="reference set: directory or manifest of audio files "
+                        "(an .rttm next to a file is used as its reference)")
+    parser.add_argument("--steps", type=float, nargs="+", default=[SEGMENTATION_STEP, 0.2, 0.5],
+                        help="segmentation step ratios")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[DIARIZATION_EMBEDDING_BATCH_SIZE],
+                        help="segmentation and embedding batch sizes")
+    parser.add_argument("--quantize", nargs="+", choices=list(QUANTIZE_CHOICES),
+                        default=list(QUANTIZE_CHOICES), help="networks to quantize")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS, help="torch threads")
+    parser.add_argument("--model-dir", default=DIARIZATION_MODEL_DIR, help="local pipeline directory")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    set_torch_threads(args.threads)
+    paths = collect_inputs(args.source)
+    if not paths:
+        print(f"No audio files found in {args.source}")
+        return
+
+    results = run_profiles(paths, args.steps, args.batch_sizes, args.quantize, model_dir=args.model_dir)
+    if args.output:
+        import torch
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'threads': torch.get_num_threads(),
+                'platform': platform.platform(),
+                'files': len(paths)
+            },
+            'results': results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
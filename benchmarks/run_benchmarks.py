@@ -0,0 +1,166 @@
+from benchmarks.synthetic import noisy_speech
+from benchmarks.stand_in import StandInDiarizationPipeline
+from audio.noise_reduction import reduce_noise
+from vad.vad import VAD
+from vad.vad_processor import VADProcessor
+from diarization.speaker_diarization import SpeakerDiarizer
+from utils.config import SAMPLE_RATE
+from datetime import datetime
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+def _measure(fn, repeat):
+    """Return (best wall seconds, best CPU seconds, peak traced bytes) of fn()"""
+    # Untimed warm-up: lazy imports (torch for diarization) and first-call setup are not the stage's cost
+    fn()
+    best_wall = best_cpu = float('inf')
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+        best_wall = min(best_wall, time.perf_counter() - wall_start)
+        best_cpu = min(best_cpu, time.process_time() - cpu_start)
+
+    # Memory is measured in a separate run so tracing does not skew the timings
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best_wall, best_cpu, peak
+
+def build_stages(audio):
+    """
+    Prepare the stage functions for one input signal
+
+    Every stage gets the output of the real previous stage, computed once
+    up front, so stages are timed in isolation.
+
+    Returns:
+        dict: Stage name -> zero-argument callable
+    """
+    vad = VAD()
+    vad_processor = VADProcessor()
+    diarizer = SpeakerDiarizer(pipeline=StandInDiarizationPipeline())
+
+    clean_audio = reduce_noise(audio, sample_rate=SAMPLE_RATE)
+    speech_segments = vad.process_audio(clean_audio, SAMPLE_RATE)
+    speech_audio = np.concatenate(speech_segments) if speech_segments else clean_audio
+
+    return {
+        'reduce_noise': lambda: reduce_noise(audio, sample_rate=SAMPLE_RATE),
+        'vad': lambda: vad.process_audio(clean_audio, SAMPLE_RATE),
+        'vad_processor': lambda: vad_processor.process_audio(clean_audio),
+        'concatenate_segments': lambda: np.concatenate(speech_segments),
+        'diarization_stand_in': lambda: diarizer.process_audio(speech_audio, SAMPLE_RATE),
+    }
+
+def run_benchmarks(durations, repeat=3, seed=0, stages=None):
+    """
+    Time every pipeline stage on synthetic audio of each duration
+
+    Args:
+        durations (list): Signal lengths in seconds
+        repeat (int): Timed runs per stage, after one untimed warm-up run; the best run is reported
+        seed (int): Seed of the synthetic signals
+        stages (list, optional): Only run these stages
+
+    Returns:
+        dict: Results keyed by "<stage>@<duration>s"
+    """
+    results = {}
+    for duration in durations:
+        audio, _ = noisy_speech(duration, SAMPLE_RATE, seed=seed)
+        for name, fn in build_stages(audio).items():
+            if stages and name not in stages:
+                continue
+            wall, cpu, peak = _measure(fn, repeat)
+            results[f"{name}@{duration:g}s"] = {
+                'stage': name,
+                'audio_seconds': duration,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'realtime_factor': wall / duration,
+                'throughput_x_realtime': duration / wall if wall > 0 else float('inf'),
+                'samples_per_second': duration * SAMPLE_RATE / wall if wall > 0 else float('inf'),
+                'peak_memory_bytes': peak
+            }
+            print(f"{name:>22} @ {duration:>6g}s: {wall * 1000:9.2f} ms  "
+                  f"RTF {wall / duration:.5f}  peak {peak / 1e6:8.2f} MB")
+    return results
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results with a baseline run
+
+    Args:
+        results (dict): Current results
+        baseline (dict): Baseline results (same keys)
+        tolerance (float): Allowed relative slowdown before flagging a regression
+
+    Returns:
+        list: Keys of stages that got slower than the tolerance allows
+    """
+    regressions = []
+    print(f"\n{'stage':>30} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        ratio = current['wall_seconds'] / max(previous['wall_seconds'], 1e-12)
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:>30} {previous['wall_seconds'] * 1000:12.2f} "
+              f"{current['wall_seconds'] * 1000:12.2f} {ratio:7.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic audio")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60, 600],
+                        help="signal lengths in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, after one untimed warm-up")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic signals")
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.durations, repeat=args.repeat, seed=args.seed, stages=args.stages)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'sample_rate': SAMPLE_RATE,
+            'seed': args.seed,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline allows")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+from utils.config import SAMPLE_RATE
+
+# Fundamental frequency ranges of the synthetic "speakers"
+SPEAKER_PITCH_RANGES = [(95.0, 130.0), (180.0, 240.0), (140.0, 170.0)]
+
+def speech_like(duration, sample_rate=SAMPLE_RATE, seed=0, num_speakers=2, speech_ratio=0.6):
+    """
+    Generate a deterministic speech-like signal with pauses
+
+    Utterances are harmonic stacks with a drifting pitch, a syllable-rate
+    amplitude envelope and a couple of formant-like resonances, separated
+    by silent gaps. Speakers take turns and differ by pitch range.
+
+    Args:
+        duration (float): Length in seconds
+        sample_rate (int): Sample rate of the signal
+        seed (int): Random seed; the same seed always gives the same signal
+        num_speakers (int): Number of alternating speakers
+        speech_ratio (float): Approximate fraction of time with speech
+
+    Returns:
+        tuple: (float32 signal in [-1, 1], list of (start, end, speaker) turns in seconds)
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * sample_rate)
+    audio = np.zeros(num_samples, dtype=np.float32)
+    turns = []
+
+    mean_utterance = 1.8
+    mean_gap = mean_utterance * (1.0 - speech_ratio) / max(speech_ratio, 1e-3)
+    position = int(rng.uniform(0.1, 0.5) * sample_rate)
+    speaker = 0
+    while position < num_samples:
+        length = int(rng.uniform(0.5, 2.0 * mean_utterance - 0.5) * sample_rate)
+        end = min(num_samples, position + length)
+        t = np.arange(end - position, dtype=np.float32) / sample_rate
+
+        low, high = SPEAKER_PITCH_RANGES[speaker % len(SPEAKER_PITCH_RANGES)]
+        f0 = rng.uniform(low, high) * (1.0 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.3, 1.0) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+
+        voiced = np.zeros_like(t)
+        formants = rng.uniform([500, 1200], [900, 2400])
+        for harmonic in range(1, 16):
+            frequency = harmonic * f0
+            # Emphasize harmonics near the formants, roll off the rest
+            gain = sum(np.exp(-((frequency - f) / 250.0) ** 2) for f in formants) + 0.3 / harmonic
+            voiced += gain * np.sin(harmonic * phase)
+
+        syllables = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t) ** 2
+        envelope = syllables * np.minimum(1.0, np.minimum(t, t[::-1]) / 0.02)
+        audio[position:end] = voiced * envelope
+        turns.append((position / sample_rate, end / sample_rate, f"SPEAKER_{speaker:02d}"))
+
+        speaker = (speaker + 1) % num_speakers
+        position = end + int(rng.exponential(mean_gap) * sample_rate) + int(0.15 * sample_rate)
+
+    peak = np.max(np.abs(audio))
+    if peak > 0:
+        audio *= 0.8 / peak
+    return audio, turns
+
+def noise(duration, sample_rate=SAMPLE_RATE, level=0.01, seed=1, color='white'):
+    """
+    Generate deterministic background noise
+
+    Args:
+        duration (float): Length in seconds
+        sample_rate (int): Sample rate of the signal
+        level (float): RMS level
+        seed (int): Random seed
+        color (str): 'white' or 'pink'
+
+    Returns:
+        numpy.ndarray: float32 noise
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * sample_rate)
+    samples = rng.standard_normal(num_samples)
+    if color == 'pink':
+        spectrum = np.fft.rfft(samples)
+        spectrum[1:] /= np.sqrt(np.arange(1, len(spectrum)))
+        samples = np.fft.irfft(spectrum, n=num_samples)
+    samples *= level / max(np.sqrt(np.mean(samples ** 2)), 1e-12)
+    return samples.astype(np.float32)
+
+def noisy_speech(duration, sample_rate=SAMPLE_RATE, seed=0, noise_level=0.01, color='pink'):
+    """
+    Speech-like signal mixed with background noise
+
+    Returns:
+        tuple: (float32 signal, list of (start, end, speaker) turns)
+    """
+    audio, turns = speech_like(duration, sample_rate, seed=seed)
+    audio += noise(duration, sample_rate, level=noise_level, seed=seed + 1, color=color)
+    return np.clip(audio, -1.0, 1.0), turns
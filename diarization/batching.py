@@ -0,0 +1,103 @@
+from concurrent.futures import Future
+from utils.config import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_WAIT
+from utils.metrics import METRICS
+import queue
+import threading
+import time
+
+class BatchScheduler:
+    def __init__(self, batch_fn, max_batch_size=EMBEDDING_BATCH_SIZE, max_wait=EMBEDDING_BATCH_MAX_WAIT,
+                 name="embedding"):
+        """
+        Collect requests from many callers into batched model calls
+
+        A worker thread takes the first pending request, then keeps
+        collecting until max_batch_size requests are gathered or max_wait
+        seconds have passed since the first one, runs batch_fn once on the
+        whole batch and resolves each caller's future with its own result.
+        An idle scheduler adds no delay beyond max_wait to a lone request.
+
+        Args:
+            batch_fn (callable): batch_fn(items) -> sequence of results, one per item
+            max_batch_size (int): Largest batch passed to batch_fn
+            max_wait (float): Seconds to wait for a batch to fill
+            name (str): Label of the batch metrics
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._batch_sizes = METRICS.histogram('inference_batch_size', "Requests per batched model call",
+                                              buckets=(1, 2, 4, 8, 16, 32, 64, 128), model=name)
+        METRICS.gauge('inference_pending_requests', "Requests waiting to be batched", model=name
+                      ).set_function(self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue one request
+
+        Args:
+            item: Input passed to batch_fn as part of a batch
+
+        Returns:
+            concurrent.futures.Future: Resolves to the item's result
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Submit one request and wait for its result"""
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return None
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch first, stop afterwards
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._batch_sizes.observe(len(batch))
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one bad batch stop the thread: later callers would wait forever
+                print(f"Error in batched inference: {str(e)}")
+
+    def _run_batch(self, batch):
+        try:
+            results = self.batch_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def close(self):
+        """Run the requests already queued, then stop the worker thread"""
+        self._queue.put(None)
+        self._thread.join()
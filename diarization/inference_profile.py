@@ -0,0 +1,91 @@
+from utils.config import (INFERENCE_THREADS, SEGMENTATION_STEP, SEGMENTATION_BATCH_SIZE,
+                          DIARIZATION_EMBEDDING_BATCH_SIZE, QUANTIZE_SEGMENTATION, QUANTIZE_EMBEDDING)
+
+def set_torch_threads(threads=INFERENCE_THREADS):
+    """
+    Pin the torch thread pools of this process
+
+    Parallel workers that each keep torch's default (one thread per core)
+    oversubscribe the machine; give each worker its share instead.
+
+    Args:
+        threads (int, optional): Intra-op threads; None leaves torch's default
+    """
+    if threads is None:
+        return
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before the first parallel operation of the process
+        pass
+
+def quantize_model(model):
+    """
+    Dynamic int8 quantization of a model's LSTM and linear layers
+
+    Weights are stored as int8 and activations are quantized on the fly,
+    so no calibration data is needed. Convolutions stay in float32.
+
+    Args:
+        model (torch.nn.Module): Model in eval mode
+
+    Returns:
+        torch.nn.Module: Quantized copy of the model
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    quantized = quantize_dynamic(model, {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    # Result caches key on this, see SpeakerEmbedder
+    quantized.quantized = True
+    return quantized
+
+def apply_cpu_profile(pipeline, segmentation_step=SEGMENTATION_STEP,
+                      segmentation_batch_size=SEGMENTATION_BATCH_SIZE,
+                      embedding_batch_size=DIARIZATION_EMBEDDING_BATCH_SIZE,
+                      quantize_segmentation=QUANTIZE_SEGMENTATION, quantize_embedding=QUANTIZE_EMBEDDING):
+    """
+    Configure a pyannote diarization pipeline for CPU inference
+
+    A larger segmentation step means fewer overlapping windows to run (0.1
+    is pyannote's default: each 10 s window advances by 1 s). Quantization
+    replaces the networks with int8 copies, so apply it to a pipeline that
+    is not in use yet. Check the effect on your data with
+    benchmarks/inference_profile.py before enabling it.
+
+    The applied settings are recorded as pipeline.cpu_profile, so
+    SpeakerDiarizer can keep results of different profiles apart in its
+    cache.
+
+    Args:
+        pipeline (pyannote.audio.pipelines.SpeakerDiarization): Loaded pipeline
+        segmentation_step (float): Window step as a ratio of the window duration
+        segmentation_batch_size (int): Segmentation windows per forward pass
+        embedding_batch_size (int): Embeddings per forward pass
+        quantize_segmentation (bool): Quantize the segmentation network
+        quantize_embedding (bool): Quantize the embedding network
+
+    Returns:
+        pyannote.audio.pipelines.SpeakerDiarization: The same pipeline
+    """
+    segmentation = pipeline._segmentation
+    pipeline.segmentation_step = segmentation_step
+    segmentation.step = segmentation_step * segmentation.duration
+    pipeline.segmentation_batch_size = segmentation_batch_size
+    pipeline.embedding_batch_size = embedding_batch_size
+
+    if quantize_segmentation:
+        segmentation.model = quantize_model(segmentation.model)
+    if quantize_embedding:
+        embedding = pipeline._embedding
+        embedding.model_ = quantize_model(embedding.model_)
+    pipeline.cpu_profile = {
+        'segmentation_step': segmentation_step,
+        'segmentation_batch_size': segmentation_batch_size,
+        'embedding_batch_size': embedding_batch_size,
+        'quantize_segmentation': bool(quantize_segmentation),
+        'quantize_embedding': bool(quantize_embedding),
+    }
+    return pipeline
@@ -0,0 +1,210 @@
+from diarization.inference_profile import apply_cpu_profile, quantize_model
+from utils.config import (DIARIZATION_MODEL_ID, DIARIZATION_MODEL_DIR,
+                          EMBEDDING_MODEL_ID, EMBEDDING_MODEL_DIR, QUANTIZE_EMBEDDING)
+from utils.metrics import METRICS
+import hashlib
+import os
+import threading
+import time
+
+# Process-wide cache of loaded models, keyed by (kind, model id or local path)
+_models = {}
+_lock = threading.Lock()
+
+def get_hf_token():
+    """Return the Hugging Face token from the environment"""
+    return os.getenv('HF_TOKEN', 'Your hugging face token')
+
+def check_model_access(model_id, hf_token):
+    """
+    Check that the token can access a gated model on the Hugging Face hub
+
+    Args:
+        model_id (str): Hub model id, e.g. "pyannote/speaker-diarization-3.1"
+        hf_token (str): Hugging Face access token
+    """
+    import requests
+    import webbrowser
+
+    headers = {"Authorization": f"Bearer {hf_token}"}
+    response = requests.get(f"https://huggingface.co/api/models/{model_id}", headers=headers)
+
+    if response.status_code == 401:
+        print("\nAuthentication failed. Please check your token.")
+        print("Visit https://hf.co/settings/tokens to create a new token.")
+        raise Exception("Invalid Hugging Face token")
+
+    if response.status_code == 403:
+        print("\nYou need to accept the user agreement first!")
+        print("Opening browser to accept the agreement...")
+        webbrowser.open(f"https://hf.co/{model_id}")
+        print("\nPlease:")
+        print("1. Click 'Access repository'")
+        print("2. Accept the terms and conditions")
+        print("3. Run the program again")
+        raise Exception("User agreement not accepted")
+
+def load_pipeline(model_id=DIARIZATION_MODEL_ID, model_dir=None):
+    """
+    Load a diarization pipeline without consulting the registry
+
+    Args:
+        model_id (str): Hub model id, used when model_dir is not given
+        model_dir (str, optional): Local directory (or config.yaml path) of a
+            downloaded pipeline; no network access is made in that case
+
+    Returns:
+        pyannote.audio.Pipeline: The loaded pipeline
+    """
+    from pyannote.audio import Pipeline
+
+    if model_dir:
+        config_path = model_dir
+        if os.path.isdir(model_dir):
+            config_path = os.path.join(model_dir, "config.yaml")
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"No pipeline config found at {config_path}")
+        print(f"Loading speaker diarization model from {config_path}...")
+        pipeline = Pipeline.from_pretrained(config_path)
+        print("Speaker diarization model initialized successfully!")
+        return pipeline
+
+    hf_token = get_hf_token()
+    try:
+        check_model_access(model_id, hf_token)
+
+        print("Initializing speaker diarization model...")
+        pipeline = Pipeline.from_pretrained(model_id, use_auth_token=hf_token)
+        print("Speaker diarization model initialized successfully!")
+        return pipeline
+
+    except Exception as e:
+        print(f"\nError initializing speaker diarization: {str(e)}")
+        print("\nTroubleshooting steps:")
+        print(f"1. Make sure you've accepted the user agreement at https://hf.co/{model_id}")
+        print("2. Verify your token is correct")
+        print("3. Try setting the token in your environment:")
+        print("   - Windows: set HF_TOKEN=your_token_here")
+        print("   - Linux/Mac: export HF_TOKEN=your_token_here")
+        print("4. On machines without internet access, set DIARIZATION_MODEL_DIR "
+              "to a local copy of the pipeline")
+        raise
+
+def load_embedding_model(model_id=EMBEDDING_MODEL_ID, model_dir=None):
+    """
+    Load a speaker embedding model without consulting the registry
+
+    Args:
+        model_id (str): Hub model id, used when model_dir is not given
+        model_dir (str, optional): Local checkpoint file, or a directory
+            holding pytorch_model.bin; no network access is made in that case
+
+    Returns:
+        pyannote.audio.Model: The loaded model
+    """
+    from pyannote.audio import Model
+
+    if model_dir:
+        checkpoint = model_dir
+        if os.path.isdir(model_dir):
+            checkpoint = os.path.join(model_dir, "pytorch_model.bin")
+        if not os.path.exists(checkpoint):
+            raise FileNotFoundError(f"No embedding checkpoint found at {checkpoint}")
+        print(f"Loading speaker embedding model from {checkpoint}...")
+        model = Model.from_pretrained(checkpoint)
+    else:
+        hf_token = get_hf_token()
+        check_model_access(model_id, hf_token)
+        print("Initializing speaker embedding model...")
+        model = Model.from_pretrained(model_id, use_auth_token=hf_token)
+    model.eval()
+    print("Speaker embedding model initialized successfully!")
+    return model
+
+def model_version(model_id, model_dir=None):
+    """
+    Identify the model a result came from, for result cache keys
+
+    A hub model is identified by its id. A local model is identified by its
+    path and the names, sizes and modification times of its files, so
+    pointing model_dir at another model, or replacing the files in place,
+    never returns results of the previous model.
+
+    Args:
+        model_id (str): Hub model id
+        model_dir (str, optional): Local model directory or file
+
+    Returns:
+        str: Version string
+    """
+    if not model_dir:
+        return model_id
+    model_dir = os.path.abspath(model_dir)
+    digest = hashlib.blake2b(digest_size=10)
+    if os.path.isdir(model_dir):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(model_dir) for name in names)
+    else:
+        paths = [model_dir]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        digest.update(f"{os.path.relpath(path, model_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return f"{model_dir}@{digest.hexdigest()}"
+
+def _get_cached(kind, model_id, model_dir, loader):
+    """Return a cached model, loading it once under the registry lock"""
+    key = (kind, os.path.abspath(model_dir) if model_dir else model_id)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        if key not in _models:
+            start_time = time.perf_counter()
+            _models[key] = loader(model_id, model_dir)
+            METRICS.gauge('model_load_seconds', "Time taken to load each model",
+                          kind=kind).set(time.perf_counter() - start_time)
+        return _models[key]
+
+def get_pipeline(model_id=DIARIZATION_MODEL_ID, model_dir=DIARIZATION_MODEL_DIR):
+    """
+    Return the shared diarization pipeline, loading it on first use
+
+    Concurrent first calls wait for a single load instead of each loading
+    their own copy. The CPU inference profile from the config is applied
+    once, right after loading.
+
+    Args:
+        model_id (str): Hub model id
+        model_dir (str, optional): Local pipeline directory; takes precedence
+            over model_id
+
+    Returns:
+        pyannote.audio.Pipeline: The warm pipeline
+    """
+    return _get_cached('pipeline', model_id, model_dir,
+                       lambda model_id, model_dir: apply_cpu_profile(load_pipeline(model_id, model_dir)))
+
+def get_embedding_model(model_id=EMBEDDING_MODEL_ID, model_dir=EMBEDDING_MODEL_DIR):
+    """
+    Return the shared speaker embedding model, loading it on first use
+
+    Args:
+        model_id (str): Hub model id
+        model_dir (str, optional): Local checkpoint; takes precedence over model_id
+
+    Returns:
+        pyannote.audio.Model: The warm model
+    """
+    def load(model_id, model_dir):
+        model = load_embedding_model(model_id, model_dir)
+        return quantize_model(model) if QUANTIZE_EMBEDDING else model
+
+    return _get_cached('embedding', model_id, model_dir, load)
+
+def clear_registry():
+    """Drop all cached models so the next call reloads them"""
+    with _lock:
+        _models.clear()
@@ -0,0 +1,106 @@
+import numpy as np
+from utils.config import (SAMPLE_RATE, ONLINE_DIARIZATION_THRESHOLD, ONLINE_MIN_SEGMENT_SECONDS,
+                          ONLINE_MAX_SPEAKERS)
+
+class OnlineDiarizer:
+    def __init__(self, embedder=None, threshold=ONLINE_DIARIZATION_THRESHOLD,
+                 min_segment_seconds=ONLINE_MIN_SEGMENT_SECONDS, max_speakers=ONLINE_MAX_SPEAKERS):
+        """
+        Label speech segments one at a time by incremental clustering
+
+        Each new segment is embedded once and compared with the centroids
+        of the speakers seen so far. It joins the most similar speaker if
+        the cosine similarity reaches threshold, and that centroid is
+        updated in place; otherwise it starts a new speaker. Labels are
+        never renumbered, and the cost per segment depends on the number
+        of speakers only, not on how long the session has run.
+
+        Args:
+            embedder (SpeakerEmbedder, optional): Embedding model wrapper
+            threshold (float): Minimum cosine similarity to join a speaker
+            min_segment_seconds (float): Shorter segments are assigned to the
+                closest speaker but neither update centroids nor start speakers
+            max_speakers (int): Speakers created at most; later segments
+                join the closest one
+        """
+        if embedder is None:
+            from diarization.speaker_embedding import SpeakerEmbedder
+            embedder = SpeakerEmbedder()
+        self.embedder = embedder
+        self.threshold = threshold
+        self.min_segment_seconds = min_segment_seconds
+        self.max_speakers = max_speakers
+        self.reset()
+
+    def reset(self):
+        """Forget all speakers"""
+        self.labels = []
+        self._sums = None  # (max_speakers, dimension) running sums of unit embeddings
+        self._centroids = None  # the same, normalized; what segments are scored against
+        self.counts = np.zeros(self.max_speakers, dtype=np.int64)
+
+    @property
+    def num_speakers(self):
+        return len(self.labels)
+
+    def assign(self, embedding, update=True):
+        """
+        Assign one embedding to a speaker
+
+        Args:
+            embedding (numpy.ndarray): Speaker embedding
+            update (bool): Whether the embedding may move a centroid or start a speaker
+
+        Returns:
+            tuple: (speaker label, cosine similarity to its centroid before the update)
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        if self._sums is None:
+            self._sums = np.zeros((self.max_speakers, len(embedding)), dtype=np.float32)
+            self._centroids = np.zeros_like(self._sums)
+
+        n = len(self.labels)
+        best, score = -1, -1.0
+        if n:
+            scores = self._centroids[:n] @ embedding
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+
+        if n and (score >= self.threshold or not update or n == self.max_speakers):
+            if update:
+                self._sums[best] += embedding
+                self._centroids[best] = self._sums[best] / max(float(np.linalg.norm(self._sums[best])), 1e-12)
+                self.counts[best] += 1
+            return self.labels[best], score
+
+        # New speaker
+        self.labels.append(f"SPEAKER_{n:02d}")
+        self._sums[n] = embedding
+        self._centroids[n] = embedding
+        self.counts[n] = 1
+        return self.labels[n], 1.0
+
+    def process_segment(self, audio_data, sample_rate=SAMPLE_RATE, start=0.0):
+        """
+        Label one speech segment
+
+        Args:
+            audio_data (numpy.ndarray): Mono audio of the segment
+            sample_rate (int): Sample rate of the audio
+            start (float): Start of the segment on the session timeline
+
+        Returns:
+            dict: Segment with 'speaker', 'start', 'end', 'duration' and 'score'
+        """
+        duration = len(audio_data) / sample_rate
+        embedding = self.embedder.embed(audio_data, sample_rate)
+        speaker, score = self.assign(embedding, update=duration >= self.min_segment_seconds
+                                     or not self.labels)
+        return {
+            'speaker': speaker,
+            'start': start,
+            'end': start + duration,
+            'duration': duration,
+            'score': score
+        }
@@ -1,111 +1,145 @@
-import torch
-from pyannote.audio import Pipeline
-from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
-import numpy as np
-import soundfile as sf
-from utils.config import SAMPLE_RATE, DIARIZATION_MIN_SPEAKERS, DIARIZATION_MAX_SPEAKERS
-import os
-import requests
-import webbrowser
-
-class SpeakerDiarizer:
-    def __init__(self):
-        # Get Hugging Face token from environment variable
-        hf_token = os.getenv('HF_TOKEN', 'Your hugging face token')
-        
-        try:
-            # Check if user has accepted the agreement
-            headers = {"Authorization": f"Bearer {hf_token}"}
-            response = requests.get(
-                "https://huggingface.co/api/models/pyannote/speaker-diarization-3.1",
-                headers=headers
-            )
-            
-            if response.status_code == 401:
-                print("\nAuthentication failed. Please check your token.")
-                print("Visit https://hf.co/settings/tokens to create a new token.")
-                raise Exception("Invalid Hugging Face token")
-            
-            if response.status_code == 403:
-                print("\nYou need to accept the user agreement first!")
-                print("Opening browser to accept the agreement...")
-                webbrowser.open("https://hf.co/pyannote/speaker-diarization-3.1")
-                print("\nPlease:")
-                print("1. Click 'Access repository'")
-                print("2. Accept the terms and conditions")
-                print("3. Run the program again")
-                raise Exception("User agreement not accepted")
-            
-            # Initialize the pipeline with authentication
-            print("Initializing speaker diarization model...")
-            self.pipeline = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.1",
-                use_auth_token=hf_token
-            )
-            print("Speaker diarization model initialized successfully!")
-            
-        except Exception as e:
-            print(f"\nError initializing speaker diarization: {str(e)}")
-            print("\nTroubleshooting steps:")
-            print("1. Make sure you've accepted the user agreement at https://hf.co/pyannote/speaker-diarization-3.1")
-            print("2. Verify your token is correct")
-            print("3. Try setting the token in your environment:")
-            print("   - Windows: set HF_TOKEN=your_token_here")
-            print("   - Linux/Mac: export HF_TOKEN=your_token_here")
-            raise
-
-    def process_audio(self, audio_data, sample_rate=SAMPLE_RATE, num_speakers=None):
-        """
-        Process audio data to detect and separate speakers
-        
-        Args:
-            audio_data (numpy.ndarray): Audio data
-            sample_rate (int): Sample rate of the audio
-            num_speakers (int, optional): Number of speakers to detect
-        Returns:
-            dict: Dictionary containing speaker segments and their timestamps
-        """
-        # Save audio to temporary file
-        temp_file = "temp_audio.wav"
-        sf.write(temp_file, audio_data, sample_rate)
-        
-        try:
-            # Process the audio file
-            if num_speakers is not None:
-                diarization = self.pipeline(temp_file, num_speakers=num_speakers)
-            else:
-                diarization = self.pipeline(temp_file)
-            
-            # Extract speaker segments
-            speaker_segments = []
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                speaker_segments.append({
-                    'speaker': speaker,
-                    'start': turn.start,
-                    'end': turn.end,
-                    'duration': turn.duration
-                })
-            
-            return {
-                'num_speakers': len(set(seg['speaker'] for seg in speaker_segments)),
-                'segments': speaker_segments
-            }
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-
-def get_speaker_segments(audio_data, sample_rate, num_speakers=None):
-    """
-    Get speaker segments from audio data
-    
-    Args:
-        audio_data (numpy.ndarray): Audio data
-        sample_rate (int): Sample rate of the audio
-        num_speakers (int, optional): Number of speakers to detect
-    Returns:
-        dict: Dictionary containing speaker segments and their timestamps
-    """
-    diarizer = SpeakerDiarizer()
-    return diarizer.process_audio(audio_data, sample_rate, num_speakers=num_speakers) 
+import numpy as np
+from diarization.model_registry import get_pipeline, model_version
+from utils.cache import ResultCache
+from utils.timeline import OffsetMap
+from utils.config import (SAMPLE_RATE, DIARIZATION_MIN_SPEAKERS, DIARIZATION_MAX_SPEAKERS,
+                          DIARIZATION_MODEL_ID, DIARIZATION_MODEL_DIR, CACHE_ENABLED)
+import threading
+
+_shared_diarizer = None
+_shared_lock = threading.Lock()
+
+class SpeakerDiarizer:
+    def __init__(self, model_id=DIARIZATION_MODEL_ID, model_dir=DIARIZATION_MODEL_DIR, pipeline=None,
+                 cache=None):
+        """
+        Initialize speaker diarization
+
+        The pipeline comes from the process-wide model registry, so creating
+        several diarizers only loads the model once.
+
+        Args:
+            model_id (str): Hugging Face model id of the pipeline
+            model_dir (str, optional): Local pipeline directory; skips the hub
+            pipeline (callable, optional): Already loaded pipeline to use as is
+            cache (ResultCache, optional): Cache of results for audio seen before
+        """
+        self.model_id = model_id
+        # Cache keys name the model actually loaded, including a local model_dir
+        self.model_version = model_version(model_id, model_dir)
+        self.cache = cache
+        self.pipeline = pipeline if pipeline is not None else get_pipeline(model_id, model_dir)
+
+    def process_audio(self, audio_data, sample_rate=SAMPLE_RATE, num_speakers=None):
+        """
+        Process audio data to detect and separate speakers
+        
+        Args:
+            audio_data (numpy.ndarray): Audio data
+            sample_rate (int): Sample rate of the audio
+            num_speakers (int, optional): Number of speakers to detect
+        Returns:
+            dict: Dictionary containing speaker segments and their timestamps
+        """
+        if self.cache is not None:
+            # Segmentation step and quantization change the result, so they are part of the key
+            cache_key = ResultCache.make_key(audio_data, sample_rate, self.model_version,
+                                             num_speakers=num_speakers,
+                                             profile=getattr(self.pipeline, 'cpu_profile', None))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return {
+                    'num_speakers': len(set(seg['speaker'] for seg in cached['segments'])),
+                    'segments': cached['segments']
+                }
+
+        import torch
+
+        # Hand the waveform to pyannote in memory as a (channel, time) tensor
+        waveform = torch.from_numpy(np.ascontiguousarray(audio_data, dtype=np.float32))
+        if waveform.ndim == 1:
+            waveform = waveform.unsqueeze(0)
+        else:
+            waveform = waveform.T
+        audio_input = {'waveform': waveform, 'sample_rate': sample_rate}
+
+        # Process the audio; no autograd bookkeeping is needed anywhere in the pipeline
+        with torch.inference_mode():
+            if num_speakers is not None:
+                diarization = self.pipeline(audio_input, num_speakers=num_speakers)
+            else:
+                diarization = self.pipeline(audio_input)
+
+        # Extract speaker segments
+        speaker_segments = []
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            speaker_segments.append({
+                'speaker': speaker,
+                'start': turn.start,
+                'end': turn.end,
+                'duration': turn.duration
+            })
+
+        if self.cache is not None:
+            self.cache.put(cache_key, speaker_segments)
+
+        return {
+            'num_speakers': len(set(seg['speaker'] for seg in speaker_segments)),
+            'segments': speaker_segments
+        }
+
+    def process_speech_spans(self, audio_data, spans, sample_rate=SAMPLE_RATE, num_speakers=None):
+        """
+        Diarize only the speech spans of a recording, keeping its timeline
+
+        Args:
+            audio_data (numpy.ndarray): Full recording
+            spans (numpy.ndarray): (n, 2) [start, end) sample indices of speech,
+                e.g. from VAD.process_audio(..., return_offsets=True)
+            sample_rate (int): Sample rate of the audio
+            num_speakers (int, optional): Number of speakers to detect
+        Returns:
+            dict: Dictionary containing speaker segments with timestamps in the
+                  original recording
+        """
+        offset_map = OffsetMap(spans, sample_rate)
+        if offset_map.speech_samples == 0:
+            return {'num_speakers': 0, 'segments': []}
+
+        results = self.process_audio(offset_map.extract(audio_data), sample_rate, num_speakers=num_speakers)
+        return {
+            'num_speakers': results['num_speakers'],
+            'segments': offset_map.map_segments(results['segments'])
+        }
+
+def get_diarizer():
+    """
+    Return the process-wide SpeakerDiarizer, creating it on first use
+
+    Returns:
+        SpeakerDiarizer: Diarizer holding the warm pipeline
+    """
+    global _shared_diarizer
+    if _shared_diarizer is None:
+        with _shared_lock:
+            if _shared_diarizer is None:
+                _shared_diarizer = SpeakerDiarizer(cache=ResultCache() if CACHE_ENABLED else None)
+    return _shared_diarizer
+
+def get_speaker_segments(audio_data, sample_rate, num_speakers=None, spans=None):
+    """
+    Get speaker segments from audio data
+    
+    Args:
+        audio_data (numpy.ndarray): Audio data
+        sample_rate (int): Sample rate of the audio
+        num_speakers (int, optional): Number of speakers to detect
+        spans (numpy.ndarray, optional): Speech [start, end) sample indices;
+            when given only these are diarized and times stay in audio_data's timeline
+    Returns:
+        dict: Dictionary containing speaker segments and their timestamps
+    """
+    diarizer = get_diarizer()
+    if spans is not None:
+        return diarizer.process_speech_spans(audio_data, spans, sample_rate, num_speakers=num_speakers)
+    return diarizer.process_audio(audio_data, sample_rate, num_speakers=num_speakers) 
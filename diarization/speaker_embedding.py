@@ -0,0 +1,137 @@
+import numpy as np
+from diarization.model_registry import get_embedding_model, model_version
+from utils.cache import ResultCache
+from utils.config import (SAMPLE_RATE, EMBEDDING_MODEL_ID, EMBEDDING_MODEL_DIR,
+                          EMBEDDING_MIN_DURATION, EMBEDDING_BATCH_SIZE, EMBEDDING_BUCKET_RATIO)
+
+class SpeakerEmbedder:
+    def __init__(self, model_id=EMBEDDING_MODEL_ID, model_dir=EMBEDDING_MODEL_DIR, model=None,
+                 cache=None):
+        """
+        Compute one speaker embedding per piece of audio
+
+        Args:
+            model_id (str): Hugging Face model id of the embedding model
+            model_dir (str, optional): Local checkpoint; skips the hub
+            model (pyannote.audio.Model, optional): Already loaded model
+            cache (ResultCache, optional): Cache of segment embeddings
+        """
+        from pyannote.audio import Inference
+
+        self.model_id = model_id
+        self.model_version = model_version(model_id, model_dir)
+        self.cache = cache
+        self.model = model if model is not None else get_embedding_model(model_id, model_dir)
+        self.inference = Inference(self.model, window="whole")
+
+    def embed(self, audio_data, sample_rate=SAMPLE_RATE):
+        """
+        Compute the embedding of a mono clip
+
+        Args:
+            audio_data (numpy.ndarray): Audio data
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            numpy.ndarray: float32 embedding vector
+        """
+        import torch
+
+        audio_data = np.asarray(audio_data, dtype=np.float32)
+        min_samples = int(EMBEDDING_MIN_DURATION * sample_rate)
+        if len(audio_data) < min_samples:
+            audio_data = np.pad(audio_data, (0, min_samples - len(audio_data)))
+        waveform = torch.from_numpy(np.ascontiguousarray(audio_data)).unsqueeze(0)
+        embedding = self.inference({'waveform': waveform, 'sample_rate': sample_rate})
+        return np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+    def embed_batch(self, clips, sample_rate=SAMPLE_RATE, batch_size=EMBEDDING_BATCH_SIZE,
+                    bucket_ratio=EMBEDDING_BUCKET_RATIO):
+        """
+        Compute the embeddings of several clips with batched forward passes
+
+        Clips are sorted by length and grouped so that the longest clip of
+        a batch is at most bucket_ratio times the shortest. Shorter clips
+        are filled up by repeating themselves (which keeps the per-clip
+        feature normalization close to the unpadded clip) and the padding
+        is masked out of the statistics pooling.
+
+        Args:
+            clips (list): Mono audio arrays
+            sample_rate (int): Sample rate of the audio
+            batch_size (int): Largest number of clips per forward pass
+            bucket_ratio (float): Padding allowed within a batch
+
+        Returns:
+            numpy.ndarray: (num_clips, dimension) float32 embeddings
+        """
+        if sample_rate != self.model.audio.sample_rate:
+            # The batched path feeds the model directly and does not resample
+            return np.stack([self.embed(clip, sample_rate) for clip in clips])
+
+        min_samples = int(EMBEDDING_MIN_DURATION * sample_rate)
+        lengths = np.array([max(len(clip), min_samples) for clip in clips])
+        order = np.argsort(lengths, kind='stable')
+        embeddings = None
+
+        start = 0
+        while start < len(order):
+            end = start + 1
+            while (end < len(order) and end - start < batch_size
+                   and lengths[order[end]] <= lengths[order[start]] * bucket_ratio):
+                end += 1
+            batch = order[start:end]
+            result = self._forward([clips[i] for i in batch], lengths[batch])
+            if embeddings is None:
+                embeddings = np.empty((len(clips), result.shape[1]), dtype=np.float32)
+            embeddings[batch] = result
+            start = end
+        return embeddings
+
+    def _forward(self, clips, lengths):
+        """One forward pass over clips padded to the longest; lengths include the minimum-duration padding"""
+        import torch
+
+        frame_shift = self.model.audio.sample_rate // 100  # mask resolution, interpolated by the pooling
+        num_samples = int(lengths.max())
+        waveforms = np.empty((len(clips), 1, num_samples), dtype=np.float32)
+        weights = np.zeros((len(clips), max(1, num_samples // frame_shift)), dtype=np.float32)
+        for row, (clip, length) in enumerate(zip(clips, lengths)):
+            clip = np.asarray(clip, dtype=np.float32)
+            if len(clip) < length:
+                clip = np.pad(clip, (0, length - len(clip)))
+            waveforms[row, 0] = np.resize(clip, num_samples)
+            weights[row, :max(1, length // frame_shift)] = 1.0
+
+        with torch.inference_mode():
+            embeddings = self.model(torch.from_numpy(waveforms), weights=torch.from_numpy(weights))
+        return embeddings.numpy().astype(np.float32, copy=False)
+
+    def embed_segments(self, audio_data, segments, sample_rate=SAMPLE_RATE):
+        """
+        Compute one embedding per diarized segment
+
+        Args:
+            audio_data (numpy.ndarray): Audio the segment times refer to
+            segments (list): Segment dicts with 'start' and 'end' in seconds
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            numpy.ndarray: (num_segments, dimension) float32 embeddings
+        """
+        if self.cache is not None:
+            bounds = [[seg['start'], seg['end']] for seg in segments]
+            cache_key = ResultCache.make_key(audio_data, sample_rate, self.model_version,
+                                             segments=bounds,
+                                             quantized=getattr(self.model, 'quantized', False))
+            cached = self.cache.get(cache_key)
+            if cached is not None and cached['embeddings'] is not None:
+                return cached['embeddings']
+
+        clips = [audio_data[int(seg['start'] * sample_rate):int(seg['end'] * sample_rate)]
+                 for seg in segments]
+        embeddings = self.embed_batch(clips, sample_rate)
+
+        if self.cache is not None:
+            self.cache.put(cache_key, bounds, embeddings)
+        return embeddings
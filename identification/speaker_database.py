@@ -0,0 +1,174 @@
+import numpy as np
+import json
+import os
+from utils.config import SPEAKER_DB_DIR, IDENTIFICATION_THRESHOLD, IDENTIFICATION_TOP_K
+
+UNKNOWN_SPEAKER = "unknown"
+
+def normalize_rows(embeddings):
+    """Scale each row to unit length so dot products are cosine similarities"""
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+class SpeakerDatabase:
+    def __init__(self, db_dir=SPEAKER_DB_DIR, initial_capacity=1024):
+        """
+        Persistent store of enrolled speaker embeddings
+
+        Each enrolled speaker is one unit-length row of a memory-mapped
+        float32 matrix (embeddings.npy), so lookups are a single matrix
+        product no matter how many speakers are enrolled. Names and
+        enrollment counts are kept in speakers.json.
+
+        Args:
+            db_dir (str): Directory holding the database files
+            initial_capacity (int): Rows allocated when the matrix is created
+        """
+        self.db_dir = db_dir
+        self.initial_capacity = initial_capacity
+        self.matrix_path = os.path.join(db_dir, "embeddings.npy")
+        self.meta_path = os.path.join(db_dir, "speakers.json")
+        self.names = []
+        self.counts = []
+        self.dimension = None
+        self._matrix = None
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.names = meta['names']
+            self.counts = meta['counts']
+            self.dimension = meta['dimension']
+            self._matrix = np.load(self.matrix_path, mmap_mode='r+')
+        self._index = {name: row for row, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    @property
+    def embeddings(self):
+        """(num_speakers, dimension) view of the enrolled embeddings"""
+        if self._matrix is None:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return self._matrix[:len(self.names)]
+
+    def _ensure_capacity(self, rows):
+        """Grow the memory-mapped matrix (by doubling) to hold at least rows"""
+        if self._matrix is not None and rows <= len(self._matrix):
+            return
+
+        os.makedirs(self.db_dir, exist_ok=True)
+        capacity = max(rows, self.initial_capacity)
+        if self._matrix is not None:
+            capacity = max(capacity, 2 * len(self._matrix))
+
+        temp_path = self.matrix_path + ".tmp.npy"
+        grown = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32,
+                                          shape=(capacity, self.dimension))
+        if self._matrix is not None:
+            grown[:len(self.names)] = self._matrix[:len(self.names)]
+        grown.flush()
+        del grown
+        self._matrix = None
+        os.replace(temp_path, self.matrix_path)
+        self._matrix = np.load(self.matrix_path, mmap_mode='r+')
+
+    def enroll(self, name, embeddings):
+        """
+        Add a speaker, or refine an enrolled speaker with more embeddings
+
+        Args:
+            name (str): Speaker name
+            embeddings (numpy.ndarray): One embedding or (n, dimension) embeddings
+                computed from the speaker's reference audio
+
+        Returns:
+            int: Row of the speaker in the embedding matrix
+        """
+        embeddings = normalize_rows(embeddings)
+        if self.dimension is None:
+            self.dimension = embeddings.shape[1]
+        if embeddings.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional embeddings, "
+                             f"got {embeddings.shape[1]}")
+
+        row = self._index.get(name)
+        if row is None:
+            row = len(self.names)
+            self._ensure_capacity(row + 1)
+            self.names.append(name)
+            self.counts.append(0)
+            self._index[name] = row
+            centroid = embeddings.sum(axis=0)
+        else:
+            centroid = self._matrix[row] * self.counts[row] + embeddings.sum(axis=0)
+
+        self._matrix[row] = normalize_rows(centroid)[0]
+        self.counts[row] += len(embeddings)
+        return row
+
+    def search(self, queries, top_k=IDENTIFICATION_TOP_K):
+        """
+        Find the most similar enrolled speakers for a batch of embeddings
+
+        Args:
+            queries (numpy.ndarray): One embedding or (m, dimension) embeddings
+            top_k (int): Number of candidates per query
+
+        Returns:
+            tuple: (rows, scores), both (m, k) with the best match first
+        """
+        queries = normalize_rows(queries)
+        num_speakers = len(self.names)
+        if num_speakers == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        scores = queries @ self.embeddings.T
+        k = min(top_k, num_speakers)
+        if k < num_speakers:
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.broadcast_to(np.arange(num_speakers), scores.shape)
+        top_scores = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def identify(self, queries, threshold=IDENTIFICATION_THRESHOLD, top_k=IDENTIFICATION_TOP_K):
+        """
+        Name the speaker of each query embedding
+
+        Args:
+            queries (numpy.ndarray): One embedding or (m, dimension) embeddings
+            threshold (float): Minimum cosine similarity for a match
+            top_k (int): Number of candidates to report per query
+
+        Returns:
+            list: One dict per query with 'speaker' (UNKNOWN_SPEAKER when the
+                  best score is below threshold), 'score' and 'candidates'
+        """
+        rows, scores = self.search(queries, top_k)
+        results = []
+        for query_rows, query_scores in zip(rows, scores):
+            candidates = [(self.names[r], float(s)) for r, s in zip(query_rows, query_scores)]
+            if candidates and candidates[0][1] >= threshold:
+                speaker, score = candidates[0]
+            else:
+                speaker = UNKNOWN_SPEAKER
+                score = candidates[0][1] if candidates else 0.0
+            results.append({'speaker': speaker, 'score': score, 'candidates': candidates})
+        return results
+
+    def flush(self):
+        """Write the matrix and speaker list to disk"""
+        os.makedirs(self.db_dir, exist_ok=True)
+        if self._matrix is not None:
+            self._matrix.flush()
+        temp_path = self.meta_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'dimension': self.dimension, 'names': self.names, 'counts': self.counts}, f)
+        os.replace(temp_path, self.meta_path)
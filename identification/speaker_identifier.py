@@ -0,0 +1,65 @@
+from diarization.speaker_embedding import SpeakerEmbedder
+from identification.speaker_database import SpeakerDatabase
+from utils.cache import ResultCache
+from utils.config import SAMPLE_RATE, IDENTIFICATION_THRESHOLD, IDENTIFICATION_TOP_K, CACHE_ENABLED
+
+class SpeakerIdentifier:
+    def __init__(self, database=None, embedder=None, threshold=IDENTIFICATION_THRESHOLD,
+                 top_k=IDENTIFICATION_TOP_K):
+        """
+        Enroll speakers from reference audio and name diarized segments
+
+        Args:
+            database (SpeakerDatabase, optional): Enrollment database
+            embedder (SpeakerEmbedder, optional): Embedding model wrapper
+            threshold (float): Minimum cosine similarity for a match
+            top_k (int): Number of candidates reported per segment
+        """
+        self.database = database if database is not None else SpeakerDatabase()
+        if embedder is None:
+            embedder = SpeakerEmbedder(cache=ResultCache() if CACHE_ENABLED else None)
+        self.embedder = embedder
+        self.threshold = threshold
+        self.top_k = top_k
+
+    def enroll(self, name, clips, sample_rate=SAMPLE_RATE):
+        """
+        Enroll a speaker from one or more reference recordings
+
+        Args:
+            name (str): Speaker name
+            clips (list): Mono audio arrays of the speaker
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            int: Row of the speaker in the database
+        """
+        embeddings = self.embedder.embed_batch(clips, sample_rate)
+        row = self.database.enroll(name, embeddings)
+        self.database.flush()
+        print(f"Enrolled {name} from {len(clips)} recording(s)")
+        return row
+
+    def identify_segments(self, audio_data, segments, sample_rate=SAMPLE_RATE):
+        """
+        Match diarized segments against the enrolled speakers
+
+        Args:
+            audio_data (numpy.ndarray): Audio the segment times refer to
+            segments (list): Segment dicts with 'start' and 'end' in seconds
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            list: Copies of the segments with 'identity', 'score' and
+                  'candidates' added
+        """
+        if not segments:
+            return []
+        embeddings = self.embedder.embed_segments(audio_data, segments, sample_rate)
+        matches = self.database.identify(embeddings, self.threshold, self.top_k)
+
+        identified = []
+        for segment, match in zip(segments, matches):
+            identified.append(dict(segment, identity=match['speaker'], score=match['score'],
+                                   candidates=match['candidates']))
+        return identified
@@ -1,7 +1,49 @@
-from vad_pipeline import run_vad_pipeline
-
-def main():
-    run_vad_pipeline()
-
-if __name__ == "__main__":
-    main()
+import argparse
+from vad_pipeline import run_vad_pipeline, run_streaming_pipeline, enroll_speaker, warmup
+from diarization.inference_profile import set_torch_threads
+from pipeline.engine import run_pipeline
+from utils.config import METRICS_PORT, INFERENCE_THREADS, PIPELINE_CONFIG
+from utils.metrics import serve_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time speaker detection and diarization")
+    parser.add_argument("--stream", action="store_true",
+                        help="process microphone input continuously, one result per utterance")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="seconds to run in streaming mode (default: until Ctrl+C)")
+    parser.add_argument("--enroll", metavar="NAME",
+                        help="enroll a speaker for identification instead of running the pipeline")
+    parser.add_argument("--audio", nargs="+", metavar="FILE",
+                        help="reference recordings for --enroll (default: record from the microphone)")
+    parser.add_argument("--headless", action="store_true",
+                        help="production mode: no playback, artifacts written in the background")
+    parser.add_argument("--no-save", action="store_true", help="do not write audio artifacts")
+    parser.add_argument("--warmup", action="store_true",
+                        help="load and prime all models before processing any audio")
+    parser.add_argument("--metrics-port", type=int, nargs="?", const=METRICS_PORT, default=None,
+                        help=f"serve Prometheus metrics on localhost (default port: {METRICS_PORT})")
+    parser.add_argument("--config", nargs="?", const=PIPELINE_CONFIG, default=None,
+                        help="run the stage graph described by a JSON pipeline config "
+                             "(default: pipeline/default.json)")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS,
+                        help="torch threads for model inference (default: torch's choice)")
+    args = parser.parse_args()
+
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_port)
+    set_torch_threads(args.threads)
+
+    if args.warmup:
+        warmup(diarize=not args.stream, online=args.stream)
+
+    if args.enroll:
+        enroll_speaker(args.enroll, args.audio)
+    elif args.config:
+        run_pipeline(args.config)
+    elif args.stream:
+        run_streaming_pipeline(duration=args.duration, save_artifacts=not args.no_save)
+    else:
+        run_vad_pipeline(headless=args.headless, save_artifacts=not args.no_save)
+
+if __name__ == "__main__":
+    main()
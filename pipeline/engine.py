@@ -0,0 +1,310 @@
+from pipeline.stages import SourceStage, create_stage, stage_class
+from diarization.inference_profile import set_torch_threads
+from utils.config import PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_MAX_WAIT
+from utils.metrics import METRICS, record_stage
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import json
+import os
+import queue
+import signal
+import threading
+import time
+
+EXECUTORS = ('thread', 'process')
+
+# End of a node's input; every worker takes exactly one
+_STOP = object()
+
+# Stage of a process worker, built once by the pool initializer
+_process_stage = None
+
+def _init_process_stage(stage_type, params, threads):
+    global _process_stage
+    # Ctrl+C reaches the whole process group; the parent drains the pipeline and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Each worker gets its share of the cores, or the workers oversubscribe them
+    set_torch_threads(threads)
+    _process_stage = create_stage(stage_type, params)
+
+def _process_batch(items):
+    return _process_stage.process_batch(items)
+
+def _audio_seconds(items):
+    return sum(len(item['audio']) / item['sample_rate'] for item in items if 'audio' in item)
+
+class StageNode:
+    def __init__(self, name, stage_type, params=None, inputs=(), workers=1, executor='thread', batch_size=1,
+                 batch_wait=PIPELINE_BATCH_MAX_WAIT, queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        A stage of the graph with its input queue and workers
+
+        The input queue is bounded, so when this stage falls behind its
+        upstream stages block on put() instead of buffering without limit.
+        With the 'thread' executor every worker thread runs its own stage
+        instance. With 'process', each worker thread hands batches to a
+        pool of the same size whose processes build the stage once; items
+        are pickled both ways, so use it for stages that compute a lot per
+        item (e.g. diarization). Outputs are passed on as soon as they are
+        ready, so with several workers items can overtake each other.
+
+        Args:
+            name (str): Unique node name
+            stage_type (str): Registered stage type
+            params (dict, optional): Keyword arguments of the stage
+            inputs (tuple): Names of the upstream nodes
+            workers (int): Workers processing batches concurrently
+            executor (str): 'thread' or 'process'
+            batch_size (int): Most items handed to the stage at once
+            batch_wait (float): Seconds to wait for a batch to fill once it has one item
+            queue_size (int): Items buffered in front of the stage
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}' for stage '{name}', expected one of {EXECUTORS}")
+        cls = stage_class(stage_type)
+        if cls.max_workers is not None and workers > cls.max_workers:
+            raise ValueError(f"Stage '{name}' ({stage_type}) supports at most {cls.max_workers} worker(s)")
+        if executor == 'thread' and cls.max_thread_workers is not None and workers > cls.max_thread_workers:
+            raise ValueError(f"Stage '{name}' ({stage_type}) supports at most {cls.max_thread_workers} "
+                             f"thread worker(s); use \"executor\": \"process\" for more")
+        self.name = name
+        self.stage_type = stage_type
+        self.params = params or {}
+        self.inputs = tuple(inputs)
+        self.workers = workers
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.is_source = issubclass(cls, SourceStage)
+        self.queue = None if self.is_source else queue.Queue(maxsize=queue_size)
+        self.outputs = []  # queues of the downstream nodes
+        self._threads = []
+        self._pool = None
+        self._errors = METRICS.counter('pipeline_stage_errors_total', "Items dropped because a stage failed",
+                                       stage=name)
+        if self.queue is not None:
+            METRICS.gauge('pipeline_queue_depth', "Items waiting in front of a pipeline stage",
+                          stage=name).set_function(self.queue.qsize)
+
+    def start(self, stop_event):
+        if self.is_source:
+            self._threads = [threading.Thread(target=self._generate, args=(stop_event,), daemon=True)]
+        else:
+            if self.executor == 'process':
+                # Spawned, not forked: forking a process that already runs torch threads can deadlock
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_process_stage,
+                                                 initargs=(self.stage_type, self.params,
+                                                           max(1, (os.cpu_count() or 1) // self.workers)))
+            self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def end_input(self):
+        """Called once every upstream node has finished"""
+        for _ in range(self.workers):
+            self.queue.put(_STOP)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _emit(self, item):
+        for output in self.outputs:
+            # Branches get their own dict, so stages can add keys without affecting each other
+            output.put(dict(item) if len(self.outputs) > 1 else item)
+
+    def _generate(self, stop_event):
+        try:
+            stage = create_stage(self.stage_type, self.params)
+            for item in stage.generate(stop_event):
+                self._emit(item)
+            stage.close()
+        except Exception as e:
+            print(f"Error in stage {self.name}: {str(e)}")
+            self._errors.inc()
+
+    def _next_batch(self):
+        """Wait for up to batch_size items; returns (items, stop)"""
+        item = self.queue.get()
+        if item is _STOP:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run_batch(self, stage, items):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        if self._pool is not None:
+            outputs = self._pool.submit(_process_batch, items).result()
+            cpu_seconds = None
+        else:
+            outputs = stage.process_batch(items)
+            cpu_seconds = time.thread_time() - cpu_start
+        record_stage(f"pipeline_{self.name}", time.perf_counter() - wall_start, cpu_seconds,
+                     _audio_seconds(items))
+        return outputs
+
+    def _work(self):
+        stage = None
+        try:
+            # Built in the worker, so slow model loading overlaps with the other stages
+            if self._pool is None:
+                stage = create_stage(self.stage_type, self.params)
+        except Exception as e:
+            print(f"Error starting stage {self.name}: {str(e)}")
+            self._errors.inc()
+
+        stop = False
+        while not stop:
+            items, stop = self._next_batch()
+            if not items:
+                continue
+            if stage is None and self._pool is None:
+                # The stage could not be built; drain the input so upstream stages do not block
+                self._errors.inc(len(items))
+                continue
+            try:
+                outputs = self._run_batch(stage, items)
+            except Exception as e:
+                print(f"Error in stage {self.name}: {str(e)}")
+                self._errors.inc(len(items))
+                continue
+            for output in outputs:
+                if output is not None:
+                    self._emit(output)
+
+        if stage is not None:
+            stage.close()
+
+class PipelineEngine:
+    def __init__(self, nodes):
+        """
+        Run a graph of stages connected by bounded queues
+
+        All stages run at the same time, so while one recording is being
+        diarized the next can already be filtered and segmented. A node
+        with several downstream nodes sends every output to each of them.
+
+        Args:
+            nodes (list): StageNode objects; every node must come after its inputs
+        """
+        self.nodes = nodes
+        self._by_name = {}
+        for node in nodes:
+            if node.name in self._by_name:
+                raise ValueError(f"Duplicate stage name '{node.name}'")
+            if node.is_source and node.inputs:
+                raise ValueError(f"Source stage '{node.name}' cannot have inputs")
+            if not node.is_source and not node.inputs:
+                raise ValueError(f"Stage '{node.name}' has no inputs")
+            for name in node.inputs:
+                if name not in self._by_name:
+                    raise ValueError(f"Stage '{node.name}' reads from '{name}', "
+                                     f"which is not defined before it")
+                self._by_name[name].outputs.append(node.queue)
+            self._by_name[node.name] = node
+        self._stop_event = threading.Event()
+        self._finished = set()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the graph from a config dict (see load_config)
+
+        Returns:
+            PipelineEngine: Engine ready to run
+        """
+        queue_size = config.get('queue_size', PIPELINE_QUEUE_SIZE)
+        batch_wait = config.get('batch_wait', PIPELINE_BATCH_MAX_WAIT)
+        nodes = []
+        for spec in config['stages']:
+            stage_type = spec['type']
+            name = spec.get('name', stage_type)
+            inputs = spec.get('inputs')
+            if inputs is None:
+                # By default a stage reads from the one listed before it
+                is_source = issubclass(stage_class(stage_type), SourceStage)
+                inputs = [nodes[-1].name] if nodes and not is_source else []
+            nodes.append(StageNode(name, stage_type, spec.get('params'), inputs,
+                                   workers=spec.get('workers', 1),
+                                   executor=spec.get('executor', 'thread'),
+                                   batch_size=spec.get('batch_size', 1),
+                                   batch_wait=spec.get('batch_wait', batch_wait),
+                                   queue_size=spec.get('queue_size', queue_size)))
+        return cls(nodes)
+
+    def stop(self):
+        """Ask the sources to stop; items already produced are still processed"""
+        self._stop_event.set()
+
+    def _wait(self):
+        # Nodes come after their inputs, so a node's input ends once the earlier nodes are done
+        for node in self.nodes:
+            if node.name in self._finished:
+                continue
+            node.join()
+            finished = self._finished | {node.name}
+            for downstream in self.nodes:
+                if node.name in downstream.inputs and all(name in finished for name in downstream.inputs):
+                    downstream.end_input()
+            self._finished.add(node.name)
+
+    def run(self):
+        """Run until the sources are exhausted and every item has gone through"""
+        start_time = time.perf_counter()
+        for node in reversed(self.nodes):
+            node.start(self._stop_event)
+        try:
+            self._wait()
+        except KeyboardInterrupt:
+            print("\nStopping pipeline...")
+            self.stop()
+            self._wait()
+        print(f"\nPipeline finished in {time.perf_counter() - start_time:.2f} seconds")
+
+def load_config(path):
+    """
+    Read a pipeline config file
+
+    The file is JSON with a 'stages' list. Each stage has a 'type' and
+    optionally 'name', 'inputs' (default: the stage before it), 'workers',
+    'executor' ('thread' or 'process'), 'batch_size', 'queue_size' and
+    'params' for the stage itself. Top-level 'queue_size' and
+    'batch_wait' set the defaults.
+
+    Args:
+        path (str): Path of the config file
+
+    Returns:
+        dict: The config
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if not config.get('stages'):
+        raise ValueError(f"No stages defined in {path}")
+    return config
+
+def run_pipeline(config_path):
+    """
+    Build and run the pipeline described by a config file
+
+    Args:
+        config_path (str): Path of the JSON config
+    """
+    PipelineEngine.from_config(load_config(config_path)).run()
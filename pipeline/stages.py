@@ -0,0 +1,304 @@
+from audio.noise_reduction import reduce_noise
+from vad.vad import VAD
+from identification.speaker_database import UNKNOWN_SPEAKER
+from utils.config import SAMPLE_RATE, DURATION, OUTPUT_DIR, STREAM_READ_TIMEOUT, SEGMENT_STORE_DIR
+from datetime import datetime
+import numpy as np
+import json
+import os
+import time
+
+# Stage type name -> class; see register_stage
+_STAGES = {}
+
+def register_stage(name):
+    """
+    Class decorator that makes a stage type available to pipeline configs by name
+    """
+    def decorator(cls):
+        _STAGES[name] = cls
+        return cls
+    return decorator
+
+def available_stages():
+    return sorted(_STAGES)
+
+def stage_class(stage_type):
+    if stage_type not in _STAGES:
+        raise ValueError(f"Unknown stage type '{stage_type}', expected one of {available_stages()}")
+    return _STAGES[stage_type]
+
+def create_stage(stage_type, params=None):
+    """
+    Build a stage from its type name and config parameters
+
+    Args:
+        stage_type (str): Registered stage type
+        params (dict, optional): Keyword arguments of the stage
+
+    Returns:
+        Stage: The new stage
+    """
+    return stage_class(stage_type)(**(params or {}))
+
+class Stage:
+    """
+    One step of a pipeline
+
+    Items are dicts describing one recording: 'id', 'audio' and
+    'sample_rate' from the source, plus whatever earlier stages added
+    ('clean', 'spans', 'segments'). A stage returns the item to pass on,
+    or None to pass nothing. Every worker gets its own stage instance,
+    so a stage only has to be safe for one thread; models stay shared
+    through the model registry.
+    """
+    # Highest number of workers that makes sense, e.g. 1 for stages that write one file
+    max_workers = None
+    # Highest number of thread workers, for stages whose shared model must not run on two threads at once
+    max_thread_workers = None
+
+    def process(self, item):
+        return item
+
+    def process_batch(self, items):
+        """Process several items at once; override to share work across them"""
+        return [self.process(item) for item in items]
+
+    def close(self):
+        """Release resources once the stage's input has ended"""
+
+class SourceStage(Stage):
+    """A stage without inputs that produces the items"""
+    max_workers = 1
+
+    def generate(self, stop_event):
+        """
+        Yield items until done or until stop_event is set
+
+        Args:
+            stop_event (threading.Event): Set when the pipeline is asked to stop
+        """
+        raise NotImplementedError
+
+def _make_item(item_id, audio, sample_rate=SAMPLE_RATE, started_at=None):
+    return {
+        'id': item_id,
+        'audio': audio,
+        'sample_rate': sample_rate,
+        'started_at': started_at if started_at is not None else time.time()
+    }
+
+@register_stage('microphone')
+class MicrophoneSource(SourceStage):
+    def __init__(self, window_seconds=DURATION, windows=1):
+        """
+        Record back-to-back windows from the microphone
+
+        Each window is one item, so later stages work on one window while
+        the next is being recorded.
+
+        Args:
+            window_seconds (float): Audio per item
+            windows (int, optional): Windows to record; None until stopped
+        """
+        self.window_size = int(window_seconds * SAMPLE_RATE)
+        self.windows = windows
+
+    def generate(self, stop_event):
+        from audio.recorder import AudioRecorder
+        recorder = AudioRecorder()
+        window = np.empty(self.window_size, dtype=np.float32)
+        filled = 0
+        count = 0
+        recorder.start_recording()
+        print("\n=== Pipeline: recording (Ctrl+C to stop) ===")
+        try:
+            while (self.windows is None or count < self.windows) and not stop_event.is_set():
+                chunk = recorder.read_chunk(timeout=STREAM_READ_TIMEOUT)
+                if chunk is None:
+                    if not recorder.is_recording:
+                        break
+                    continue
+                while len(chunk):
+                    take = min(len(chunk), self.window_size - filled)
+                    window[filled:filled + take] = chunk[:take]
+                    filled += take
+                    chunk = chunk[take:]
+                    if filled == self.window_size:
+                        ended_at = time.time()
+                        yield _make_item(datetime.now().strftime("%Y%m%d_%H%M%S"), window.copy(),
+                                         started_at=ended_at - self.window_size / SAMPLE_RATE)
+                        filled = 0
+                        count += 1
+        finally:
+            recorder.stop_recording()
+
+@register_stage('files')
+class FileSource(SourceStage):
+    def __init__(self, source):
+        """
+        Read recorded files
+
+        Args:
+            source (str): Directory or manifest, as for batch_pipeline.py
+        """
+        self.source = source
+
+    def generate(self, stop_event):
+        from batch_pipeline import collect_inputs, load_mono
+        for path in collect_inputs(self.source):
+            if stop_event.is_set():
+                break
+            try:
+                audio = load_mono(path)
+            except Exception as e:
+                print(f"Error reading {path}: {str(e)}")
+                continue
+            yield _make_item(path, audio, started_at=os.path.getmtime(path) - len(audio) / SAMPLE_RATE)
+
+@register_stage('reduce_noise')
+class ReduceNoiseStage(Stage):
+    def process(self, item):
+        item['clean'] = reduce_noise(item['audio'], sample_rate=item['sample_rate'])
+        return item
+
+@register_stage('vad')
+class VADStage(Stage):
+    def __init__(self, mode=2):
+        self.vad = VAD(mode)
+
+    def process(self, item):
+        audio = item.get('clean', item['audio'])
+        item['spans'] = self.vad.detect_segments(audio, item['sample_rate'])
+        return item
+
+@register_stage('diarization')
+class DiarizationStage(Stage):
+    # Thread workers would share one pyannote pipeline; use the process executor for more
+    max_thread_workers = 1
+
+    def __init__(self, num_speakers=None, stand_in=False):
+        """
+        Args:
+            num_speakers (int, optional): Number of speakers to detect
+            stand_in (bool): Use the benchmark stand-in instead of the
+                pyannote model, e.g. to try a pipeline config offline
+        """
+        from diarization.speaker_diarization import get_diarizer, SpeakerDiarizer
+        if stand_in:
+            from benchmarks.stand_in import StandInDiarizationPipeline
+            self.diarizer = SpeakerDiarizer(pipeline=StandInDiarizationPipeline())
+        else:
+            self.diarizer = get_diarizer()
+        self.num_speakers = num_speakers
+
+    def process(self, item):
+        audio = item.get('clean', item['audio'])
+        spans = item.get('spans')
+        if spans is not None:
+            results = self.diarizer.process_speech_spans(audio, spans, item['sample_rate'],
+                                                         num_speakers=self.num_speakers)
+        else:
+            results = self.diarizer.process_audio(audio, item['sample_rate'], num_speakers=self.num_speakers)
+        item['segments'] = results['segments']
+        return item
+
+@register_stage('identification')
+class IdentificationStage(Stage):
+    def __init__(self):
+        from identification.speaker_database import SpeakerDatabase
+        from identification.speaker_identifier import SpeakerIdentifier
+        database = SpeakerDatabase()
+        # Without enrolled speakers items pass through and the embedding model is never loaded
+        self.identifier = SpeakerIdentifier(database=database) if len(database) else None
+
+    def process_batch(self, items):
+        """Embed the segments of all items in one batched call"""
+        if self.identifier is None:
+            return items
+        database = self.identifier.database
+        clips = []
+        for item in items:
+            audio = item.get('clean', item['audio'])
+            rate = item['sample_rate']
+            clips.extend(audio[int(seg['start'] * rate):int(seg['end'] * rate)] for seg in item.get('segments', []))
+        if not clips:
+            return items
+
+        embeddings = self.identifier.embedder.embed_batch(clips, items[0]['sample_rate'])
+        matches = iter(database.identify(embeddings, self.identifier.threshold, self.identifier.top_k))
+        for item in items:
+            item['segments'] = [dict(segment, identity=match['speaker'], score=match['score'],
+                                     candidates=match['candidates'])
+                                for segment, match in zip(item.get('segments', []), matches)]
+        return items
+
+@register_stage('print_segments')
+class PrintSink(Stage):
+    def process(self, item):
+        segments = item.get('segments', [])
+        print(f"\n{item['id']}: {len(set(seg['speaker'] for seg in segments))} speaker(s)")
+        for segment in segments:
+            identity = f" -> {segment['identity']}" if 'identity' in segment else ""
+            print(f"Speaker {segment['speaker']}{identity}: {segment['start']:.2f}s - {segment['end']:.2f}s "
+                  f"(duration: {segment['duration']:.2f}s)")
+        return None
+
+@register_stage('json_results')
+class JSONSink(Stage):
+    def __init__(self, output_dir=OUTPUT_DIR):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def process(self, item):
+        name = os.path.splitext(os.path.basename(str(item['id'])))[0]
+        segments = [{key: segment[key] for key in ('speaker', 'identity', 'score', 'start', 'end', 'duration')
+                     if key in segment} for segment in item.get('segments', [])]
+        with open(os.path.join(self.output_dir, f"{name}.json"), 'w') as f:
+            json.dump({'id': str(item['id']), 'segments': segments}, f, indent=2)
+        return None
+
+@register_stage('segment_store')
+class SegmentStoreSink(Stage):
+    max_workers = 1
+
+    def __init__(self, store_dir=SEGMENT_STORE_DIR):
+        from storage.segment_store import SegmentStore
+        self.store = SegmentStore(store_dir)
+
+    def process(self, item):
+        # Ids are timestamps to the second, so two items can share one
+        session = self.store.unique_session_name(str(item['id']))
+        # Enrolled names are stable across sessions; diarization labels only mean
+        # something within their session
+        segments = [dict(segment, speaker=segment['identity'])
+                    if segment.get('identity', UNKNOWN_SPEAKER) != UNKNOWN_SPEAKER
+                    else dict(segment, speaker=f"{session}/{segment['speaker']}")
+                    for segment in item.get('segments', [])]
+        self.store.add_session(session, segments, started_at=item['started_at'])
+        self.store.flush()
+        return None
+
+@register_stage('artifacts')
+class ArtifactSink(Stage):
+    max_workers = 1
+
+    def __init__(self, output_dir=OUTPUT_DIR, save_original=True):
+        from audio.artifact_writer import ArtifactWriter
+        self.output_dir = output_dir
+        self.save_original = save_original
+        self.writer = ArtifactWriter(SAMPLE_RATE)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def process(self, item):
+        name = os.path.splitext(os.path.basename(str(item['id'])))[0]
+        if self.save_original:
+            self.writer.save(item['audio'], os.path.join(self.output_dir, f"original_{name}.wav"))
+        spans = item.get('spans')
+        if spans is not None and len(spans):
+            self.writer.save_speech(item.get('clean', item['audio']), spans,
+                                    os.path.join(self.output_dir, f"speech_{name}.wav"))
+        return None
+
+    def close(self):
+        self.writer.close()
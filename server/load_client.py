@@ -0,0 +1,108 @@
+from benchmarks.synthetic import noisy_speech
+from utils.config import SAMPLE_RATE, SERVER_HOST, SERVER_PORT
+import numpy as np
+import argparse
+import asyncio
+import bisect
+import json
+import time
+
+async def run_stream(stream_id, audio, host, port, sample_rate=SAMPLE_RATE, chunk_ms=100, speed=1.0):
+    """
+    Send one synthetic stream to the server and collect its events
+
+    Args:
+        stream_id (str): Name sent in the header
+        audio (numpy.ndarray): Float audio in [-1, 1]
+        host (str): Server address
+        port (int): Server port
+        sample_rate (int): Sample rate of the audio
+        chunk_ms (int): Audio per write
+        speed (float): Multiple of real time to send at; 0 sends as fast as possible
+
+    Returns:
+        dict: Stream statistics with per-utterance latencies in seconds
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({'stream_id': stream_id, 'sample_rate': sample_rate}) + "\n").encode())
+    await writer.drain()
+
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    chunk = int(sample_rate * chunk_ms / 1000)
+    sent_samples = []  # end sample of each chunk sent, for the latency lookup
+    sent_times = []
+
+    async def send():
+        start_time = time.perf_counter()
+        for position in range(0, len(pcm), chunk):
+            block = pcm[position:position + chunk]
+            writer.write(block.tobytes())
+            await writer.drain()
+            sent_samples.append(position + len(block))
+            sent_times.append(time.perf_counter())
+            if speed > 0:
+                delay = start_time + sent_samples[-1] / sample_rate / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        writer.write_eof()
+
+    sender = asyncio.create_task(send())
+    latencies = []
+    errors = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        event = json.loads(line)
+        if event['type'] == 'utterance':
+            # Latency from sending the utterance's last sample to receiving its event
+            index = bisect.bisect_left(sent_samples, int(event['end'] * sample_rate))
+            sent_at = sent_times[min(index, len(sent_times) - 1)]
+            latencies.append(time.perf_counter() - sent_at)
+        elif event['type'] == 'error':
+            errors += 1
+            print(f"Error from server ({stream_id}): {event.get('message')}")
+        elif event['type'] == 'end':
+            break
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return {'stream_id': stream_id, 'utterances': len(latencies), 'errors': errors, 'latencies': latencies}
+
+async def load_test(streams, duration, host, port, speed=1.0, seed=0):
+    """
+    Run many concurrent synthetic streams against the server
+
+    Returns:
+        list: Statistics of each stream
+    """
+    tasks = []
+    for index in range(streams):
+        audio, _ = noisy_speech(duration, SAMPLE_RATE, seed=seed + index)
+        tasks.append(run_stream(f"stream-{index}", audio, host, port, speed=speed))
+    return await asyncio.gather(*tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the stream server with synthetic audio")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--streams", type=int, default=10, help="concurrent streams")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of audio per stream")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="multiple of real time to send at (0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    results = asyncio.run(load_test(args.streams, args.duration, args.host, args.port, args.speed, args.seed))
+    elapsed = time.perf_counter() - start_time
+
+    latencies = np.array([value for result in results for value in result['latencies']])
+    print(f"Streams: {len(results)}  audio: {args.streams * args.duration:.0f}s  wall: {elapsed:.2f}s")
+    print(f"Utterances: {len(latencies)}  errors: {sum(result['errors'] for result in results)}")
+    if len(latencies):
+        print(f"Event latency p50 {np.percentile(latencies, 50) * 1000:.1f} ms  "
+              f"p95 {np.percentile(latencies, 95) * 1000:.1f} ms  max {latencies.max() * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+from audio.noise_reduction import StreamingNoiseReducer
+from audio.resampler import StreamingResampler
+from vad.streaming_vad import StreamingVAD
+from diarization.inference_profile import set_torch_threads
+from utils.config import (SAMPLE_RATE, SERVER_HOST, SERVER_PORT, SERVER_READ_SIZE,
+                          SERVER_MAX_PENDING, SERVER_INFERENCE_WORKERS, EMBEDDING_BATCH_SIZE,
+                          INFERENCE_THREADS)
+from utils.metrics import METRICS, record_stage, serve_metrics
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+
+class SpeakerInferenceService:
+    def __init__(self, label_fn, workers=SERVER_INFERENCE_WORKERS, max_pending=SERVER_MAX_PENDING):
+        """
+        Shared speaker model behind a bounded request queue
+
+        All streams submit their utterances here. When max_pending
+        utterances are already waiting, submit() blocks, which stops the
+        submitting stream from reading its socket, so a slow model pushes
+        back on the clients instead of growing memory.
+
+        Args:
+            label_fn (callable): label_fn(audio, sample_rate) -> list of
+                speaker segment dicts; runs on worker threads
+            workers (int): Concurrent inference calls
+            max_pending (int): Utterances allowed to wait for a worker
+        """
+        self.label_fn = label_fn
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._tasks = []
+        METRICS.gauge('server_inference_queue_depth', "Utterances waiting for the speaker model"
+                      ).set_function(self._queue.qsize)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, audio, sample_rate):
+        """
+        Queue an utterance for labeling
+
+        Returns:
+            asyncio.Future: Resolves to the utterance's speaker segments
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, sample_rate, future))
+        return future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            audio, sample_rate, future = await self._queue.get()
+            start_time = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(self._executor, self.label_fn, audio, sample_rate)
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            record_stage('server_speaker_inference', time.perf_counter() - start_time,
+                         audio_seconds=len(audio) / sample_rate)
+
+class StreamSession:
+    def __init__(self, stream_id, sample_rate, service, writer):
+        """
+        Per-connection state: streaming filter, streaming VAD and event sender
+
+        Args:
+            stream_id (str): Client-chosen stream name
+            sample_rate (int): Sample rate of the incoming PCM
+            service (SpeakerInferenceService): Shared speaker model
+            writer (asyncio.StreamWriter): Connection to push events to
+        """
+        self.stream_id = stream_id
+        self.resampler = None
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            # Rates the VAD cannot take are converted to the pipeline rate on arrival
+            self.resampler = StreamingResampler(sample_rate, SAMPLE_RATE, max_block=SERVER_READ_SIZE // 2)
+            sample_rate = SAMPLE_RATE
+        self.sample_rate = sample_rate
+        self.service = service
+        self.writer = writer
+        self.noise_reducer = StreamingNoiseReducer(sample_rate)
+        self.vad = StreamingVAD(sample_rate=sample_rate)
+        self._leftover = b''
+        self._events = asyncio.Queue()
+        self._sender = asyncio.create_task(self._send_events())
+
+    async def send(self, event):
+        self.writer.write((json.dumps(event) + "\n").encode())
+        await self.writer.drain()
+
+    async def feed(self, data):
+        """Process a block of little-endian int16 PCM bytes"""
+        data = self._leftover + data
+        usable = len(data) - len(data) % 2
+        self._leftover = data[usable:]
+        if usable == 0:
+            return
+        block = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0
+        if self.resampler is not None:
+            block = self.resampler.process(block)
+
+        start_time = time.perf_counter()
+        utterances = self.vad.process_chunk(self.noise_reducer.process(block))
+        record_stage('server_filter_vad', time.perf_counter() - start_time,
+                     audio_seconds=len(block) / self.sample_rate)
+        await self._submit(utterances)
+
+    async def finish(self):
+        """Flush the utterance in progress and wait until every event is sent"""
+        await self._submit(self.vad.flush())
+        await self._events.put(None)
+        await self._sender
+
+    async def close(self):
+        """Stop the event sender, e.g. when the connection failed before finish()"""
+        if not self._sender.done():
+            self._sender.cancel()
+        try:
+            await self._sender
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Stream error: {str(e)}")
+
+    async def _submit(self, utterances):
+        for utterance in utterances:
+            future = await self.service.submit(utterance['audio'], self.sample_rate)
+            await self._events.put((utterance, future))
+
+    async def _send_events(self):
+        """Send utterance events in order as their labels become available"""
+        while True:
+            item = await self._events.get()
+            if item is None:
+                break
+            utterance, future = item
+            try:
+                segments = await future
+            except Exception as e:
+                await self.send({'type': 'error', 'stream_id': self.stream_id, 'message': str(e)})
+                continue
+            await self.send({
+                'type': 'utterance',
+                'stream_id': self.stream_id,
+                'start': utterance['start'],
+                'end': utterance['end'],
+                'segments': [
+                    dict(seg, start=utterance['start'] + seg['start'], end=utterance['start'] + seg['end'])
+                    for seg in segments
+                ]
+            })
+            METRICS.counter('server_events_total', "Utterance events pushed to clients").inc()
+
+class StreamServer:
+    def __init__(self, service, host=SERVER_HOST, port=SERVER_PORT, read_size=SERVER_READ_SIZE):
+        """
+        Accept many concurrent PCM streams over TCP
+
+        Protocol: the client sends one JSON header line such as
+        {"stream_id": "leg-1", "sample_rate": 16000}, then raw mono
+        little-endian int16 PCM. The server answers with one JSON line per
+        event: "ready", one "utterance" per detected utterance (with
+        speaker segments on the stream's timeline), "error", and "end"
+        once the client has shut down its sending side and all events
+        are delivered.
+
+        Args:
+            service (SpeakerInferenceService): Shared speaker model
+            host (str): Interface to listen on
+            port (int): TCP port
+            read_size (int): Bytes read from a socket at a time
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self.read_size = read_size
+        self._active = 0
+        METRICS.gauge('server_active_streams', "Connected PCM streams").set_function(lambda: self._active)
+
+    @staticmethod
+    async def _send_error(writer, message, stream_id=None):
+        event = {'type': 'error', 'message': message}
+        if stream_id is not None:
+            event['stream_id'] = stream_id
+        writer.write((json.dumps(event) + "\n").encode())
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        self._active += 1
+        session = None
+        stream_id = None
+        try:
+            header = json.loads((await reader.readline()).decode() or "{}")
+            if not isinstance(header, dict):
+                await self._send_error(writer, "Header must be a JSON object")
+                return
+            stream_id = str(header.get('stream_id', id(writer)))
+            sample_rate = int(header.get('sample_rate', SAMPLE_RATE))
+            if not 4000 <= sample_rate <= 192000:
+                await self._send_error(writer, f"Unsupported sample rate {sample_rate}", stream_id)
+                return
+
+            session = StreamSession(stream_id, sample_rate, self.service, writer)
+            await session.send({'type': 'ready', 'stream_id': stream_id})
+            while True:
+                data = await reader.read(self.read_size)
+                if not data:
+                    break
+                await session.feed(data)
+            await session.finish()
+            await session.send({'type': 'end', 'stream_id': stream_id})
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            print(f"Stream error: {str(e)}")
+        except Exception as e:
+            # Bad header values, a failing model, ...: tell the client if it is still there
+            print(f"Stream error: {str(e)}")
+            try:
+                await self._send_error(writer, str(e), stream_id)
+            except ConnectionError:
+                pass
+        finally:
+            # Without this, a failed connection leaves its sender waiting for events forever
+            if session is not None:
+                await session.close()
+            self._active -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve_forever(self):
+        self.service.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"Listening for PCM streams on {self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.service.stop()
+
+def make_labeler(mode='diarization'):
+    """
+    Build the shared speaker-labeling function
+
+    Args:
+        mode (str): 'diarization' (warm pyannote pipeline), 'identify'
+            (embeddings of all streams batched together and matched
+            against the enrolled speakers), 'stand-in' (local stand-in
+            model, no download) or 'none' (VAD only)
+
+    Returns:
+        callable: label_fn(audio, sample_rate) -> list of segment dicts
+    """
+    if mode == 'none':
+        return lambda audio, sample_rate: []
+
+    if mode == 'identify':
+        from diarization.batching import BatchScheduler
+        from diarization.speaker_embedding import SpeakerEmbedder
+        from identification.speaker_database import SpeakerDatabase, UNKNOWN_SPEAKER
+
+        embedder = SpeakerEmbedder()
+        database = SpeakerDatabase()
+        scheduler = BatchScheduler(lambda clips: embedder.embed_batch(clips, SAMPLE_RATE))
+
+        def identify(audio, sample_rate):
+            if sample_rate == SAMPLE_RATE:
+                embedding = scheduler(audio)
+            else:
+                embedding = embedder.embed(audio, sample_rate)
+            match = database.identify(embedding)[0] if len(database) else {
+                'speaker': UNKNOWN_SPEAKER, 'score': 0.0, 'candidates': []}
+            duration = len(audio) / sample_rate
+            return [{'speaker': match['speaker'], 'start': 0.0, 'end': duration, 'duration': duration,
+                     'score': match['score'], 'candidates': match['candidates']}]
+        return identify
+
+    from diarization.speaker_diarization import SpeakerDiarizer
+    if mode == 'stand-in':
+        from benchmarks.stand_in import StandInDiarizationPipeline
+        diarizer = SpeakerDiarizer(pipeline=StandInDiarizationPipeline())
+    else:
+        # Live utterances never repeat, so caching them would only grow the cache directory
+        diarizer = SpeakerDiarizer()
+
+    def label(audio, sample_rate):
+        return diarizer.process_audio(audio, sample_rate)['segments']
+    return label
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-stream speaker detection server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--model", choices=['diarization', 'identify', 'stand-in', 'none'],
+                        default='diarization', help="speaker model shared by all streams")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="concurrent speaker inference calls (identify mode batches them)")
+    parser.add_argument("--max-pending", type=int, default=SERVER_MAX_PENDING,
+                        help="utterances waiting for the model before streams are throttled")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS,
+                        help="torch threads for speaker inference (default: torch's choice)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on localhost")
+    args = parser.parse_args()
+
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_port)
+    set_torch_threads(args.threads)
+    # Load the model before accepting streams
+    label_fn = make_labeler(args.model)
+    workers = args.workers
+    if workers is None:
+        # Identify mode needs many requests in flight for the scheduler to batch them
+        workers = EMBEDDING_BATCH_SIZE if args.model == 'identify' else SERVER_INFERENCE_WORKERS
+
+    async def run():
+        service = SpeakerInferenceService(label_fn, workers=workers, max_pending=args.max_pending)
+        await StreamServer(service, args.host, args.port).serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import numpy as np
+from utils.config import SEGMENT_STORE_DIR
+from datetime import datetime
+import argparse
+import json
+import os
+import time
+
+# One row per segment; times are absolute (seconds since the epoch) so sessions share a timeline
+SEGMENT_DTYPE = np.dtype([('session', '<i4'), ('speaker', '<i4'), ('start', '<f8'), ('end', '<f8'),
+                          ('confidence', '<f4')])
+# Index entry: a segment row and its start time, kept sorted by start
+INDEX_DTYPE = np.dtype([('row', '<i8'), ('start', '<f8')])
+
+def _insert_sorted(index, rows, starts):
+    """
+    Add rows to an index sorted by start time
+
+    Sessions are usually appended in time order, so the new entries
+    simply go at the end; otherwise they are merged in with one
+    searchsorted and one insert, never a full re-sort.
+
+    Returns:
+        numpy.ndarray: New INDEX_DTYPE array
+    """
+    entries = np.empty(len(rows), dtype=INDEX_DTYPE)
+    entries['row'] = rows
+    entries['start'] = starts
+    entries = entries[np.argsort(starts, kind='stable')]
+    if len(index) == 0 or entries['start'][0] >= index['start'][-1]:
+        return np.concatenate([index, entries])
+    positions = np.searchsorted(index['start'], entries['start'], side='right')
+    return np.insert(index, positions, entries)
+
+def _overlapping(index, max_duration, start=None, end=None):
+    """
+    Index entries of segments that may overlap [start, end)
+
+    A segment overlaps the range if it starts before end and ends after
+    start. It cannot end later than max_duration after its start, so
+    only the entries starting in [start - max_duration, end) need a look.
+
+    Returns:
+        numpy.ndarray: Slice of the index
+    """
+    low = 0 if start is None else np.searchsorted(index['start'], start - max_duration, side='right')
+    high = len(index) if end is None else np.searchsorted(index['start'], end, side='left')
+    return index[low:max(low, high)]
+
+class SegmentStore:
+    def __init__(self, store_dir=SEGMENT_STORE_DIR, initial_capacity=4096):
+        """
+        Persistent who-spoke-when history across sessions
+
+        Segments of all sessions are rows of one memory-mapped structured
+        array (segments.npy) holding session id, speaker id, start, end
+        and confidence. Each session's rows are contiguous. Two indexes
+        sorted by start time answer range queries with a binary search:
+        one over all segments (timeline.npy) and one per speaker
+        (speaker_index.npy, split by the offsets in store.json). Talk time
+        per speaker is kept as a running total.
+
+        Appends are meant to come from one process at a time.
+
+        Args:
+            store_dir (str): Directory holding the store files
+            initial_capacity (int): Rows allocated when the store is created
+        """
+        self.store_dir = store_dir
+        self.initial_capacity = initial_capacity
+        self.data_path = os.path.join(store_dir, "segments.npy")
+        self.timeline_path = os.path.join(store_dir, "timeline.npy")
+        self.speaker_index_path = os.path.join(store_dir, "speaker_index.npy")
+        self.meta_path = os.path.join(store_dir, "store.json")
+        self.sessions = []  # dicts with 'name', 'started_at', 'first' and 'count'
+        self.speakers = []
+        self.talk_seconds = []  # running total per speaker
+        self.max_durations = []  # longest segment per speaker, bounds the range searches
+        self._num_rows = 0
+        self._data = None
+        self._timeline = np.zeros(0, dtype=INDEX_DTYPE)
+        self._speaker_index = []
+        self._indexes_changed = False
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.sessions = meta['sessions']
+            self.speakers = meta['speakers']
+            self.talk_seconds = meta['talk_seconds']
+            self.max_durations = meta['max_durations']
+            self._num_rows = meta['num_rows']
+            self._data = np.load(self.data_path, mmap_mode='r+')
+            self._timeline = np.load(self.timeline_path, mmap_mode='r')
+            speaker_index = np.load(self.speaker_index_path, mmap_mode='r')
+            offsets = meta['speaker_offsets']
+            self._speaker_index = [speaker_index[offsets[i]:offsets[i + 1]] for i in range(len(self.speakers))]
+        self._session_ids = {session['name']: i for i, session in enumerate(self.sessions)}
+        self._speaker_ids = {name: i for i, name in enumerate(self.speakers)}
+
+    def __len__(self):
+        return self._num_rows
+
+    def unique_session_name(self, name):
+        """
+        Return name, or name with a numeric suffix if a session already has it
+
+        Args:
+            name (str): Preferred session name, e.g. a timestamp to the second
+
+        Returns:
+            str: A name add_session accepts
+        """
+        candidate, suffix = name, 1
+        while candidate in self._session_ids:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        return candidate
+
+    @property
+    def segments(self):
+        """Structured view of all stored segment rows"""
+        if self._data is None:
+            return np.zeros(0, dtype=SEGMENT_DTYPE)
+        return self._data[:self._num_rows]
+
+    def _ensure_capacity(self, rows):
+        """Grow the memory-mapped segment array (by doubling) to hold at least rows"""
+        if self._data is not None and rows <= len(self._data):
+            return
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        capacity = max(rows, self.initial_capacity)
+        if self._data is not None:
+            capacity = max(capacity, 2 * len(self._data))
+
+        temp_path = self.data_path + ".tmp.npy"
+        grown = np.lib.format.open_memmap(temp_path, mode='w+', dtype=SEGMENT_DTYPE, shape=(capacity,))
+        if self._data is not None:
+            grown[:self._num_rows] = self._data[:self._num_rows]
+        grown.flush()
+        del grown
+        self._data = None
+        os.replace(temp_path, self.data_path)
+        self._data = np.load(self.data_path, mmap_mode='r+')
+
+    def _speaker_id(self, name):
+        speaker = self._speaker_ids.get(name)
+        if speaker is None:
+            speaker = len(self.speakers)
+            self.speakers.append(name)
+            self.talk_seconds.append(0.0)
+            self.max_durations.append(0.0)
+            self._speaker_index.append(np.zeros(0, dtype=INDEX_DTYPE))
+            self._speaker_ids[name] = speaker
+        return speaker
+
+    def add_session(self, name, segments, started_at=None):
+        """
+        Append the segments of one session
+
+        Args:
+            name (str): Unique session name, e.g. the recording timestamp
+            segments (list): Segment dicts with 'speaker', 'start' and 'end'
+                in seconds from the start of the session, and optionally
+                'confidence' or 'score'. Use names that are stable across
+                sessions (e.g. identified speakers) to query a person's history;
+                diarization labels such as SPEAKER_00 are only unique per
+                session, so store them as f"{name}/{label}".
+            started_at (float, optional): Session start in seconds since the
+                epoch (default: now)
+
+        Returns:
+            int: Session id
+        """
+        if name in self._session_ids:
+            raise ValueError(f"Session '{name}' is already stored")
+        if started_at is None:
+            started_at = time.time()
+
+        session = len(self.sessions)
+        first = self._num_rows
+        count = len(segments)
+        self._ensure_capacity(first + count)
+        rows = self._data[first:first + count]
+        rows['session'] = session
+        rows['speaker'] = [self._speaker_id(segment['speaker']) for segment in segments]
+        rows['start'] = [started_at + segment['start'] for segment in segments]
+        rows['end'] = [started_at + segment['end'] for segment in segments]
+        rows['confidence'] = [segment.get('confidence', segment.get('score', np.nan)) for segment in segments]
+        self._num_rows += count
+
+        self.sessions.append({'name': name, 'started_at': started_at, 'first': first, 'count': count})
+        self._session_ids[name] = session
+
+        if count:
+            self._indexes_changed = True
+            row_ids = np.arange(first, first + count)
+            durations = rows['end'] - rows['start']
+            self._timeline = _insert_sorted(self._timeline, row_ids, rows['start'])
+            for speaker in np.unique(rows['speaker']):
+                mine = rows['speaker'] == speaker
+                self._speaker_index[speaker] = _insert_sorted(self._speaker_index[speaker], row_ids[mine],
+                                                              rows['start'][mine])
+                self.talk_seconds[speaker] += float(durations[mine].sum())
+                self.max_durations[speaker] = max(self.max_durations[speaker], float(durations[mine].max()))
+        return session
+
+    def _rows(self, speaker=None, start=None, end=None, session=None):
+        """Rows matching the filters, in start order"""
+        if self._num_rows == 0:
+            return np.zeros(0, dtype=np.int64)
+        if session is not None:
+            info = self.sessions[self._session_ids[session]]
+            rows = np.arange(info['first'], info['first'] + info['count'])
+            if speaker is not None:
+                rows = rows[self._data['speaker'][rows] == self._speaker_ids.get(speaker, -1)]
+            rows = rows[np.argsort(self._data['start'][rows], kind='stable')]
+            if end is not None:
+                rows = rows[self._data['start'][rows] < end]
+        elif speaker is not None:
+            speaker_id = self._speaker_ids.get(speaker)
+            if speaker_id is None:
+                return np.zeros(0, dtype=np.int64)
+            rows = _overlapping(self._speaker_index[speaker_id], self.max_durations[speaker_id],
+                                start, end)['row']
+        else:
+            rows = _overlapping(self._timeline, max(self.max_durations, default=0.0), start, end)['row']
+
+        if start is not None:
+            rows = rows[self._data['end'][rows] > start]
+        return rows
+
+    def query(self, speaker=None, start=None, end=None, session=None):
+        """
+        Segments overlapping a time range, optionally for one speaker or session
+
+        Args:
+            speaker (str, optional): Speaker name
+            start (float, optional): Range start in seconds since the epoch
+            end (float, optional): Range end in seconds since the epoch
+            session (str, optional): Session name
+
+        Returns:
+            list: Segment dicts with 'session', 'speaker', 'start', 'end'
+                  (seconds since the epoch), 'duration' and 'confidence', in start order
+        """
+        rows = self.segments[self._rows(speaker, start, end, session)]
+        return [{
+            'session': self.sessions[row['session']]['name'],
+            'speaker': self.speakers[row['speaker']],
+            'start': float(row['start']),
+            'end': float(row['end']),
+            'duration': float(row['end'] - row['start']),
+            'confidence': float(row['confidence'])
+        } for row in rows]
+
+    def talk_time(self, start=None, end=None, session=None):
+        """
+        Seconds of speech per speaker
+
+        Segments crossing the range boundaries only count with their part
+        inside the range. Without a range or session the running totals are
+        returned directly.
+
+        Args:
+            start (float, optional): Range start in seconds since the epoch
+            end (float, optional): Range end in seconds since the epoch
+            session (str, optional): Session name
+
+        Returns:
+            dict: Speaker name -> seconds, for speakers with any talk time
+        """
+        if start is None and end is None and session is None:
+            totals = self.talk_seconds
+        else:
+            rows = self.segments[self._rows(None, start, end, session)]
+            clipped_start = rows['start'] if start is None else np.maximum(rows['start'], start)
+            clipped_end = rows['end'] if end is None else np.minimum(rows['end'], end)
+            totals = np.bincount(rows['speaker'], weights=np.maximum(clipped_end - clipped_start, 0.0),
+                                 minlength=len(self.speakers))
+        return {name: float(seconds) for name, seconds in zip(self.speakers, totals) if seconds > 0}
+
+    def flush(self):
+        """Write the segments, indexes and metadata to disk"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._ensure_capacity(self._num_rows)
+        self._data.flush()
+
+        if self._indexes_changed or not os.path.exists(self.timeline_path):
+            # Copy out of the old index files first; they are replaced below
+            self._timeline = np.array(self._timeline)
+            self._speaker_index = [np.array(index) for index in self._speaker_index]
+            speaker_index = np.concatenate([np.zeros(0, dtype=INDEX_DTYPE)] + self._speaker_index)
+            for path, index in ((self.timeline_path, self._timeline), (self.speaker_index_path, speaker_index)):
+                temp_path = path + ".tmp.npy"
+                np.save(temp_path, index)
+                os.replace(temp_path, path)
+            self._indexes_changed = False
+
+        offsets = np.cumsum([0] + [len(index) for index in self._speaker_index]).tolist()
+
+        temp_path = self.meta_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'num_rows': self._num_rows,
+                'sessions': self.sessions,
+                'speakers': self.speakers,
+                'talk_seconds': self.talk_seconds,
+                'max_durations': self.max_durations,
+                'speaker_offsets': offsets
+            }, f)
+        os.replace(temp_path, self.meta_path)
+
+def _parse_time(value):
+    """Seconds since the epoch from an ISO date/time string"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the who-spoke-when history")
+    parser.add_argument("--store-dir", default=SEGMENT_STORE_DIR)
+    parser.add_argument("--speaker", help="only this speaker")
+    parser.add_argument("--session", help="only this session")
+    parser.add_argument("--from", dest="start", help="range start, ISO format (e.g. 2024-05-01T09:00)")
+    parser.add_argument("--to", dest="end", help="range end, ISO format")
+    parser.add_argument("--talk-time", action="store_true", help="total talk time per speaker instead of segments")
+    args = parser.parse_args()
+
+    store = SegmentStore(args.store_dir)
+    start, end = _parse_time(args.start), _parse_time(args.end)
+    if args.talk_time:
+        talk_time = store.talk_time(start, end, args.session)
+        if args.speaker:
+            talk_time = {args.speaker: talk_time.get(args.speaker, 0.0)}
+        for speaker, seconds in sorted(talk_time.items(), key=lambda item: -item[1]):
+            print(f"{speaker}: {seconds / 60:.1f} min")
+        return
+
+    for segment in store.query(args.speaker, start, end, args.session):
+        print(f"[{segment['session']}] {segment['speaker']}: "
+              f"{datetime.fromtimestamp(segment['start']).isoformat(timespec='seconds')} "
+              f"({segment['duration']:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import pytest
+from diarization.batching import BatchScheduler
+
+def _scheduler(batch_fn):
+    # A long wait so that every submitted item lands in the same batch
+    return BatchScheduler(batch_fn, max_batch_size=4, max_wait=0.2, name="test")
+
+def test_results_are_returned_per_item():
+    scheduler = _scheduler(lambda items: [item * 2 for item in items])
+    futures = [scheduler.submit(i) for i in range(4)]
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6]
+    scheduler.close()
+
+def test_raising_batch_fn_fails_every_future_and_keeps_running():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("model failed")
+        return items
+
+    scheduler = _scheduler(batch_fn)
+    futures = [scheduler.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(timeout=5)
+    # The worker thread survived the failure
+    assert scheduler.submit(7).result(timeout=5) == 7
+    scheduler.close()
+
+def test_short_results_fail_every_future():
+    scheduler = _scheduler(lambda items: items[:1])
+    futures = [scheduler.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="1 results for 3 items"):
+            future.result(timeout=5)
+    assert scheduler.submit(5).result(timeout=5) == 5
+    scheduler.close()
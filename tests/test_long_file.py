@@ -0,0 +1,36 @@
+import os
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from audio.long_file import process_long_file
+
+def _write_tone_bursts(path, sample_rate, seconds):
+    """Write a file of alternating tone bursts and silence, one second at a time"""
+    t = np.arange(sample_rate, dtype=np.float32) / sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+    silence = np.zeros(sample_rate, dtype=np.float32)
+    with sf.SoundFile(path, 'w', samplerate=sample_rate, channels=1, subtype='PCM_16') as f:
+        for second in range(seconds):
+            f.write(tone if second % 4 < 2 else silence)
+
+def test_non_native_rate_memory_is_bounded(tmp_path):
+    # 44.1 kHz is resampled on the fly; memory must depend on the block length, not the file
+    path = os.path.join(tmp_path, "long_44k.wav")
+    _write_tone_bursts(path, 44100, 120)
+    # Run once on a short file so the lazy scipy imports are not counted
+    warmup_path = os.path.join(tmp_path, "short_44k.wav")
+    _write_tone_bursts(warmup_path, 44100, 2)
+    process_long_file(warmup_path, temp_dir=str(tmp_path))
+
+    tracemalloc.start()
+    try:
+        result = process_long_file(path, temp_dir=str(tmp_path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert result['duration'] == 120
+    assert result['speech_regions']
+    # A 10 s read block is 1.8 MB at 44.1 kHz; the whole file decoded would be 21 MB
+    # and full-block resampler tables over 200 MB
+    assert peak < 20 * 1024 * 1024, f"peak {peak / 1e6:.1f} MB"
@@ -0,0 +1,153 @@
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+from utils.config import CACHE_DIR, CACHE_MAX_BYTES
+from utils.metrics import METRICS
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        """
+        On-disk cache of segment lists and embeddings, keyed by audio content
+
+        Entries are written to a temporary file and renamed into place, and
+        readers and the evictor tolerate entries vanishing underneath them,
+        so several processes can share one cache directory. Reading an
+        entry refreshes its modification time, which eviction uses as the
+        least-recently-used order.
+
+        The cache size is scanned once, then kept as a running total of
+        this process's writes; the directory is only walked again when that
+        total passes max_bytes. Writes of other processes sharing the
+        directory are picked up at that next scan. Eviction goes down to
+        90% of max_bytes, so a full cache is not rescanned on every write.
+
+        Args:
+            cache_dir (str): Directory holding the cache entries
+            max_bytes (int): Size limit; oldest entries are evicted beyond it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # size at the last scan plus this process's writes since
+
+    @staticmethod
+    def make_key(audio_data, sample_rate, model_id, **params):
+        """
+        Build a cache key from the audio content and everything that affects the result
+
+        Args:
+            audio_data (numpy.ndarray): Audio data
+            sample_rate (int): Sample rate of the audio
+            model_id (str): Model that produced the result
+            **params: Other settings, e.g. num_speakers (must be JSON-serializable)
+
+        Returns:
+            str: Hex digest
+        """
+        audio_data = np.ascontiguousarray(audio_data)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{audio_data.dtype.str}{audio_data.shape}{sample_rate}{model_id}".encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        digest.update(memoryview(audio_data).cast('B'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npz")
+
+    def get(self, key):
+        """
+        Look up an entry
+
+        Returns:
+            dict: {'segments': list, 'embeddings': numpy.ndarray or None},
+                  or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                segments = json.loads(entry['segments'].tobytes().decode())
+                embeddings = entry['embeddings'] if 'embeddings' in entry.files else None
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            self.misses += 1
+            METRICS.counter('result_cache_requests_total', "Result cache lookups", result='miss').inc()
+            return None
+        self.hits += 1
+        METRICS.counter('result_cache_requests_total', "Result cache lookups", result='hit').inc()
+        return {'segments': segments, 'embeddings': embeddings}
+
+    def put(self, key, segments, embeddings=None):
+        """
+        Store an entry, then evict old entries if the cache is over its limit
+
+        Args:
+            key (str): Key from make_key
+            segments (list): JSON-serializable segment dicts
+            embeddings (numpy.ndarray, optional): Per-segment embeddings
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {'segments': np.frombuffer(json.dumps(segments).encode(), dtype=np.uint8)}
+        if embeddings is not None:
+            arrays['embeddings'] = np.asarray(embeddings, dtype=np.float32)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if self._total_bytes is None:
+            self.evict()
+        else:
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        """List (mtime, size, path) of all entries"""
+        entries = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".npz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Scan the cache; if it is over max_bytes, delete least recently used entries"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # another process evicted it first
+                total -= size
+                if total <= target:
+                    break
+        self._total_bytes = total
+
+    def clear(self):
+        """Delete every entry"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._total_bytes = 0
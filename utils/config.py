@@ -1,23 +1,117 @@
-import os
-
-# Audio Recording Parameters
-SAMPLE_RATE = 16000  # Hz
-CHANNELS = 1  # Mono
-CHUNK_SIZE = 1024
-DURATION = 10  # seconds
-
-# VAD Parameters
-VAD_FRAME_DURATION = 20  # ms
-VAD_MODE = 3  # Aggressiveness mode (0-3)
-
-# Diarization Parameters
-DIARIZATION_MIN_SPEAKERS = 1
-DIARIZATION_MAX_SPEAKERS = 5
-
-# File Paths
-AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "audio")
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
-
-# Create directories if they don't exist
-os.makedirs(AUDIO_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+import os
+
+# Audio Recording Parameters
+SAMPLE_RATE = 16000  # Hz
+CHANNELS = 1  # Mono
+CHUNK_SIZE = 1024
+DURATION = 10  # seconds
+RING_BUFFER_SECONDS = 60  # Capacity of the recorder's ring buffer
+
+# Capture Parameters
+CAPTURE_DEVICE = None  # input device index or name; None for the default device
+CAPTURE_SAMPLE_RATE = None  # None to capture at the device's native rate
+CAPTURE_CHANNELS = None  # None to capture every input channel of the device
+CAPTURE_MIX_MODE = "mean"  # "mean", "channel" (CAPTURE_CHANNEL only) or "beam" (loudest channel)
+CAPTURE_CHANNEL = 0
+BEAM_SWITCH_RATIO = 2.0  # smoothed energy ratio needed to switch to another channel
+BEAM_SMOOTHING = 0.9  # per-block smoothing of the channel energies
+RESAMPLER_HALF_LENGTH = 10  # resampling filter zero crossings on each side
+
+# VAD Parameters
+VAD_FRAME_DURATION = 20  # ms
+VAD_MODE = 3  # Aggressiveness mode (0-3)
+VAD_MAX_SILENCE_FRAMES = 10  # Silence frames allowed inside a speech segment
+VAD_MIN_SEGMENT_FRAMES = 5  # Minimum frames for a valid speech segment
+VAD_BACKEND = "webrtc"  # backend for frames the energy gate cannot decide ("webrtc" or "energy")
+VAD_ENERGY_GATE = True  # skip the backend on clearly silent frames
+VAD_SILENCE_DB = -50.0  # frames below this level (dBFS) are silence
+VAD_GATE_SPEECH = False  # also call loud, low-ZCR frames speech without the backend (hum and music pass too)
+VAD_SPEECH_DB = -20.0  # with VAD_GATE_SPEECH, louder frames with a voiced zero-crossing rate are speech
+VAD_SPEECH_MAX_ZCR = 0.1  # zero crossings per sample of such voiced frames
+PARALLEL_VAD_SHARD_SECONDS = 120  # audio per shard of the parallel VAD
+PARALLEL_VAD_WARMUP_SECONDS = 10  # audio run before each shard so the VAD's noise model settles
+PARALLEL_VAD_MIN_SECONDS = 300  # shorter audio is processed serially
+
+# Streaming Parameters
+STREAM_READ_TIMEOUT = 0.5  # seconds to wait for a new block from the recorder
+STREAM_MAX_PENDING_UTTERANCES = 32  # utterances waiting for labels before new ones are dropped
+
+# Long File Parameters
+LONG_FILE_MIN_SECONDS = 1800  # batch files at least this long are processed in long-file mode
+LONG_FILE_BLOCK_SECONDS = 10  # audio read from disk at a time
+LONG_FILE_WINDOW_SECONDS = 300  # diarization window
+LONG_FILE_OVERLAP_SECONDS = 30  # overlap used to stitch speaker labels between windows
+LONG_FILE_STITCH_THRESHOLD = 0.5  # cosine similarity to reuse a speaker label from earlier windows
+
+# Diarization Parameters
+DIARIZATION_MIN_SPEAKERS = 1
+DIARIZATION_MAX_SPEAKERS = 5
+DIARIZATION_MODEL_ID = "pyannote/speaker-diarization-3.1"
+# Local model directory (containing config.yaml); skips the Hugging Face check
+DIARIZATION_MODEL_DIR = os.getenv("DIARIZATION_MODEL_DIR")
+
+# CPU Inference Profile (see diarization/inference_profile.py)
+INFERENCE_THREADS = None  # torch intra-op threads per process; None keeps torch's default
+SEGMENTATION_STEP = 0.1  # step of the segmentation window, as a ratio of its duration
+SEGMENTATION_BATCH_SIZE = 32  # segmentation windows per forward pass
+DIARIZATION_EMBEDDING_BATCH_SIZE = 32  # (chunk, speaker) embeddings per forward pass
+QUANTIZE_SEGMENTATION = False  # dynamic int8 weights for the segmentation LSTM and linear layers
+QUANTIZE_EMBEDDING = False  # dynamic int8 weights for the embedding network's linear layers
+
+# Speaker Identification Parameters
+EMBEDDING_MODEL_ID = "pyannote/wespeaker-voxceleb-resnet34-LM"
+# Local embedding checkpoint (file or directory with pytorch_model.bin)
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR")
+EMBEDDING_MIN_DURATION = 0.5  # seconds; shorter segments are zero-padded
+EMBEDDING_BATCH_SIZE = 32  # clips per batched forward pass
+EMBEDDING_BATCH_MAX_WAIT = 0.01  # seconds a request waits for its batch to fill
+EMBEDDING_BUCKET_RATIO = 1.25  # longest/shortest clip length allowed in one batch
+ONLINE_DIARIZATION_THRESHOLD = 0.5  # cosine similarity to join an existing speaker while streaming
+ONLINE_MIN_SEGMENT_SECONDS = 1.0  # shorter utterances never start a speaker or move a centroid
+ONLINE_MAX_SPEAKERS = 32
+IDENTIFICATION_THRESHOLD = 0.5  # cosine similarity below this is "unknown"
+IDENTIFICATION_TOP_K = 3
+
+# Output Parameters
+SAVE_ARTIFACTS = True  # Write original/cleaned/speech WAVs for each run
+PLAYBACK_ENABLED = True  # Play each stage's audio back (interactive runs only)
+ARTIFACT_QUEUE_SIZE = 8  # Pending background writes before the pipeline waits
+ARTIFACT_FORMAT = "FLAC"  # "FLAC" (lossless, about half the size of WAV on speech) or "WAV"
+ARTIFACT_SUBTYPE = "PCM_16"  # sample format of the artifacts
+ARTIFACT_SPEECH_ONLY = True  # store only the speech spans of the cleaned audio, plus an offsets sidecar
+ARTIFACT_SAVE_ORIGINAL = True  # also keep the unprocessed recording
+ARTIFACT_BLOCK_SECONDS = 10  # audio handed to the encoder per write
+SEGMENT_STORE_ENABLED = True  # Append each run's speaker segments to the segment store
+
+# Metrics Parameters
+METRICS_ENABLED = True  # Per-stage latency/throughput instrumentation
+METRICS_HOST = "127.0.0.1"  # Metrics endpoint is only served locally
+METRICS_PORT = 9464
+
+# Pipeline Engine Parameters (see pipeline/engine.py)
+PIPELINE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pipeline", "default.json")
+PIPELINE_QUEUE_SIZE = 4  # items buffered in front of each stage
+PIPELINE_BATCH_MAX_WAIT = 0.05  # seconds a stage waits for a batch to fill
+
+# Stream Server Parameters
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_READ_SIZE = 8192  # bytes read from a client socket at a time
+SERVER_MAX_PENDING = 32  # utterances queued for the shared model before clients are throttled
+SERVER_INFERENCE_WORKERS = 1  # concurrent calls into the shared speaker model
+
+# File Paths
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "audio")
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
+SPEAKER_DB_DIR = os.getenv("SPEAKER_DB_DIR", os.path.join(OUTPUT_DIR, "speaker_db"))
+SEGMENT_STORE_DIR = os.getenv("SEGMENT_STORE_DIR", os.path.join(OUTPUT_DIR, "segments"))
+
+# Result Cache Parameters
+CACHE_ENABLED = True  # Reuse diarization/embedding results for unchanged audio
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(OUTPUT_DIR, "cache"))
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+def ensure_dirs():
+    """Create the audio and output directories if they don't exist"""
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
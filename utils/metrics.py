@@ -0,0 +1,272 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from bisect import bisect_left
+from utils.config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond audio blocks to model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Real-time factor buckets (processing time / audio time)
+RTF_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+class Counter:
+    def __init__(self, labels=()):
+        self.labels = labels
+        self.value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def set_function(self, function):
+        """Read the value from function() at export time instead of counting"""
+        self._function = function
+
+    def get(self):
+        return float(self._function()) if self._function is not None else self.value
+
+class Gauge(Counter):
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+class Histogram:
+    def __init__(self, labels=(), buckets=DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding it"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.max
+
+class MetricsRegistry:
+    _types = {Counter: 'counter', Gauge: 'gauge', Histogram: 'histogram'}
+
+    def __init__(self):
+        """
+        Collection of counters, gauges and histograms
+
+        Metrics are created on first use and looked up by name and labels.
+        Recording a value is a bisect plus a few additions under a
+        per-metric lock, which is cheap enough for the audio hot path.
+        """
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(labels=key[1], **kwargs)
+                    self._metrics[key] = metric
+                    self._help.setdefault(name, (help_text, self._types[cls]))
+        return metric
+
+    def counter(self, name, help_text="", **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", **labels):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def _snapshot(self):
+        """Registered metrics sorted by key, copied under the lock so others can register meanwhile"""
+        with self._lock:
+            items = list(self._metrics.items())
+        return sorted(items, key=lambda item: item[0])
+
+    def render_prometheus(self):
+        """
+        Export all metrics in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        by_name = {}
+        for (name, _), metric in self._snapshot():
+            by_name.setdefault(name, []).append(metric)
+        with self._lock:
+            help_by_name = dict(self._help)
+
+        for name, metrics in by_name.items():
+            help_text, metric_type = help_by_name[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for metric in metrics:
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, metric.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(metric.labels, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(metric.labels, ('le', '+Inf'))} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(metric.labels)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(metric.labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labels)} {metric.get()}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Summarize all metrics as plain data
+
+        Returns:
+            dict: Metric name -> list of {labels, value} or histogram statistics
+        """
+        result = {}
+        for (name, labels), metric in self._snapshot():
+            entry = {'labels': dict(labels)}
+            if isinstance(metric, Histogram):
+                entry.update({
+                    'count': metric.count,
+                    'sum': metric.sum,
+                    'mean': metric.sum / metric.count if metric.count else 0.0,
+                    'p50': metric.quantile(0.5),
+                    'p95': metric.quantile(0.95),
+                    'max': metric.max
+                })
+            else:
+                entry['value'] = metric.get()
+            result.setdefault(name, []).append(entry)
+        return result
+
+    def write_summary(self, path):
+        """Write summary() to a JSON file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"Metrics summary saved to {path}")
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+            self._help.clear()
+            _stage_metrics.clear()
+
+# Process-wide registry used by all pipeline stages
+METRICS = MetricsRegistry()
+# Per-stage metric objects, so timing a stage skips the registry lookup
+_stage_metrics = {}
+
+def record_stage(stage, wall_seconds, cpu_seconds=None, audio_seconds=None):
+    """
+    Record one run of a pipeline stage
+
+    Args:
+        stage (str): Stage name, e.g. "vad"
+        wall_seconds (float): Elapsed time
+        cpu_seconds (float, optional): CPU time of the calling thread
+        audio_seconds (float, optional): Audio processed, for the real-time factor
+    """
+    if not METRICS_ENABLED:
+        return
+    metrics = _stage_metrics.get(stage)
+    if metrics is None:
+        metrics = _stage_metrics[stage] = (
+            METRICS.histogram('pipeline_stage_wall_seconds', "Wall time per stage run", stage=stage),
+            METRICS.histogram('pipeline_stage_cpu_seconds', "CPU time per stage run", stage=stage),
+            METRICS.histogram('pipeline_stage_realtime_factor', "Processing time divided by audio time",
+                              buckets=RTF_BUCKETS, stage=stage),
+            METRICS.counter('pipeline_stage_audio_seconds_total', "Audio processed per stage", stage=stage))
+    wall, cpu, realtime_factor, audio_total = metrics
+
+    wall.observe(wall_seconds)
+    if cpu_seconds is not None:
+        cpu.observe(cpu_seconds)
+    if audio_seconds:
+        realtime_factor.observe(wall_seconds / audio_seconds)
+        audio_total.inc(audio_seconds)
+
+@contextmanager
+def stage_timer(stage, audio_seconds=None):
+    """
+    Time a block as one run of a pipeline stage
+
+    Args:
+        stage (str): Stage name
+        audio_seconds (float, optional): Audio processed, for the real-time factor
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - wall_start,
+                     time.thread_time() - cpu_start, audio_seconds)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics'):
+            body = METRICS.render_prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path.startswith('/summary'):
+            body = json.dumps(METRICS.summary()).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the console
+
+def serve_metrics(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serve /metrics (Prometheus text) and /summary (JSON) on a background thread
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
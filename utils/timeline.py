@@ -0,0 +1,92 @@
+import numpy as np
+
+class OffsetMap:
+    def __init__(self, spans, sample_rate):
+        """
+        Map times in concatenated speech back to the original recording
+
+        Diarizing only the speech spans gives times on a shortened signal in
+        which the spans follow each other with the silence cut out. This
+        keeps where each span starts in both timelines so those times can be
+        translated back.
+
+        Args:
+            spans (numpy.ndarray): (n, 2) [start, end) sample indices of the
+                speech spans in the original audio, in order, not overlapping
+            sample_rate (int): Sample rate of the audio
+        """
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.spans = spans
+        self.sample_rate = sample_rate
+        lengths = spans[:, 1] - spans[:, 0]
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        self.compact_ends = self.compact_starts + lengths
+
+    def __len__(self):
+        return len(self.spans)
+
+    @property
+    def speech_samples(self):
+        """Length of the concatenated speech in samples"""
+        return int(self.compact_ends[-1]) if len(self.spans) else 0
+
+    def extract(self, audio_data):
+        """
+        Concatenate the speech spans of the original audio
+
+        Args:
+            audio_data (numpy.ndarray): Original audio
+
+        Returns:
+            numpy.ndarray: Speech-only audio matching this map
+        """
+        if not len(self.spans):
+            return audio_data[:0]
+        return np.concatenate([audio_data[start:end] for start, end in self.spans])
+
+    def to_original(self, times):
+        """
+        Translate times on the speech-only timeline to the original one
+
+        Args:
+            times (float or numpy.ndarray): Seconds into the concatenated speech
+
+        Returns:
+            float or numpy.ndarray: Seconds into the original recording
+        """
+        samples = np.asarray(times, dtype=np.float64) * self.sample_rate
+        index = np.clip(np.searchsorted(self.compact_starts, samples, side='right') - 1, 0, len(self.spans) - 1)
+        original = self.spans[index, 0] + (samples - self.compact_starts[index])
+        result = original / self.sample_rate
+        return float(result) if np.ndim(result) == 0 else result
+
+    def map_segments(self, segments):
+        """
+        Translate speaker segments to original-recording time
+
+        A segment that runs across the join between two spans is split into
+        one piece per span, so no piece covers removed silence.
+
+        Args:
+            segments (list): Dicts with 'start' and 'end' in speech-only seconds
+
+        Returns:
+            list: Dicts with the same keys, 'start'/'end'/'duration' in original seconds
+        """
+        mapped = []
+        for segment in segments:
+            start = segment['start'] * self.sample_rate
+            end = segment['end'] * self.sample_rate
+            first = max(int(np.searchsorted(self.compact_ends, start, side='right')), 0)
+            last = int(np.searchsorted(self.compact_starts, end, side='left'))
+            for index in range(first, min(last, len(self.spans))):
+                piece_start = max(start, self.compact_starts[index])
+                piece_end = min(end, self.compact_ends[index])
+                if piece_end <= piece_start:
+                    continue
+                offset = self.spans[index, 0] - self.compact_starts[index]
+                original_start = (piece_start + offset) / self.sample_rate
+                original_end = (piece_end + offset) / self.sample_rate
+                mapped.append(dict(segment, start=float(original_start), end=float(original_end),
+                                   duration=float(original_end - original_start)))
+        return mapped
@@ -0,0 +1,179 @@
+import webrtcvad
+import numpy as np
+from utils.config import (SAMPLE_RATE, VAD_FRAME_DURATION, VAD_BACKEND, VAD_ENERGY_GATE,
+                          VAD_SILENCE_DB, VAD_GATE_SPEECH, VAD_SPEECH_DB, VAD_SPEECH_MAX_ZCR)
+from utils.metrics import METRICS
+
+# Backend name -> class; see register_backend
+_BACKENDS = {}
+
+def register_backend(name):
+    """
+    Class decorator that makes a VAD backend available by name
+
+    A backend is built as cls(mode, sample_rate, frame_size) and must
+    provide decide(frames) taking an (n, frame_size) int16 array and
+    returning n booleans. It sees frames in stream order, minus the ones
+    the energy gate already decided.
+    """
+    def decorator(cls):
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def available_backends():
+    return sorted(_BACKENDS)
+
+@register_backend('webrtc')
+class WebRTCBackend:
+    def __init__(self, mode, sample_rate, frame_size):
+        self.vad = webrtcvad.Vad(mode)
+        self.sample_rate = sample_rate
+        self.frame_bytes = frame_size * 2
+
+    def decide(self, frames):
+        buffer = memoryview(np.ascontiguousarray(frames)).cast('B')
+        decisions = np.empty(len(frames), dtype=bool)
+        for i in range(len(frames)):
+            try:
+                decisions[i] = self.vad.is_speech(buffer[i * self.frame_bytes:(i + 1) * self.frame_bytes],
+                                                  self.sample_rate)
+            except Exception as e:
+                print(f"VAD Error: {str(e)}")
+                decisions[i] = False
+        return decisions
+
+@register_backend('energy')
+class EnergyBackend:
+    # Energy-only decision for frames the gate left open: louder than this is speech
+    threshold_db = {0: -45.0, 1: -42.0, 2: -40.0, 3: -36.0}
+
+    def __init__(self, mode, sample_rate, frame_size):
+        self.threshold = 10 ** (self.threshold_db[mode] / 10) * (32768.0 ** 2)
+
+    def decide(self, frames):
+        frames = frames.astype(np.float32)
+        return np.einsum('ij,ij->i', frames, frames) / frames.shape[1] >= self.threshold
+
+class VADEngine:
+    def __init__(self, mode=2, sample_rate=SAMPLE_RATE, frame_duration=VAD_FRAME_DURATION,
+                 backend=VAD_BACKEND, energy_gate=VAD_ENERGY_GATE, silence_db=VAD_SILENCE_DB,
+                 gate_speech=VAD_GATE_SPEECH, speech_db=VAD_SPEECH_DB, speech_max_zcr=VAD_SPEECH_MAX_ZCR):
+        """
+        Frame-level speech decisions with an energy gate in front of a backend
+
+        Frame energy (dBFS) is computed for a whole block of frames in one
+        vectorized pass. Frames quieter than silence_db are non-speech;
+        every other frame goes to the backend (webrtcvad by default). On
+        recordings that are mostly idle, most frames never leave NumPy.
+
+        With gate_speech, frames louder than speech_db with a voiced
+        zero-crossing rate are also called speech without the backend.
+        That skips the backend on loud speech too, but loud hum, HVAC noise
+        or music pass the same test, so it is off by default.
+
+        Args:
+            mode (int): Aggressiveness (0-3), passed to the backend
+            sample_rate (int): Sample rate of the audio
+            frame_duration (int): Frame length in ms (10, 20 or 30)
+            backend (str): Registered backend name
+            energy_gate (bool): Decide clearly silent frames from their energy;
+                when False every frame goes to the backend
+            silence_db (float): Frames below this level are silence
+            gate_speech (bool): Also decide loud voiced frames without the backend
+            speech_db (float): Frames above this level may be speech without the backend
+            speech_max_zcr (float): Highest zero-crossing rate (crossings per
+                sample) of a loud frame that counts as speech without the backend
+        """
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown VAD backend '{backend}', expected one of {available_backends()}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.frame_duration = frame_duration
+        self.frame_size = int(sample_rate * frame_duration / 1000)
+        self.backend = _BACKENDS[backend](mode, sample_rate, self.frame_size)
+        self.energy_gate = energy_gate
+        self.gate_speech = gate_speech
+        # Thresholds on the summed squares of int16 frames, so no log per frame
+        scale = self.frame_size * 32768.0 ** 2
+        self.silence_energy = 10 ** (silence_db / 10) * scale
+        self.speech_energy = 10 ** (speech_db / 10) * scale
+        self.speech_max_crossings = speech_max_zcr * self.frame_size
+        self._frame_counts = {path: METRICS.counter('vad_frames_total', "VAD frames by deciding path",
+                                                    path=path)
+                              for path in ('gate_silence', 'gate_speech', 'backend')}
+
+    def features(self, samples, frames=None):
+        """
+        Per-frame energy and zero crossings
+
+        Args:
+            samples (numpy.ndarray): (n, frame_size) float32 frames on the int16 scale
+            frames (numpy.ndarray, optional): The same frames as int16; when
+                given, zero crossings are counted too
+
+        Returns:
+            tuple: (sum of squares, number of sign changes or None) per frame
+        """
+        energy = np.einsum('ij,ij->i', samples, samples)
+        if frames is None:
+            return energy, None
+        negative = frames < 0
+        crossings = np.count_nonzero(negative[:, 1:] != negative[:, :-1], axis=1)
+        return energy, crossings
+
+    def frame_decisions(self, audio_data, block_frames=500):
+        """
+        Speech decision for every complete frame
+
+        Args:
+            audio_data (numpy.ndarray): Float audio in [-1, 1], or int16 PCM
+            block_frames (int): Frames converted and scored per vectorized pass
+
+        Returns:
+            numpy.ndarray: Boolean speech decision per frame
+        """
+        num_frames = len(audio_data) // self.frame_size
+        decisions = np.zeros(num_frames, dtype=bool)
+        block_size = block_frames * self.frame_size
+        scratch = np.empty(block_size, dtype=np.float32)
+        pcm = np.empty(block_size, dtype=np.int16)
+
+        for block_start in range(0, num_frames * self.frame_size, block_size):
+            block = audio_data[block_start:min(block_start + block_size, num_frames * self.frame_size)]
+            n = len(block)
+            if block.dtype == np.int16:
+                pcm[:n] = block
+                scratch[:n] = block
+            else:
+                np.clip(block, -1.0, 1.0, out=scratch[:n])
+                np.multiply(scratch[:n], 32767, out=scratch[:n])
+                pcm[:n] = scratch[:n]
+            first = block_start // self.frame_size
+            decisions[first:first + n // self.frame_size] = self._decide(
+                pcm[:n].reshape(-1, self.frame_size), scratch[:n].reshape(-1, self.frame_size))
+        return decisions
+
+    def _decide(self, frames, samples):
+        if not self.energy_gate:
+            self._frame_counts['backend'].inc(len(frames))
+            return self.backend.decide(frames)
+
+        energy, _ = self.features(samples)
+        decisions = np.zeros(len(frames), dtype=bool)
+        # Zero crossings are only needed for the few loud frames
+        loud = np.flatnonzero(energy >= self.speech_energy) if self.gate_speech else ()
+        if len(loud):
+            _, crossings = self.features(samples[loud], frames[loud])
+            decisions[loud[crossings <= self.speech_max_crossings]] = True
+        ambiguous = np.flatnonzero((energy >= self.silence_energy) & ~decisions)
+        if len(ambiguous) == len(frames):
+            decisions = self.backend.decide(frames)
+        elif len(ambiguous):
+            decisions[ambiguous] = self.backend.decide(frames[ambiguous])
+
+        gated_speech = len(frames) - len(ambiguous) - int(np.count_nonzero(energy < self.silence_energy))
+        self._frame_counts['backend'].inc(len(ambiguous))
+        self._frame_counts['gate_speech'].inc(gated_speech)
+        self._frame_counts['gate_silence'].inc(len(frames) - len(ambiguous) - gated_speech)
+        return decisions
@@ -0,0 +1,123 @@
+import numpy as np
+from vad.engine import VADEngine
+from utils.config import (SAMPLE_RATE, VAD_FRAME_DURATION, VAD_MAX_SILENCE_FRAMES,
+                          VAD_MIN_SEGMENT_FRAMES)
+
+class StreamingVAD:
+    def __init__(self, mode=2, sample_rate=SAMPLE_RATE, frame_duration=VAD_FRAME_DURATION,
+                 max_silence_frames=VAD_MAX_SILENCE_FRAMES,
+                 min_segment_frames=VAD_MIN_SEGMENT_FRAMES, keep_audio=True):
+        """
+        Initialize incremental Voice Activity Detection
+
+        Audio can be fed in blocks of any size; complete utterances are
+        returned as soon as the trailing silence exceeds max_silence_frames.
+
+        Args:
+            mode (int): VAD aggressiveness mode (0-3)
+            sample_rate (int): Sample rate of the audio
+            frame_duration (int): Frame length in ms (10, 20 or 30)
+            max_silence_frames (int): Silence frames that end an utterance
+            min_segment_frames (int): Minimum frames for a valid utterance
+            keep_audio (bool): Return each utterance's samples; when False
+                only its times are tracked, so memory stays constant even
+                for hours of continuous speech
+        """
+        self.engine = VADEngine(mode, sample_rate, frame_duration)
+        self.sample_rate = sample_rate
+        self.frame_size = self.engine.frame_size
+        self.max_silence_frames = max_silence_frames
+        self.min_segment_frames = min_segment_frames
+        self.keep_audio = keep_audio
+        self.reset()
+
+    def reset(self):
+        """Forget any buffered audio and start a new timeline at zero"""
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._segment_frames = []
+        self._segment_length = 0  # frames in the current segment
+        self._segment_start = 0
+        self._silence_frames = 0
+        self._in_speech = False
+        self._position = 0  # absolute sample index of the next frame
+
+    def _close_segment(self):
+        """Return the current segment as an utterance, or None if too short"""
+        frames = self._segment_frames
+        length = self._segment_length
+        self._segment_frames = []
+        self._segment_length = 0
+        self._in_speech = False
+        self._silence_frames = 0
+        if length < self.min_segment_frames:
+            return None
+        start = self._segment_start / self.sample_rate
+        return {
+            'start': start,
+            'end': start + length * self.frame_size / self.sample_rate,
+            'audio': np.concatenate(frames) if self.keep_audio else None
+        }
+
+    def _add_frame(self, frame):
+        self._segment_length += 1
+        if self.keep_audio:
+            self._segment_frames.append(frame)
+
+    def process_chunk(self, chunk):
+        """
+        Feed a block of audio and collect the utterances it completes
+
+        Args:
+            chunk (numpy.ndarray): Mono float audio in [-1, 1]
+
+        Returns:
+            list: Utterance dicts with 'start', 'end' (seconds since the
+                  first chunk) and 'audio' (float32 samples, or None
+                  without keep_audio)
+        """
+        # Frames are kept as views, so never hold on to the caller's buffer
+        if len(self._pending):
+            chunk = np.concatenate([self._pending, np.asarray(chunk, dtype=np.float32)])
+        else:
+            chunk = np.array(chunk, dtype=np.float32)
+
+        utterances = []
+        num_frames = len(chunk) // self.frame_size
+        # One vectorized pass over the chunk; only ambiguous frames reach webrtcvad
+        decisions = self.engine.frame_decisions(chunk[:num_frames * self.frame_size])
+        for i in range(num_frames):
+            frame = chunk[i * self.frame_size:(i + 1) * self.frame_size]
+
+            if decisions[i]:
+                if not self._in_speech:
+                    self._segment_start = self._position
+                    self._in_speech = True
+                self._add_frame(frame)
+                self._silence_frames = 0
+            elif self._in_speech:
+                self._silence_frames += 1
+                if self._silence_frames > self.max_silence_frames:
+                    utterance = self._close_segment()
+                    if utterance is not None:
+                        utterances.append(utterance)
+                else:
+                    self._add_frame(frame)
+
+            self._position += self.frame_size
+
+        # Keep the incomplete tail for the next call
+        self._pending = chunk[num_frames * self.frame_size:].copy()
+        return utterances
+
+    def flush(self):
+        """
+        Close the utterance in progress at the end of a stream
+
+        Returns:
+            list: The final utterance, if one was long enough
+        """
+        self._pending = np.zeros(0, dtype=np.float32)
+        if not self._in_speech:
+            return []
+        utterance = self._close_segment()
+        return [utterance] if utterance is not None else []
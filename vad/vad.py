@@ -1,108 +1,138 @@
-import webrtcvad
-import numpy as np
-from utils.config import SAMPLE_RATE, VAD_MODE
-
-class VAD:
-    def __init__(self, mode=2):  # Using mode 2 for balanced sensitivity
-        """
-        Initialize Voice Activity Detection
-        
-        Args:
-            mode (int): VAD aggressiveness mode (0-3)
-                      0: Least aggressive
-                      3: Most aggressive
-        """
-        self.vad = webrtcvad.Vad(mode)
-        self.frame_duration = 20  # ms, using 20ms frames for better detection
-        self.frame_size = int(SAMPLE_RATE * self.frame_duration / 1000)
-        
-    def is_speech(self, audio_bytes, sample_rate=SAMPLE_RATE):
-        """
-        Check if the given audio frame contains speech
-        
-        Args:
-            audio_bytes (bytes): Audio data in bytes
-            sample_rate (int): Sample rate of the audio
-            
-        Returns:
-            bool: True if speech is detected, False otherwise
-        """
-        try:
-            # Ensure audio is the correct length
-            if len(audio_bytes) != self.frame_size * 2:  # 2 bytes per sample
-                # Pad or truncate to correct length
-                if len(audio_bytes) < self.frame_size * 2:
-                    audio_bytes = audio_bytes + b'\x00' * (self.frame_size * 2 - len(audio_bytes))
-                else:
-                    audio_bytes = audio_bytes[:self.frame_size * 2]
-            
-            return self.vad.is_speech(audio_bytes, sample_rate)
-        except Exception as e:
-            print(f"VAD Error: {str(e)}")
-            return False
-    
-    def process_audio(self, audio_data, sample_rate=SAMPLE_RATE):
-        """
-        Process audio data and return speech segments
-        
-        Args:
-            audio_data (numpy.ndarray): Audio data
-            sample_rate (int): Sample rate of the audio
-            
-        Returns:
-            list: List of speech segments
-        """
-        # Convert to 16-bit PCM
-        audio_data = np.clip(audio_data, -1.0, 1.0)  # Ensure values are in [-1, 1]
-        audio_data = (audio_data * 32767).astype(np.int16)
-        
-        # Process in frames
-        speech_segments = []
-        current_segment = []
-        in_speech = False
-        silence_frames = 0
-        max_silence_frames = 10  # Allow more silence between speech segments
-        min_segment_frames = 5  # Minimum frames for a valid speech segment
-        
-        for i in range(0, len(audio_data), self.frame_size):
-            frame = audio_data[i:i + self.frame_size]
-            if len(frame) != self.frame_size:
-                continue
-                
-            frame_bytes = frame.tobytes()
-            is_speech = self.is_speech(frame_bytes, sample_rate)
-            
-            if is_speech:
-                if silence_frames > 0:
-                    # Add silence frames to maintain continuity
-                    current_segment.extend([0] * silence_frames * self.frame_size)
-                current_segment.extend(frame)
-                in_speech = True
-                silence_frames = 0
-            elif in_speech:
-                silence_frames += 1
-                if silence_frames > max_silence_frames:
-                    if current_segment and len(current_segment) >= min_segment_frames * self.frame_size:
-                        speech_segments.append(np.array(current_segment))
-                    current_segment = []
-                    in_speech = False
-                    silence_frames = 0
-                else:
-                    current_segment.extend(frame)
-        
-        # Add final segment if in speech
-        if in_speech and current_segment and len(current_segment) >= min_segment_frames * self.frame_size:
-            speech_segments.append(np.array(current_segment))
-        
-        # Convert segments back to float32 and normalize
-        processed_segments = []
-        for segment in speech_segments:
-            # Convert to float32
-            segment = segment.astype(np.float32) / 32767.0
-            # Normalize segment
-            max_val = np.max(np.abs(segment))
-            if max_val > 0:
-                segment = segment / max_val
-            processed_segments.append(segment)
-        
-        return processed_segments
\ No newline at end of file
+import numpy as np
+from vad.engine import VADEngine
+from utils.config import (SAMPLE_RATE, VAD_MODE, VAD_FRAME_DURATION, VAD_BACKEND, VAD_MAX_SILENCE_FRAMES,
+                          VAD_MIN_SEGMENT_FRAMES)
+
+class VAD:
+    def __init__(self, mode=2, backend=VAD_BACKEND):  # Using mode 2 for balanced sensitivity
+        """
+        Initialize Voice Activity Detection
+        
+        Args:
+            mode (int): VAD aggressiveness mode (0-3)
+                      0: Least aggressive
+                      3: Most aggressive
+            backend (str): Backend for frames the energy gate cannot decide
+        """
+        self.mode = mode
+        self.frame_duration = VAD_FRAME_DURATION  # ms, using 20ms frames for better detection
+        self.backend = backend
+        self.engine = self._make_engine(SAMPLE_RATE)
+        self.frame_size = self.engine.frame_size
+        self.max_silence_frames = VAD_MAX_SILENCE_FRAMES  # Allow more silence between speech segments
+        self.min_segment_frames = VAD_MIN_SEGMENT_FRAMES  # Minimum frames for a valid speech segment
+
+    def _make_engine(self, sample_rate):
+        return VADEngine(self.mode, sample_rate, self.frame_duration, backend=self.backend)
+
+    def _engine_for(self, sample_rate):
+        if sample_rate != self.engine.sample_rate:
+            self.engine = self._make_engine(sample_rate)
+            self.frame_size = self.engine.frame_size
+        return self.engine
+        
+    def is_speech(self, audio_bytes, sample_rate=SAMPLE_RATE):
+        """
+        Check if the given audio frame contains speech
+        
+        Args:
+            audio_bytes (bytes): Audio data in bytes
+            sample_rate (int): Sample rate of the audio
+            
+        Returns:
+            bool: True if speech is detected, False otherwise
+        """
+        engine = self._engine_for(sample_rate)
+        frame = np.zeros(engine.frame_size, dtype=np.int16)
+        # Pad or truncate to correct length
+        samples = np.frombuffer(audio_bytes, dtype=np.int16, count=min(len(audio_bytes) // 2, engine.frame_size))
+        frame[:len(samples)] = samples
+        return bool(engine.frame_decisions(frame)[0])
+    
+    def frame_decisions(self, audio_data, sample_rate=SAMPLE_RATE, block_frames=500):
+        """
+        Run the VAD on every complete frame of the audio
+
+        The audio is converted to 16-bit PCM one block at a time, so memory
+        use does not grow with the length of the recording. Clearly silent
+        frames are decided by the engine's energy gate (see VADEngine); the
+        rest go to the backend.
+
+        Args:
+            audio_data (numpy.ndarray): Float audio data in [-1, 1]
+            sample_rate (int): Sample rate of the audio
+            block_frames (int): Frames converted per block
+
+        Returns:
+            numpy.ndarray: Boolean speech decision per frame
+        """
+        return self._engine_for(sample_rate).frame_decisions(audio_data, block_frames)
+
+    def detect_segments(self, audio_data, sample_rate=SAMPLE_RATE):
+        """
+        Find speech segments as sample ranges of the input audio
+
+        Args:
+            audio_data (numpy.ndarray): Float audio data in [-1, 1]
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            numpy.ndarray: (num_segments, 2) array of [start, end) sample indices
+        """
+        decisions = self.frame_decisions(audio_data, sample_rate)
+        frame_segments = segments_from_decisions(decisions, self.max_silence_frames,
+                                                 self.min_segment_frames)
+        return frame_segments * self.frame_size
+
+    def process_audio(self, audio_data, sample_rate=SAMPLE_RATE, return_offsets=False):
+        """
+        Process audio data and return speech segments
+
+        Segments are views into audio_data, so no samples are copied.
+
+        Args:
+            audio_data (numpy.ndarray): Audio data
+            sample_rate (int): Sample rate of the audio
+            return_offsets (bool): Also return the [start, end) sample indices
+
+        Returns:
+            list: List of speech segments, plus the (num_segments, 2) offset
+                  array when return_offsets is True
+        """
+        audio_data = np.asarray(audio_data)
+        offsets = self.detect_segments(audio_data, sample_rate)
+        segments = [audio_data[start:end] for start, end in offsets]
+        if return_offsets:
+            return segments, offsets
+        return segments
+
+def segments_from_decisions(decisions, max_silence_frames=VAD_MAX_SILENCE_FRAMES,
+                            min_segment_frames=VAD_MIN_SEGMENT_FRAMES):
+    """
+    Turn per-frame speech decisions into segments
+
+    A segment runs from a speech frame until more than max_silence_frames
+    silent frames follow the last speech frame; up to max_silence_frames of
+    trailing silence are kept as hangover. Segments shorter than
+    min_segment_frames (hangover included) are dropped.
+
+    Args:
+        decisions (numpy.ndarray): Boolean speech decision per frame
+        max_silence_frames (int): Silence frames allowed inside a segment
+        min_segment_frames (int): Minimum frames for a valid segment
+
+    Returns:
+        numpy.ndarray: (num_segments, 2) array of [start, end) frame indices
+    """
+    speech_frames = np.flatnonzero(decisions)
+    if len(speech_frames) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    gaps = np.diff(speech_frames) - 1
+    breaks = np.flatnonzero(gaps > max_silence_frames)
+    starts = speech_frames[np.concatenate(([0], breaks + 1))]
+    last_speech = speech_frames[np.concatenate((breaks, [len(speech_frames) - 1]))]
+    ends = np.minimum(last_speech + 1 + max_silence_frames, len(decisions))
+
+    keep = (ends - starts) >= min_segment_frames
+    return np.stack((starts[keep], ends[keep]), axis=1).astype(np.int64)
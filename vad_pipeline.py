@@ -1,102 +1,359 @@
-from audio.recorder import record_audio
-from audio.noise_reduction import reduce_noise
-from vad.vad import VAD
-from diarization.speaker_diarization import get_speaker_segments
-from utils.config import SAMPLE_RATE, DURATION, VAD_FRAME_DURATION, OUTPUT_DIR
-import soundfile as sf
-import numpy as np
-import os
-from datetime import datetime
-from audio.audio_io import AudioIO
-
-def verify_audio(audio, sample_rate):
-    """Verify audio data is valid"""
-    if audio is None or len(audio) == 0:
-        raise ValueError("No audio data recorded")
-    if not isinstance(audio, np.ndarray):
-        raise ValueError("Audio data must be numpy array")
-    if np.isnan(audio).any() or np.isinf(audio).any():
-        raise ValueError("Audio data contains invalid values")
-    print(f"Audio verification passed: {len(audio)/sample_rate:.2f} seconds of audio")
-
-def run_vad_pipeline():
-    """
-    Run the complete pipeline:
-    1. Record audio
-    2. Reduce noise
-    3. Detect voice activity
-    4. Perform speaker diarization
-    """
-    try:
-        # Initialize AudioIO
-        audio_io = AudioIO()
-        
-        # Step 1: Record Audio
-        print("\n=== Step 1: Recording Audio ===")
-        print(f"Recording for {DURATION} seconds at {SAMPLE_RATE}Hz...")
-        audio = record_audio(duration=DURATION, sample_rate=SAMPLE_RATE)
-        verify_audio(audio, SAMPLE_RATE)
-        
-        # Save original recording
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        original_file = os.path.join(OUTPUT_DIR, f"original_{timestamp}.wav")
-        audio_io.save_audio(audio, original_file)
-        print("\nPlaying original recording...")
-        audio_io.play_audio_file(original_file)
-
-        # Step 2: Reduce Noise
-        print("\n=== Step 2: Noise Reduction ===")
-        print("Applying noise reduction...")
-        clean_audio = reduce_noise(audio, sample_rate=SAMPLE_RATE)
-        verify_audio(clean_audio, SAMPLE_RATE)
-        print("Noise reduction completed")
-        
-        # Save cleaned audio
-        cleaned_file = os.path.join(OUTPUT_DIR, f"cleaned_{timestamp}.wav")
-        audio_io.save_audio(clean_audio, cleaned_file)
-        print("\nPlaying cleaned audio...")
-        audio_io.play_audio_file(cleaned_file)
-
-        # Step 3: Voice Activity Detection
-        print("\n=== Step 3: Voice Activity Detection ===")
-        vad = VAD()
-        speech_segments = vad.process_audio(clean_audio, SAMPLE_RATE)
-        
-        if not speech_segments:
-            print("No speech detected")
-            return
-
-        print(f"Detected {len(speech_segments)} speech segments")
-        total_speech_duration = sum(len(seg) for seg in speech_segments) / SAMPLE_RATE
-        print(f"Total speech duration: {total_speech_duration:.2f} seconds")
-        
-        # Combine speech segments
-        speech_audio = np.concatenate(speech_segments)
-        
-        # Save speech audio
-        speech_file = os.path.join(OUTPUT_DIR, f"speech_{timestamp}.wav")
-        audio_io.save_audio(speech_audio, speech_file)
-        print("\nPlaying speech-only segments...")
-        audio_io.play_audio_file(speech_file)
-
-        # Step 4: Speaker Diarization
-        print("\n=== Step 4: Speaker Diarization ===")
-        print("Analyzing speaker segments...")
-        diarization_results = get_speaker_segments(speech_audio, SAMPLE_RATE)
-        
-        # Print results
-        print(f"\nResults:")
-        print(f"Number of speakers detected: {diarization_results['num_speakers']}")
-        print("\nSpeaker segments:")
-        for segment in diarization_results['segments']:
-            print(f"Speaker {segment['speaker']}: {segment['start']:.2f}s - {segment['end']:.2f}s "
-                  f"(duration: {segment['duration']:.2f}s)")
-
-        print("\nPipeline completed successfully!")
-
-    except Exception as e:
-        print(f"\nError in pipeline: {str(e)}")
-        raise
-
-if __name__ == "__main__":
-    run_vad_pipeline()
+from audio.recorder import record_audio, AudioRecorder
+from audio.noise_reduction import reduce_noise, StreamingNoiseReducer
+from vad.vad import VAD
+from vad.streaming_vad import StreamingVAD
+from diarization.speaker_diarization import get_speaker_segments, get_diarizer, SpeakerDiarizer
+from diarization.speaker_embedding import SpeakerEmbedder
+from diarization.online_diarization import OnlineDiarizer
+from identification.speaker_database import SpeakerDatabase, UNKNOWN_SPEAKER
+from identification.speaker_identifier import SpeakerIdentifier
+from storage.segment_store import SegmentStore
+from utils.config import (SAMPLE_RATE, DURATION, VAD_FRAME_DURATION, OUTPUT_DIR,
+                          STREAM_READ_TIMEOUT, STREAM_MAX_PENDING_UTTERANCES, METRICS_ENABLED,
+                          SAVE_ARTIFACTS, PLAYBACK_ENABLED, SEGMENT_STORE_ENABLED, ARTIFACT_SPEECH_ONLY,
+                          ARTIFACT_SAVE_ORIGINAL, ensure_dirs)
+from utils.metrics import METRICS, stage_timer
+import soundfile as sf
+import numpy as np
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from audio.audio_io import AudioIO
+from audio.artifact_writer import ArtifactWriter
+
+def verify_audio(audio, sample_rate):
+    """Verify audio data is valid"""
+    if audio is None or len(audio) == 0:
+        raise ValueError("No audio data recorded")
+    if not isinstance(audio, np.ndarray):
+        raise ValueError("Audio data must be numpy array")
+    if np.isnan(audio).any() or np.isinf(audio).any():
+        raise ValueError("Audio data contains invalid values")
+    print(f"Audio verification passed: {len(audio)/sample_rate:.2f} seconds of audio")
+
+def run_vad_pipeline(headless=False, save_artifacts=SAVE_ARTIFACTS):
+    """
+    Run the complete pipeline:
+    1. Record audio
+    2. Reduce noise
+    3. Detect voice activity
+    4. Perform speaker diarization
+
+    Stage results are handed on in memory. Artifacts are written by a
+    background writer, so saving never holds up the next stage.
+
+    Args:
+        headless (bool): Production mode; never play audio back
+        save_artifacts (bool): Write the original, cleaned and speech audio
+    """
+    ensure_dirs()
+    playback = PLAYBACK_ENABLED and not headless
+    writer = ArtifactWriter(SAMPLE_RATE) if save_artifacts else None
+    try:
+        # Initialize AudioIO
+        audio_io = AudioIO()
+        
+        # Step 1: Record Audio
+        print("\n=== Step 1: Recording Audio ===")
+        print(f"Recording for {DURATION} seconds at {SAMPLE_RATE}Hz...")
+        with stage_timer('record', audio_seconds=DURATION):
+            audio = record_audio(duration=DURATION, sample_rate=SAMPLE_RATE)
+        verify_audio(audio, SAMPLE_RATE)
+        
+        # Save original recording
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        recording_started = time.time() - len(audio) / SAMPLE_RATE
+        if writer is not None and ARTIFACT_SAVE_ORIGINAL:
+            writer.save(audio, os.path.join(OUTPUT_DIR, f"original_{timestamp}.wav"))
+        if playback:
+            audio_io.play_audio(audio, SAMPLE_RATE, "original recording")
+
+        # Step 2: Reduce Noise
+        print("\n=== Step 2: Noise Reduction ===")
+        print("Applying noise reduction...")
+        audio_seconds = len(audio) / SAMPLE_RATE
+        with stage_timer('reduce_noise', audio_seconds=audio_seconds):
+            clean_audio = reduce_noise(audio, sample_rate=SAMPLE_RATE)
+        verify_audio(clean_audio, SAMPLE_RATE)
+        print("Noise reduction completed")
+        
+        # Save cleaned audio (only its speech spans in speech-only mode, after the VAD)
+        if writer is not None and not ARTIFACT_SPEECH_ONLY:
+            writer.save(clean_audio, os.path.join(OUTPUT_DIR, f"cleaned_{timestamp}.wav"))
+        if playback:
+            audio_io.play_audio(clean_audio, SAMPLE_RATE, "cleaned audio")
+
+        # Step 3: Voice Activity Detection
+        print("\n=== Step 3: Voice Activity Detection ===")
+        vad = VAD()
+        with stage_timer('vad', audio_seconds=audio_seconds):
+            speech_segments, speech_spans = vad.process_audio(clean_audio, SAMPLE_RATE, return_offsets=True)
+        
+        if not speech_segments:
+            print("No speech detected")
+            return
+
+        print(f"Detected {len(speech_segments)} speech segments")
+        total_speech_duration = sum(len(seg) for seg in speech_segments) / SAMPLE_RATE
+        print(f"Total speech duration: {total_speech_duration:.2f} seconds")
+        
+        # Combine speech segments
+        speech_audio = np.concatenate(speech_segments)
+        
+        # Save speech audio
+        if writer is not None:
+            speech_path = os.path.join(OUTPUT_DIR, f"speech_{timestamp}.wav")
+            if ARTIFACT_SPEECH_ONLY:
+                # Written span by span from the cleaned audio, with offsets to the original timeline
+                writer.save_speech(clean_audio, speech_spans, speech_path)
+            else:
+                writer.save(speech_audio, speech_path)
+        if playback:
+            audio_io.play_audio(speech_audio, SAMPLE_RATE, "speech-only segments")
+
+        # Step 4: Speaker Diarization
+        print("\n=== Step 4: Speaker Diarization ===")
+        print("Analyzing speaker segments (speech only, times in the original recording)...")
+        with stage_timer('diarization', audio_seconds=len(speech_audio) / SAMPLE_RATE):
+            diarization_results = get_speaker_segments(clean_audio, SAMPLE_RATE, spans=speech_spans)
+        
+        # Print results
+        print(f"\nResults:")
+        print(f"Number of speakers detected: {diarization_results['num_speakers']}")
+        print("\nSpeaker segments:")
+        for segment in diarization_results['segments']:
+            print(f"Speaker {segment['speaker']}: {segment['start']:.2f}s - {segment['end']:.2f}s "
+                  f"(duration: {segment['duration']:.2f}s)")
+
+        # Step 5: Speaker Identification (only once speakers are enrolled)
+        stored_segments = diarization_results['segments']
+        database = SpeakerDatabase()
+        if len(database) > 0:
+            print("\n=== Step 5: Speaker Identification ===")
+            identifier = SpeakerIdentifier(database=database)
+            with stage_timer('identification', audio_seconds=len(speech_audio) / SAMPLE_RATE):
+                identified = identifier.identify_segments(clean_audio, diarization_results['segments'],
+                                                          SAMPLE_RATE)
+            for segment in identified:
+                print(f"Speaker {segment['speaker']} -> {segment['identity']} "
+                      f"(score: {segment['score']:.2f}): {segment['start']:.2f}s - {segment['end']:.2f}s")
+            stored_segments = identified
+
+        if SEGMENT_STORE_ENABLED:
+            store = SegmentStore()
+            # Two runs can start in the same second
+            session = store.unique_session_name(timestamp)
+            # Enrolled names are stable across sessions; diarization labels only mean
+            # something within their session
+            stored_segments = [dict(segment, speaker=segment['identity'])
+                               if segment.get('identity', UNKNOWN_SPEAKER) != UNKNOWN_SPEAKER
+                               else dict(segment, speaker=f"{session}/{segment['speaker']}")
+                               for segment in stored_segments]
+            store.add_session(session, stored_segments, started_at=recording_started)
+            store.flush()
+
+        if METRICS_ENABLED:
+            METRICS.write_summary(os.path.join(OUTPUT_DIR, f"metrics_{timestamp}.json"))
+
+        print("\nPipeline completed successfully!")
+
+    except Exception as e:
+        print(f"\nError in pipeline: {str(e)}")
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+def warmup(diarize=True, identify=True, online=False):
+    """
+    Load the models and run every stage once before real audio arrives
+
+    Heavy dependencies are only imported when a stage first needs them,
+    so this moves that cost, model loading and the first slow inference
+    out of the first request.
+
+    Args:
+        diarize (bool): Load and prime the diarization pipeline
+        identify (bool): Load and prime the embedding model if speakers are enrolled
+        online (bool): Load and prime the embedding model for streaming labels
+    """
+    print("\n=== Warming up ===")
+    start_time = time.perf_counter()
+    t = np.arange(2 * SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+    audio = (0.3 * np.sin(2 * np.pi * 150 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+    clean_audio = reduce_noise(audio, sample_rate=SAMPLE_RATE)
+    VAD().process_audio(clean_audio, SAMPLE_RATE)
+
+    if diarize:
+        # Share the warm pipeline but skip the cache, so priming always runs inference
+        SpeakerDiarizer(pipeline=get_diarizer().pipeline).process_audio(clean_audio, SAMPLE_RATE)
+    if online or (identify and len(SpeakerDatabase()) > 0):
+        SpeakerEmbedder().embed(clean_audio, SAMPLE_RATE)
+
+    print(f"Warmup completed in {time.perf_counter() - start_time:.2f} seconds")
+
+def enroll_speaker(name, files=None):
+    """
+    Enroll a speaker from audio files, or from a microphone recording
+
+    Args:
+        name (str): Speaker name
+        files (list, optional): Reference recordings; records DURATION
+            seconds from the microphone when not given
+    """
+    from batch_pipeline import load_mono
+    clips = []
+    if files:
+        for filename in files:
+            try:
+                # Mixed down and resampled to the pipeline rate, e.g. from 44.1 or 48 kHz
+                clips.append(load_mono(filename, SAMPLE_RATE))
+            except Exception as e:
+                print(f"Error loading audio: {str(e)}")
+    else:
+        print(f"\nRecording reference audio for {name}...")
+        clips.append(record_audio(duration=DURATION, sample_rate=SAMPLE_RATE))
+
+    if not clips:
+        print("No usable reference audio; nothing enrolled")
+        return
+    # Enroll from the speech only, like the segments it will be matched against
+    vad = VAD()
+    speech_clips = []
+    for clip in clips:
+        segments = vad.process_audio(reduce_noise(clip, sample_rate=SAMPLE_RATE), SAMPLE_RATE)
+        if segments:
+            speech_clips.append(np.concatenate(segments))
+    if not speech_clips:
+        print("No speech detected in the reference audio; nothing enrolled")
+        return
+    SpeakerIdentifier().enroll(name, speech_clips, SAMPLE_RATE)
+
+def print_utterance(result):
+    """Default handler for utterances emitted by the streaming pipeline"""
+    print(f"\nUtterance {result['start']:.2f}s - {result['end']:.2f}s "
+          f"(duration: {result['end'] - result['start']:.2f}s)")
+    for segment in result['segments']:
+        print(f"  Speaker {segment['speaker']}: {segment['start']:.2f}s - {segment['end']:.2f}s")
+
+def _label_utterances(utterance_queue, diarizer, on_utterance):
+    """Worker loop: label utterances as the VAD completes them"""
+    while True:
+        utterance = utterance_queue.get()
+        if utterance is None:
+            break
+        try:
+            segments = []
+            if diarizer is not None:
+                with stage_timer('diarization', audio_seconds=utterance['end'] - utterance['start']):
+                    segments.append(diarizer.process_segment(utterance['audio'], SAMPLE_RATE,
+                                                             start=utterance['start']))
+            on_utterance({
+                'start': utterance['start'],
+                'end': utterance['end'],
+                'audio': utterance['audio'],
+                'segments': segments
+            })
+            METRICS.histogram('utterance_latency_seconds', "Time from end of utterance to labeled result"
+                              ).observe(time.perf_counter() - utterance['detected_at'])
+        except Exception as e:
+            print(f"\nError labeling utterance: {str(e)}")
+
+def _queue_utterance(utterance_queue, utterance, dropped, block=False):
+    """Hand an utterance to the labeler, dropping it if too many are already waiting"""
+    utterance['detected_at'] = time.perf_counter()
+    try:
+        utterance_queue.put(utterance, block=block)
+    except queue.Full:
+        # Like the recorder's ring buffer: never stall capture, count what is lost
+        dropped.inc()
+        print(f"\nLabeling is falling behind; dropped utterance {utterance['start']:.2f}s - "
+              f"{utterance['end']:.2f}s")
+
+def run_streaming_pipeline(duration=None, on_utterance=print_utterance, diarize=True,
+                           save_artifacts=SAVE_ARTIFACTS):
+    """
+    Run the pipeline continuously on live microphone input.
+
+    Recorder blocks are filtered and fed to the VAD as soon as they arrive
+    and every completed utterance is labeled on a worker thread, so
+    capture and segmentation never wait on diarization. Speakers are
+    tracked by online clustering, so labels stay the same for the whole
+    session and each utterance costs one embedding. At most
+    STREAM_MAX_PENDING_UTTERANCES utterances wait for labels; when labeling
+    falls that far behind, new utterances are dropped and counted.
+
+    With save_artifacts, every utterance (including dropped ones) is
+    appended to a speech-only archive as it is detected, so the session
+    is never held in memory for saving.
+
+    Args:
+        duration (float, optional): Seconds to run; runs until Ctrl+C if None
+        on_utterance (callable): Called with a dict holding 'start', 'end',
+            'audio' and speaker 'segments' for every utterance
+        diarize (bool): Whether to label utterances with speakers
+        save_artifacts (bool): Write the speech of the session to disk
+    """
+    ensure_dirs()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    writer = ArtifactWriter(SAMPLE_RATE) if save_artifacts else None
+    speech_archive = None
+    if writer is not None:
+        speech_archive = writer.open(os.path.join(OUTPUT_DIR, f"speech_stream_{timestamp}.wav"), speech=True)
+    diarizer = OnlineDiarizer() if diarize else None
+    noise_reducer = StreamingNoiseReducer(SAMPLE_RATE)
+    vad = StreamingVAD()
+    recorder = AudioRecorder()
+
+    utterance_queue = queue.Queue(maxsize=STREAM_MAX_PENDING_UTTERANCES)
+    METRICS.gauge('utterance_queue_depth', "Utterances waiting for speaker labels"
+                  ).set_function(utterance_queue.qsize)
+    dropped = METRICS.counter('utterances_dropped_total', "Utterances dropped because labeling fell behind")
+    labeler = threading.Thread(target=_label_utterances,
+                               args=(utterance_queue, diarizer, on_utterance))
+    labeler.start()
+    captured = 0
+
+    def emit(utterances, block=False):
+        for utterance in utterances:
+            if speech_archive is not None:
+                speech_archive.append(utterance['audio'], start=round(utterance['start'] * SAMPLE_RATE))
+            _queue_utterance(utterance_queue, utterance, dropped, block=block)
+
+    print("\n=== Streaming: listening (Ctrl+C to stop) ===")
+    recorder.start_recording()
+    start_time = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            chunk = recorder.read_chunk(timeout=STREAM_READ_TIMEOUT)
+            if chunk is None:
+                if not recorder.is_recording:
+                    break
+                continue
+            captured += len(chunk)
+            with stage_timer('stream_filter_vad', audio_seconds=len(chunk) / SAMPLE_RATE):
+                utterances = vad.process_chunk(noise_reducer.process(chunk))
+            emit(utterances)
+    except KeyboardInterrupt:
+        print("\nStopping stream...")
+    finally:
+        remaining = recorder.stop_recording()
+        # Capture has ended, so the last utterances can wait for the labeler
+        if remaining is not None:
+            captured += len(remaining)
+            emit(vad.process_chunk(noise_reducer.process(remaining)), block=True)
+        emit(vad.flush(), block=True)
+        utterance_queue.put(None)
+        labeler.join()
+        if writer is not None:
+            speech_archive.close(source_samples=captured)
+            writer.close()
+    if METRICS_ENABLED:
+        METRICS.write_summary(os.path.join(OUTPUT_DIR, f"metrics_stream_{timestamp}.json"))
+    print("\nStreaming pipeline stopped.")
+
+if __name__ == "__main__":
+    run_vad_pipeline()